@@ -23,6 +23,7 @@ CONCEITOS FUNDAMENTAIS PARA AGENTES:
 from typing import TypedDict, Annotated, Sequence
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from desempenho.intencoes import RoteadorIntencoes
 import operator
 
 
@@ -116,23 +117,37 @@ def react_observar(estado: EstadoReAct):
     return {"iteracao": iteracao + 1}
 
 
+# Roteador local: uma regex compilada para todas as ações (µs por decisão).
+# Com prioridade=True, se mais de uma ação bate vence a primeira da lista,
+# como na ordem dos if/elif (clima antes de cálculo), não a mais frequente.
+ROTEADOR_REACT = RoteadorIntencoes(
+    {
+        "buscar_clima": ["clima", "temperatura", "previsão do tempo"],
+        "calcular": ["calcular", "calcule", "quanto é"],
+    },
+    expressoes={"calcular": [r"\d\s*[-+*/]\s*\d"]},  # 15 + 27, 3*4
+    padrao="responder",
+    prioridade=True,
+)
+
+PENSAMENTOS = {
+    "buscar_clima": "Usuário perguntou sobre clima. Preciso usar ferramenta de clima.",
+    "calcular": "Usuário quer cálculo. Preciso usar calculadora.",
+    "responder": "Posso responder diretamente.",
+}
+
+
 def react_pensar(estado: EstadoReAct):
     """THINK: Decide o que fazer"""
     ultima = estado["mensagens"][-1].content
 
     print(f"\n🧠 PENSAMENTO:")
-    if "clima" in ultima.lower():
-        pensamento = "Usuário perguntou sobre clima. Preciso usar ferramenta de clima."
-        acao = "buscar_clima"
-    elif "calcular" in ultima.lower() or any(op in ultima for op in ["+", "-", "*", "/"]):
-        pensamento = "Usuário quer cálculo. Preciso usar calculadora."
-        acao = "calcular"
-    else:
-        pensamento = "Posso responder diretamente."
-        acao = "responder"
+    intencao = ROTEADOR_REACT.classificar(ultima)
+    acao = intencao.rotulo
+    pensamento = PENSAMENTOS[acao]
 
     print(f"   💭 {pensamento}")
-    print(f"   🎯 Ação escolhida: {acao}")
+    print(f"   🎯 Ação escolhida: {acao} (confiança {intencao.confianca:.2f})")
 
     return {
         "pensamento": pensamento,
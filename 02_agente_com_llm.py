@@ -14,12 +14,13 @@ Este é o padrão que você usará em 90% dos casos reais!
 """
 
 import os
-from typing import TypedDict, Annotated, Sequence
+from typing import TypedDict, Annotated
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
-import operator
+from desempenho.canal_mensagens import SequenciaMensagens, anexar_mensagens
+from desempenho.modelos import criar_modelo
+from desempenho.montador_prompt import ordenar_ferramentas
 
 
 # ===================================================================
@@ -112,8 +113,11 @@ class EstadoAgente(TypedDict):
 
     - mensagens: Histórico completo (humano, AI, ferramentas)
     - iteracoes: Contador de iterações (evita loops infinitos)
+
+    anexar_mensagens é append-only: cada passo reaproveita os blocos
+    antigos do histórico em vez de copiar a lista inteira (operator.add).
     """
-    mensagens: Annotated[Sequence[BaseMessage], operator.add]
+    mensagens: Annotated[SequenciaMensagens, anexar_mensagens]
     iteracoes: int
 
 
@@ -135,8 +139,9 @@ def no_agente(estado: EstadoAgente):
 
     # Inicializar o LLM com as ferramentas
     # NOTA: Você precisa ter OPENAI_API_KEY no .env
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    llm_com_tools = llm.bind_tools(ferramentas)
+    llm = criar_modelo("gpt-4o-mini", temperature=0)
+    # Schemas em ordem estável: prefixo idêntico entre chamadas (cache de prompt)
+    llm_com_tools = llm.bind_tools(ordenar_ferramentas(ferramentas))
 
     # LLM analisa todas as mensagens e decide o que fazer
     resposta = llm_com_tools.invoke(estado["mensagens"])
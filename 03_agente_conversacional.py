@@ -12,13 +12,18 @@ Aprenda a criar agentes que:
 """
 
 import os
-from typing import TypedDict, Annotated, Sequence
+from typing import TypedDict, Annotated
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
-import operator
+from desempenho.blobs import ArmazemConteudo
+from desempenho.canal_mensagens import SequenciaMensagens, anexar_mensagens
+from desempenho.checkpoint_lru import MemorySaverLimitado
+from desempenho.compactacao import CompactadorConversa, resumidor_extrativo, resumidor_llm
+from desempenho.contexto import GerenciadorContexto
+from desempenho.modelos import criar_modelo
+from desempenho.montador_prompt import MontadorPrompt
 
 
 # ===================================================================
@@ -92,22 +97,48 @@ class EstadoConversacional(TypedDict):
 
     A diferença aqui é que usaremos checkpoints para
     salvar o estado entre diferentes conversas.
+
+    anexar_mensagens é append-only (blocos antigos do histórico são
+    compartilhados entre checkpoints e gravados uma única vez) e aceita
+    RemoveMessage: é assim que a compactação tira do checkpoint os
+    turnos já resumidos.
     """
-    mensagens: Annotated[Sequence[BaseMessage], operator.add]
+    mensagens: Annotated[SequenciaMensagens, anexar_mensagens]
+    resumo: str  # resumo corrente dos turnos antigos
 
 
 # ===================================================================
 # PARTE 3: NÓS DO AGENTE
 # ===================================================================
 
-def no_agente_conversacional(estado: EstadoConversacional):
+# O histórico completo fica no checkpoint; ao modelo vai só o que cabe
+# no orçamento (system message + turnos mais recentes)
+GERENCIADOR_CONTEXTO = GerenciadorContexto(orcamento_tokens=3000)
+
+# Turnos antigos viram um resumo, calculado em segundo plano enquanto o
+# turno atual segue e aplicado no início do turno seguinte
+COMPACTADOR = CompactadorConversa(
+    resumidor_llm(criar_modelo("gpt-4o-mini", temperature=0))
+    if os.getenv("OPENAI_API_KEY") else resumidor_extrativo,
+    limite_tokens=2000,
+    manter_mensagens=6,
+)
+
+
+def no_compactar(estado: EstadoConversacional, config: RunnableConfig):
     """
-    Agente que mantém contexto da conversa.
+    Entrada de cada turno: aplica o resumo pronto (se houver) e dispara
+    o próximo quando o histórico passa do limite. Não espera o LLM.
     """
-    print(f"\n🤖 [AGENTE] Analisando conversa ({len(estado['mensagens'])} mensagens no histórico)...")
+    thread_id = config["configurable"]["thread_id"]
+    atualizacao = COMPACTADOR.preparar(thread_id, estado["mensagens"], estado.get("resumo", ""))
+    if atualizacao:
+        print(f"\n🗜️  [COMPACTAR] {len(atualizacao['mensagens'])} mensagens antigas dobradas no resumo")
+    return atualizacao
+
 
-    # Sistema de mensagem que define o comportamento
-    system_message = SystemMessage(content="""
+# Sistema de mensagem que define o comportamento (criado uma vez, prefixo constante)
+MONTADOR_CONVERSA = MontadorPrompt("""
 Você é um assistente pessoal prestativo e amigável.
 
 Características:
@@ -120,18 +151,32 @@ Ferramentas disponíveis:
 - salvar_nota: Para salvar informações importantes
 - buscar_informacao_usuario: Para buscar dados do usuário
 - agendar_lembrete: Para criar lembretes
-""")
+""", ferramentas=ferramentas)
+
 
-    # Adicionar system message se for a primeira interação
-    mensagens = estado["mensagens"]
-    if not any(isinstance(m, SystemMessage) for m in mensagens):
-        mensagens = [system_message] + mensagens
+def no_agente_conversacional(estado: EstadoConversacional):
+    """
+    Agente que mantém contexto da conversa.
+    """
+    print(f"\n🤖 [AGENTE] Analisando conversa ({len(estado['mensagens'])} mensagens no histórico)...")
+
+    # System message + resumo na frente do histórico, sem varrer nem copiar o histórico
+    contexto = []
+    if estado.get("resumo"):
+        contexto.append(SystemMessage(content=f"Resumo da conversa até aqui:\n{estado['resumo']}"))
+    mensagens = MONTADOR_CONVERSA.montar(estado["mensagens"], contexto)
+
+    mensagens = GERENCIADOR_CONTEXTO.selecionar(mensagens)
+    medicao = GERENCIADOR_CONTEXTO.ultima_medicao
+    if medicao["mensagens_descartadas"]:
+        print(f"   ✂️  Contexto: {medicao['tokens_enviados']} tokens enviados, "
+              f"{medicao['tokens_economizados']} economizados")
 
     # LLM com ferramentas
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
-    llm_com_tools = llm.bind_tools(ferramentas)
+    llm = criar_modelo("gpt-4o-mini", temperature=0.7)
+    llm_com_tools = MONTADOR_CONVERSA.vincular(llm)
 
-    resposta = llm_com_tools.invoke(mensagens)
+    resposta = MONTADOR_CONVERSA.enviar(llm_com_tools, mensagens)
 
     return {"mensagens": [resposta]}
 
@@ -179,21 +224,30 @@ print("\n" + "="*70)
 print("PARTE 4: Construindo Agente com Memória Persistente")
 print("="*70)
 
+# Compartilhado por todos os agentes criados: deduplica entre threads
+ARMAZEM_MENSAGENS = ArmazemConteudo()
+
+
 def criar_agente_conversacional():
     """
     Cria agente com memória usando checkpoints.
 
     A grande diferença aqui é o MemorySaver, que permite
     que o agente lembre de conversas anteriores!
+
+    Usamos o MemorySaverLimitado: mesmo comportamento do MemorySaver,
+    mas mensagens idênticas (de qualquer thread) são guardadas uma vez só.
     """
     workflow = StateGraph(EstadoConversacional)
 
     # Adicionar nós
+    workflow.add_node("compactar", no_compactar)
     workflow.add_node("agente", no_agente_conversacional)
     workflow.add_node("ferramentas", no_executar_ferramentas)
 
     # Fluxo
-    workflow.set_entry_point("agente")
+    workflow.set_entry_point("compactar")
+    workflow.add_edge("compactar", "agente")
 
     workflow.add_conditional_edges(
         "agente",
@@ -207,7 +261,7 @@ def criar_agente_conversacional():
     workflow.add_edge("ferramentas", "agente")
 
     # 🔑 CHAVE: Adicionar memória com checkpointer
-    memory = MemorySaver()
+    memory = MemorySaverLimitado(armazem=ARMAZEM_MENSAGENS)
     app = workflow.compile(checkpointer=memory)
 
     return app
@@ -333,6 +387,9 @@ print("""
    - workflow.compile(checkpointer=memory)
    - Estado é automaticamente salvo e restaurado
    - Permite pausar/continuar conversas
+   - ArmazemConteudo guarda cada mensagem uma vez só (deduplicação)
+   - GerenciadorContexto envia ao modelo só o que cabe no orçamento de tokens
+   - CompactadorConversa dobra turnos antigos num resumo, em segundo plano
 
 ✅ Configuração por Thread:
    - config = {"configurable": {"thread_id": "..."}}
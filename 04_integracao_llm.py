@@ -13,6 +13,7 @@ Configure sua chave antes de executar.
 
 from typing import TypedDict, Annotated, Sequence
 from langgraph.graph import StateGraph, END
+from desempenho.intencoes import RoteadorIntencoes
 import operator
 
 # Importações do LangChain (descomente quando tiver as chaves configuradas)
@@ -144,21 +145,28 @@ def buscar_informacao(termo: str) -> str:
     return base_conhecimento.get(termo.lower(), f"Não encontrei informação sobre '{termo}'")
 
 
+# Decisão de ferramenta local (regex compilada, µs); só o que não bate
+# em nenhuma ferramenta vai para o LLM responder direto. Se as duas batem,
+# a calculadora vem primeiro (prioridade=True, como na ordem dos if/elif)
+ROTEADOR_FERRAMENTAS = RoteadorIntencoes(
+    {
+        "calculadora": ["calcular", "calcule", "quanto é"],
+        "busca": ["o que é", "sobre", "informação"],
+    },
+    expressoes={"calculadora": [r"\d\s*[-+*/]\s*\d"]},
+    prioridade=True,
+)
+
+
 def decidir_ferramenta(estado: EstadoComFerramentas) -> EstadoComFerramentas:
     """Decide se precisa usar uma ferramenta"""
-    entrada = estado["entrada"].lower()
-
-    usa_ferramenta = False
-    ferramenta = ""
-
-    if any(op in entrada for op in ['+', '-', '*', '/', 'calcular', 'quanto é']):
-        usa_ferramenta = True
-        ferramenta = "calculadora"
-        print("[DECISÃO] Usar calculadora")
-    elif any(palavra in entrada for palavra in ['o que é', 'sobre', 'informação']):
-        usa_ferramenta = True
-        ferramenta = "busca"
-        print("[DECISÃO] Usar busca")
+    intencao = ROTEADOR_FERRAMENTAS.classificar(estado["entrada"])
+
+    usa_ferramenta = intencao.rotulo is not None
+    ferramenta = intencao.rotulo or ""
+
+    if usa_ferramenta:
+        print(f"[DECISÃO] Usar {ferramenta} (confiança {intencao.confianca:.2f})")
     else:
         print("[DECISÃO] Responder diretamente (sem ferramenta)")
 
@@ -12,12 +12,16 @@ Aprenda a criar sistemas onde MÚLTIPLOS agentes trabalham juntos:
 """
 
 import os
-from typing import TypedDict, Annotated, Sequence, Literal
+from typing import TypedDict, Annotated, Sequence, Literal, Optional
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 import operator
+from desempenho.canal_mensagens import SequenciaMensagens, anexar_mensagens
+from desempenho.cascata import Cascata, Nivel, rotulo_em
+from desempenho.intencoes import RoteadorIntencoes
+from desempenho.modelos import MODELO_FORTE, criar_modelo, hedge_do_ambiente, metricas_modelos
+from desempenho.montador_prompt import MontadorPrompt
 
 
 # ===================================================================
@@ -35,13 +39,74 @@ AGENTE 1 (Tradutor) → AGENTE 2 (Analisador) → AGENTE 3 (Resumidor)
 
 class EstadoPipeline(TypedDict):
     """Estado compartilhado entre os agentes"""
-    mensagens: Annotated[Sequence[BaseMessage], operator.add]
+    mensagens: Annotated[SequenciaMensagens, anexar_mensagens]
     feedback_original: str
     feedback_traduzido: str
     sentimento: str
     resumo_final: str
 
 
+# Instruções fixas no system (prefixo estável, cacheável); o dado de cada
+# chamada vai sozinho na mensagem do usuário, no fim do prompt
+MONTADOR_TRADUTOR = MontadorPrompt("""
+Você é um tradutor especializado. Traduza para português o texto enviado pelo usuário.
+Retorne APENAS a tradução, sem explicações.
+""")
+
+MONTADOR_SENTIMENTO = MontadorPrompt("""
+Você é um especialista em análise de sentimento.
+Analise o sentimento do feedback enviado pelo usuário e classifique como:
+POSITIVO, NEGATIVO ou NEUTRO
+
+Retorne APENAS: POSITIVO, NEGATIVO ou NEUTRO
+""")
+
+MONTADOR_RESUMIDOR = MontadorPrompt("""
+Você é um especialista em criar resumos executivos.
+O usuário envia um feedback e o sentimento dele.
+Crie um resumo executivo de 1-2 linhas para o time de produto.
+""")
+
+# Hedge (opt-in, LLM_HEDGE=1) nos nós com temperatura 0: se a resposta passa
+# do p95 observado, uma cópia da requisição é disparada e vale a 1ª que chegar
+HEDGE_TRADUTOR = hedge_do_ambiente()
+
+SENTIMENTOS = ("POSITIVO", "NEGATIVO", "NEUTRO")
+
+# Léxico no início de palavra ("lent" pega lento/lenta, não "excelente");
+# negadores são palavras inteiras ("sem", não "sempre") e só sinalizam
+ROTEADOR_SENTIMENTO = RoteadorIntencoes(
+    {
+        "POSITIVO": ["ótimo", "excelente", "incrível", "adorei", "amei", "recomendo", "perfeito", "rápid"],
+        "NEGATIVO": ["ruim", "péssim", "horrível", "lent", "demora", "problema", "erro", "decepcion", "odiei"],
+    },
+    expressoes={"negacao": [r"\b(?:nao|sem|nenhuma?|nunca|jamais|nem)\b"]},
+)
+
+
+def regras_sentimento(texto: str) -> tuple[Optional[str], float]:
+    """Léxico: confiante só com termos de um lado e sem negação (não, sem, nenhum, nunca...)"""
+    intencao = ROTEADOR_SENTIMENTO.classificar(texto)
+    if len(intencao.contagens) == 1 and intencao.rotulo in SENTIMENTOS:
+        return intencao.rotulo, 0.9
+    return None, 0.0
+
+
+def _sentimento_llm(modelo: str, **kwargs):
+    def chamar(feedback: str):
+        llm = criar_modelo(modelo, temperature=0, **kwargs)
+        return MONTADOR_SENTIMENTO.invocar(llm, [HumanMessage(content=f"Feedback: {feedback}")])
+    return chamar
+
+
+# Cascata: léxico local -> gpt-4o-mini (rótulo válido e logprob) -> modelo forte
+CASCATA_SENTIMENTO = Cascata("sentimento", [
+    Nivel("regras", regras_sentimento),
+    Nivel("gpt-4o-mini", _sentimento_llm("gpt-4o-mini", logprobs=True), rotulo_em(SENTIMENTOS)),
+    Nivel(MODELO_FORTE, _sentimento_llm(MODELO_FORTE), rotulo_em(SENTIMENTOS)),
+])
+
+
 def agente_tradutor(estado: EstadoPipeline):
     """
     AGENTE 1: Especialista em tradução
@@ -50,17 +115,9 @@ def agente_tradutor(estado: EstadoPipeline):
 
     feedback = estado["feedback_original"]
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-    prompt = f"""
-Você é um tradutor especializado. Traduza o seguinte texto para português:
-
-{feedback}
+    llm = criar_modelo("gpt-4o-mini", temperature=0, hedge=HEDGE_TRADUTOR)
 
-Retorne APENAS a tradução, sem explicações.
-"""
-
-    resposta = llm.invoke([HumanMessage(content=prompt)])
+    resposta = MONTADOR_TRADUTOR.invocar(llm, [HumanMessage(content=feedback)])
     traduzido = resposta.content
 
     print(f"   Original: {feedback[:50]}...")
@@ -80,20 +137,8 @@ def agente_analisador_sentimento(estado: EstadoPipeline):
 
     feedback = estado["feedback_traduzido"]
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-    prompt = f"""
-Você é um especialista em análise de sentimento.
-Analise o sentimento deste feedback e classifique como:
-POSITIVO, NEGATIVO ou NEUTRO
-
-Feedback: {feedback}
-
-Retorne APENAS: POSITIVO, NEGATIVO ou NEUTRO
-"""
-
-    resposta = llm.invoke([HumanMessage(content=prompt)])
-    sentimento = resposta.content.strip().upper()
+    resultado = CASCATA_SENTIMENTO.executar(feedback)
+    sentimento = resultado.valor or "NEUTRO"
 
     emoji_map = {
         "POSITIVO": "😊",
@@ -118,18 +163,10 @@ def agente_resumidor(estado: EstadoPipeline):
     feedback = estado["feedback_traduzido"]
     sentimento = estado["sentimento"]
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
-
-    prompt = f"""
-Você é um especialista em criar resumos executivos.
+    llm = criar_modelo("gpt-4o-mini", temperature=0.3)
 
-Feedback: {feedback}
-Sentimento: {sentimento}
-
-Crie um resumo executivo de 1-2 linhas para o time de produto.
-"""
-
-    resposta = llm.invoke([HumanMessage(content=prompt)])
+    dados = f"Feedback: {feedback}\nSentimento: {sentimento}"
+    resposta = MONTADOR_RESUMIDOR.invocar(llm, [HumanMessage(content=dados)])
     resumo = resposta.content
 
     print(f"   Resumo: {resumo}")
@@ -159,6 +196,19 @@ def criar_pipeline_agentes():
     return workflow.compile()
 
 
+# Nível de regras da cascata: só decide sozinho quando o léxico é inequívoco
+if __name__ == "__main__":
+    print("\n🔎 Regras locais do sentimento (None = sobe para o modelo):")
+    for exemplo in [
+        "O atendimento foi excelente e a entrega rápida",
+        "O app está lento e cheio de erros",
+        "Funciona sem nenhum problema",
+        "Não é ótimo",
+        "Nunca tive problema, recomendo",
+        "Sempre excelente",
+    ]:
+        print(f"   {exemplo!r:50} -> {regras_sentimento(exemplo)}")
+
 # Testar pipeline
 if __name__ == "__main__" and os.getenv("OPENAI_API_KEY"):
     print("\n🧪 Testando Pipeline de Agentes...")
@@ -182,6 +232,7 @@ if __name__ == "__main__" and os.getenv("OPENAI_API_KEY"):
     print(f"Traduzido: {resultado['feedback_traduzido']}")
     print(f"Sentimento: {resultado['sentimento']}")
     print(f"Resumo: {resultado['resumo_final']}")
+    print(f"🪜 Cascata do sentimento: {CASCATA_SENTIMENTO.metricas()}")
 
 
 # ===================================================================
@@ -238,6 +289,13 @@ def agente_finance(estado: EstadoParalelo):
     }
 
 
+MONTADOR_AGREGADOR = MontadorPrompt("""
+Você é um assistente que consolida informações.
+O usuário envia os dados coletados de clima, notícias e finanças.
+Crie um resumo executivo amigável para o usuário.
+""")
+
+
 def agente_agregador(estado: EstadoParalelo):
     """Agrega resultados de todos os agentes"""
     print("\n🔄 [AGENTE AGREGADOR] Consolidando informações...")
@@ -251,20 +309,16 @@ Finance: {estado['resultado_finance']}
 """
         return {"resultado_agregado": agregado}
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
-
-    prompt = f"""
-Você é um assistente que consolida informações.
+    llm = criar_modelo("gpt-4o-mini", temperature=0.3)
 
+    dados = f"""
 Dados coletados:
 - Clima: {estado['resultado_weather']}
 - Notícias: {estado['resultado_news']}
 - Finanças: {estado['resultado_finance']}
+""".strip()
 
-Crie um resumo executivo amigável para o usuário.
-"""
-
-    resposta = llm.invoke([HumanMessage(content=prompt)])
+    resposta = MONTADOR_AGREGADOR.invocar(llm, [HumanMessage(content=dados)])
 
     return {"resultado_agregado": resposta.content}
 
@@ -335,6 +389,49 @@ class EstadoHandoff(TypedDict):
     resolvido: bool
 
 
+MONTADOR_TRIAGEM = MontadorPrompt("""
+Você é um agente de triagem. Classifique o problema enviado pelo usuário em:
+- tech (problemas técnicos)
+- billing (problemas de pagamento)
+- general (outros)
+
+Retorne APENAS: tech, billing ou general
+""")
+
+HEDGE_TRIAGEM = hedge_do_ambiente()
+
+CATEGORIAS_TRIAGEM = ("tech", "billing", "general")
+
+
+# Regras da triagem: uma regex compilada, confiante só quando exatamente
+# uma categoria bate (mais de uma = ambígua, nenhuma = general com confiança 0)
+ROTEADOR_TRIAGEM = RoteadorIntencoes(
+    {
+        "tech": ["senha", "login", "erro", "bug", "trava", "fecha sozinho", "não carrega", "não abre"],
+        "billing": ["reembolso", "pagamento", "pagar", "cobrança", "cobrado", "fatura", "boleto", "estorno"],
+    },
+    padrao="general",
+)
+
+
+def _triagem_llm(modelo: str, **kwargs):
+    def chamar(texto: str):
+        llm = criar_modelo(modelo, temperature=0, **kwargs)
+        return MONTADOR_TRIAGEM.invocar(llm, [HumanMessage(content=f"Problema: {texto}")])
+    return chamar
+
+
+# Cascata: regras (µs) -> gpt-4o-mini (rótulo válido e logprob) -> modelo forte.
+# Só a última mensagem vai no prompt: clientes com o mesmo problema geram
+# chamadas idênticas, que criar_modelo() coalesce enquanto estão em voo
+CASCATA_TRIAGEM = Cascata("triagem", [
+    Nivel("regras", ROTEADOR_TRIAGEM),
+    Nivel("gpt-4o-mini", _triagem_llm("gpt-4o-mini", logprobs=True, hedge=HEDGE_TRIAGEM),
+          rotulo_em(CATEGORIAS_TRIAGEM)),
+    Nivel(MODELO_FORTE, _triagem_llm(MODELO_FORTE), rotulo_em(CATEGORIAS_TRIAGEM)),
+])
+
+
 def agente_triagem(estado: EstadoHandoff):
     """
     Agente que classifica o problema e direciona para especialista
@@ -342,14 +439,8 @@ def agente_triagem(estado: EstadoHandoff):
     print("\n🎯 [AGENTE TRIAGEM] Classificando problema...")
 
     if not os.getenv("OPENAI_API_KEY"):
-        # Versão simplificada
-        ultima_msg = estado["mensagens"][-1].content.lower()
-        if "senha" in ultima_msg or "login" in ultima_msg:
-            categoria = "tech"
-        elif "reembolso" in ultima_msg or "pagamento" in ultima_msg:
-            categoria = "billing"
-        else:
-            categoria = "general"
+        # Versão simplificada: só o nível de regras da cascata
+        categoria, _ = ROTEADOR_TRIAGEM(estado["mensagens"][-1].content)
 
         print(f"   Categoria identificada: {categoria}")
         return {
@@ -358,25 +449,10 @@ def agente_triagem(estado: EstadoHandoff):
             "mensagens": [AIMessage(content=f"Direcionando para {categoria}")]
         }
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-    ultima_msg = estado["mensagens"][-1].content
+    resultado = CASCATA_TRIAGEM.executar(estado["mensagens"][-1].content)
+    categoria = resultado.valor or "general"
 
-    prompt = f"""
-Você é um agente de triagem. Classifique o problema em:
-- tech (problemas técnicos)
-- billing (problemas de pagamento)
-- general (outros)
-
-Problema: {ultima_msg}
-
-Retorne APENAS: tech, billing ou general
-"""
-
-    resposta = llm.invoke([HumanMessage(content=prompt)])
-    categoria = resposta.content.strip().lower()
-
-    print(f"   Categoria identificada: {categoria}")
+    print(f"   Categoria identificada: {categoria} (nível {resultado.nivel}, confiança {resultado.confianca:.2f})")
 
     return {
         "categoria": categoria,
@@ -479,6 +555,24 @@ for teste in testes:
 
     print(f"\n✅ Resposta: {resultado['mensagens'][-1].content}")
 
+print(f"\n⚡ Roteador da triagem: {ROTEADOR_TRIAGEM.metricas()}")
+
+if os.getenv("OPENAI_API_KEY"):
+    # Vários clientes com o MESMO problema ao mesmo tempo: a triagem manda
+    # prompts idênticos em paralelo; criar_modelo() junta as chamadas em voo
+    # numa só requisição (coalescência) e todos recebem a mesma categoria
+    # (pergunta que as regras não resolvem, para a triagem chegar ao modelo)
+    print("\n🧪 8 clientes perguntando a mesma coisa ao mesmo tempo...")
+    sistema_handoff.batch([
+        {"mensagens": [HumanMessage(content="O app fecha sozinho quando tento pagar a assinatura")],
+         "categoria": "", "agente_atual": "", "resolvido": False}
+        for _ in range(8)
+    ])
+    print(f"🔗 Coalescência: {metricas_modelos()['gpt-4o-mini']['coalescencia']}")
+    if HEDGE_TRIAGEM is not None:
+        print(f"🏁 Hedge da triagem: {HEDGE_TRIAGEM.metricas()}")
+    print(f"🪜 Cascata da triagem: {CASCATA_TRIAGEM.metricas()}")
+
 
 # ===================================================================
 # RESUMO
@@ -27,12 +27,15 @@ O supervisor:
 """
 
 import os
-from typing import TypedDict, Annotated, Sequence, Literal
+from typing import TypedDict, Annotated, Literal
 from langgraph.graph import StateGraph, END
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-import operator
-import json
+from langchain_core.messages import HumanMessage, AIMessage
+from desempenho.canal_mensagens import SequenciaMensagens, anexar_mensagens
+from desempenho.cascata import Cascata, Nivel, rotulo_em
+from desempenho.intencoes import RoteadorIntencoes
+from desempenho.json_incremental import DecisoesStreaming
+from desempenho.modelos import MODELO_FORTE, criar_modelo, hedge_do_ambiente, metricas_modelos
+from desempenho.montador_prompt import MontadorPrompt
 
 
 # ===================================================================
@@ -45,12 +48,19 @@ print("="*70)
 
 class EstadoSupervisor(TypedDict):
     """Estado compartilhado do sistema supervisor"""
-    mensagens: Annotated[Sequence[BaseMessage], operator.add]
+    mensagens: Annotated[SequenciaMensagens, anexar_mensagens]
     proximo_agente: str
     tarefa_completa: bool
     iteracao: int
 
 
+MONTADOR_PESQUISADOR = MontadorPrompt("""
+Você é um PESQUISADOR especializado.
+Seu trabalho é coletar e organizar informações sobre o tópico solicitado.
+Seja objetivo e factual.
+""")
+
+
 def agente_pesquisador(estado: EstadoSupervisor):
     """
     Agente especialista em pesquisa e coleta de informações.
@@ -64,16 +74,9 @@ def agente_pesquisador(estado: EstadoSupervisor):
             "mensagens": [AIMessage(content=f"Pesquisador: {resposta}", name="pesquisador")]
         }
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
+    llm = criar_modelo("gpt-4o-mini", temperature=0.3)
 
-    system_prompt = """
-Você é um PESQUISADOR especializado.
-Seu trabalho é coletar e organizar informações sobre o tópico solicitado.
-Seja objetivo e factual.
-"""
-
-    mensagens = [SystemMessage(content=system_prompt)] + list(estado["mensagens"])
-    resposta = llm.invoke(mensagens)
+    resposta = MONTADOR_PESQUISADOR.invocar(llm, estado["mensagens"])
 
     print(f"   Pesquisa concluída")
 
@@ -82,6 +85,13 @@ Seja objetivo e factual.
     }
 
 
+MONTADOR_PROGRAMADOR = MontadorPrompt("""
+Você é um PROGRAMADOR especializado.
+Seu trabalho é escrever código limpo, eficiente e bem documentado.
+Use boas práticas e padrões de código.
+""")
+
+
 def agente_programador(estado: EstadoSupervisor):
     """
     Agente especialista em código.
@@ -95,16 +105,9 @@ def agente_programador(estado: EstadoSupervisor):
             "mensagens": [AIMessage(content=f"Programador: {resposta}", name="programador")]
         }
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
-
-    system_prompt = """
-Você é um PROGRAMADOR especializado.
-Seu trabalho é escrever código limpo, eficiente e bem documentado.
-Use boas práticas e padrões de código.
-"""
+    llm = criar_modelo("gpt-4o-mini", temperature=0.2)
 
-    mensagens = [SystemMessage(content=system_prompt)] + list(estado["mensagens"])
-    resposta = llm.invoke(mensagens)
+    resposta = MONTADOR_PROGRAMADOR.invocar(llm, estado["mensagens"])
 
     print(f"   Código gerado")
 
@@ -113,6 +116,13 @@ Use boas práticas e padrões de código.
     }
 
 
+MONTADOR_ESCRITOR = MontadorPrompt("""
+Você é um ESCRITOR especializado.
+Seu trabalho é criar conteúdo claro, envolvente e bem estruturado.
+Use linguagem apropriada para o público-alvo.
+""")
+
+
 def agente_escritor(estado: EstadoSupervisor):
     """
     Agente especialista em escrita e documentação.
@@ -126,16 +136,9 @@ def agente_escritor(estado: EstadoSupervisor):
             "mensagens": [AIMessage(content=f"Escritor: {resposta}", name="escritor")]
         }
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
-
-    system_prompt = """
-Você é um ESCRITOR especializado.
-Seu trabalho é criar conteúdo claro, envolvente e bem estruturado.
-Use linguagem apropriada para o público-alvo.
-"""
+    llm = criar_modelo("gpt-4o-mini", temperature=0.7)
 
-    mensagens = [SystemMessage(content=system_prompt)] + list(estado["mensagens"])
-    resposta = llm.invoke(mensagens)
+    resposta = MONTADOR_ESCRITOR.invocar(llm, estado["mensagens"])
 
     print(f"   Conteúdo criado")
 
@@ -152,6 +155,74 @@ print("PARTE 2: Criando o Agente Supervisor (Manager)")
 print("="*70)
 
 
+MONTADOR_SUPERVISOR = MontadorPrompt("""
+Você é um SUPERVISOR que gerencia uma equipe de agentes especializados:
+
+- pesquisador: Coleta informações e dados
+- programador: Escreve e revisa código
+- escritor: Cria documentação e textos
+
+Sua tarefa:
+1. Analise a conversa
+2. Decida qual agente deve trabalhar a seguir
+3. Ou determine se a tarefa está completa
+
+Responda APENAS com JSON no formato (proximo_agente sempre primeiro):
+{
+    "proximo_agente": "pesquisador" | "programador" | "escritor" | "FINISH",
+    "raciocinio": "Breve explicação da decisão"
+}
+
+Use FINISH quando a tarefa estiver completa e satisfatória.
+""")
+
+# Hedge (opt-in, LLM_HEDGE=1): o supervisor roda com temperatura 0 e está no
+# caminho de toda iteração; se passar do p95 observado, dispara uma cópia
+HEDGE_SUPERVISOR = hedge_do_ambiente()
+
+AGENTES_SUPERVISOR = ("pesquisador", "programador", "escritor", "FINISH")
+
+
+# Decisão lida em streaming: o roteamento sai assim que "proximo_agente"
+# fecha, sem esperar o "raciocinio" (que é drenado em segundo plano para o
+# uso de tokens e o cache de prompt serem registrados); JSON malformado
+# passa por um reparo local antes de ser dado como inválido
+DECISOES_SUPERVISOR = DecisoesStreaming("proximo_agente")
+
+
+def _supervisor_llm(modelo: str, hedge=None, **kwargs):
+    def chamar(mensagens):
+        # stream_usage: o provedor manda o uso no último pedaço do stream
+        llm = criar_modelo(modelo, temperature=0, stream_usage=True, **kwargs)
+
+        def ler():
+            return DECISOES_SUPERVISOR.ler(MONTADOR_SUPERVISOR.transmitir(llm, mensagens))
+
+        # O hedge cobre o tempo até a decisão (stream + leitura do campo)
+        return ler() if hedge is None else hedge.executar(ler)
+    return chamar
+
+
+# Cascata: gpt-4o-mini primeiro; escala para o modelo forte se nem o reparo
+# local achar um proximo_agente válido ou se o logprob da escolha for baixo
+CASCATA_SUPERVISOR = Cascata("supervisor", [
+    Nivel("gpt-4o-mini", _supervisor_llm("gpt-4o-mini", hedge=HEDGE_SUPERVISOR, logprobs=True),
+          rotulo_em(AGENTES_SUPERVISOR, campo="proximo_agente")),
+    Nivel(MODELO_FORTE, _supervisor_llm(MODELO_FORTE), rotulo_em(AGENTES_SUPERVISOR, campo="proximo_agente")),
+])
+
+# Fallback sem LLM: uma regex compilada para os três agentes (prefixos:
+# "escrev" pega escrever/escreva); empate pela ordem, nenhum -> pesquisador
+ROTEADOR_SUPERVISOR = RoteadorIntencoes(
+    {
+        "pesquisador": ["pesquis", "informação"],
+        "programador": ["código", "program", "função"],
+        "escritor": ["escrev", "texto", "tutorial"],
+    },
+    padrao="pesquisador",
+)
+
+
 def agente_supervisor(estado: EstadoSupervisor):
     """
     SUPERVISOR: Gerencia os outros agentes.
@@ -165,8 +236,6 @@ def agente_supervisor(estado: EstadoSupervisor):
 
     if not os.getenv("OPENAI_API_KEY"):
         # Versão simplificada sem LLM
-        ultima_msg = estado["mensagens"][-1].content.lower()
-
         if estado.get("iteracao", 0) >= 2:
             print("   Decisão: Tarefa completa")
             return {
@@ -175,16 +244,9 @@ def agente_supervisor(estado: EstadoSupervisor):
                 "iteracao": estado.get("iteracao", 0) + 1
             }
 
-        if "pesquis" in ultima_msg or "informação" in ultima_msg:
-            proximo = "pesquisador"
-        elif "código" in ultima_msg or "programar" in ultima_msg:
-            proximo = "programador"
-        elif "escrever" in ultima_msg or "texto" in ultima_msg:
-            proximo = "escritor"
-        else:
-            proximo = "pesquisador"
+        proximo, confianca = ROTEADOR_SUPERVISOR(estado["mensagens"][-1].content)
 
-        print(f"   Decisão: Delegar para {proximo}")
+        print(f"   Decisão: Delegar para {proximo} (confiança {confianca:.2f})")
 
         return {
             "proximo_agente": proximo,
@@ -192,68 +254,39 @@ def agente_supervisor(estado: EstadoSupervisor):
             "iteracao": estado.get("iteracao", 0) + 1
         }
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-    system_prompt = """
-Você é um SUPERVISOR que gerencia uma equipe de agentes especializados:
-
-- pesquisador: Coleta informações e dados
-- programador: Escreve e revisa código
-- escritor: Cria documentação e textos
-
-Sua tarefa:
-1. Analise a conversa
-2. Decida qual agente deve trabalhar a seguir
-3. Ou determine se a tarefa está completa
-
-Responda APENAS com JSON no formato:
-{
-    "proximo_agente": "pesquisador" | "programador" | "escritor" | "FINISH",
-    "raciocinio": "Breve explicação da decisão"
-}
-
-Use FINISH quando a tarefa estiver completa e satisfatória.
-"""
-
-    mensagens = [SystemMessage(content=system_prompt)] + list(estado["mensagens"])
+    resultado = CASCATA_SUPERVISOR.executar(estado["mensagens"])
+    decisao = resultado.valor
 
-    resposta = llm.invoke(mensagens)
+    if decisao is None:
+        # Nem o modelo forte devolveu um proximo_agente válido: em vez de
+        # encerrar, reparo barato pelo roteador local (agente citado no texto
+        # do modelo ou, se nenhum, pela última mensagem); o limite de
+        # iterações de rotear_supervisor continua valendo
+        texto_modelo = getattr(resultado.resposta, "content", "") or ""
+        intencao = ROTEADOR_SUPERVISOR.classificar(texto_modelo)
+        if not intencao.contagens:
+            intencao = ROTEADOR_SUPERVISOR.classificar(estado["mensagens"][-1].content)
+        print(f"   🔧 Decisão inválida, reparada localmente: {intencao.rotulo}")
+        decisao = {"proximo_agente": intencao.rotulo, "raciocinio": "decisão reparada pelo roteador local"}
 
-    try:
-        # Tentar extrair JSON da resposta
-        content = resposta.content
-        if "```json" in content:
-            content = content.split("```json")[1].split("```")[0]
-        elif "```" in content:
-            content = content.split("```")[1].split("```")[0]
+    proximo = decisao["proximo_agente"]
+    # Com a leitura antecipada o raciocínio normalmente nem chegou a ser gerado
+    raciocinio = decisao.get("raciocinio") or f"delegando para {proximo}"
 
-        decisao = json.loads(content.strip())
+    print(f"   💭 Raciocínio: {raciocinio}")
+    print(f"   🎯 Próximo: {proximo} (nível {resultado.nivel}, confiança {resultado.confianca:.2f})")
 
-        proximo = decisao.get("proximo_agente", "FINISH")
-        raciocinio = decisao.get("raciocinio", "")
+    tarefa_completa = proximo == "FINISH"
 
-        print(f"   💭 Raciocínio: {raciocinio}")
-        print(f"   🎯 Próximo: {proximo}")
-
-        tarefa_completa = proximo == "FINISH"
-
-        return {
-            "proximo_agente": proximo,
-            "tarefa_completa": tarefa_completa,
-            "iteracao": estado.get("iteracao", 0) + 1,
-            "mensagens": [AIMessage(
-                content=f"Supervisor: {raciocinio}",
-                name="supervisor"
-            )]
-        }
-
-    except json.JSONDecodeError:
-        print("   ⚠️  Erro ao parsear decisão, finalizando...")
-        return {
-            "proximo_agente": "FINISH",
-            "tarefa_completa": True,
-            "iteracao": estado.get("iteracao", 0) + 1
-        }
+    return {
+        "proximo_agente": proximo,
+        "tarefa_completa": tarefa_completa,
+        "iteracao": estado.get("iteracao", 0) + 1,
+        "mensagens": [AIMessage(
+            content=f"Supervisor: {raciocinio}",
+            name="supervisor"
+        )]
+    }
 
 
 # ===================================================================
@@ -377,6 +410,16 @@ if __name__ == "__main__":
             if hasattr(msg, "name") and msg.name:
                 print(f"  • {msg.name}: {msg.content[:60]}...")
 
+    if os.getenv("OPENAI_API_KEY"):
+        # Prefixo estável (system canonicalizado e constante): a partir da
+        # 2ª chamada do supervisor o provedor pode ler o prefixo do cache
+        print(f"\n💾 Cache de prompt do supervisor: {MONTADOR_SUPERVISOR.cache.metricas()}")
+        print(f"🚦 Limitador de chamadas: {metricas_modelos()}")
+        print(f"🪜 Cascata do supervisor: {CASCATA_SUPERVISOR.metricas()}")
+        print(f"⏩ Decisões em streaming: {DECISOES_SUPERVISOR.metricas()}")
+        if HEDGE_SUPERVISOR is not None:
+            print(f"🏁 Hedge do supervisor: {HEDGE_SUPERVISOR.metricas()}")
+
 
 # ===================================================================
 # RESUMO
@@ -11,6 +11,9 @@ permitindo criar agentes com memória de longo prazo.
 from typing import TypedDict, Annotated
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+from desempenho.checkpoint_lru import MemorySaverLimitado
+from desempenho.tarefas import IndiceTarefas, PENDENTE
+from desempenho.versoes import HistoricoVersoes
 import operator
 import json
 from datetime import datetime
@@ -77,8 +80,13 @@ def processar_entrada(estado: EstadoComMemoria) -> EstadoComMemoria:
     }
 
 
-def criar_agente_com_memoria():
-    """Cria agente com memória persistente"""
+def criar_agente_com_memoria(max_threads: int = None, diretorio_spill: str = None):
+    """
+    Cria agente com memória persistente.
+
+    Com max_threads, usa o MemorySaverLimitado: só as threads mais
+    recentes ficam em memória e as frias vão para diretorio_spill.
+    """
 
     workflow = StateGraph(EstadoComMemoria)
 
@@ -90,7 +98,10 @@ def criar_agente_com_memoria():
     workflow.add_edge("processar", END)
 
     # Adicionar checkpointer para persistência
-    memory = MemorySaver()
+    if max_threads is not None:
+        memory = MemorySaverLimitado(max_threads=max_threads, diretorio_spill=diretorio_spill)
+    else:
+        memory = MemorySaver()
     app = workflow.compile(checkpointer=memory)
 
     return app
@@ -98,43 +109,52 @@ def criar_agente_com_memoria():
 
 # EXEMPLO 2: SISTEMA DE TAREFAS COM PERSISTÊNCIA
 class EstadoTarefas(TypedDict):
-    tarefas: list
+    tarefas: IndiceTarefas
     concluidas: list
     em_andamento: str
     estatisticas: dict
 
 
+def _indice(estado: EstadoTarefas) -> IndiceTarefas:
+    tarefas = estado.get("tarefas")
+    return tarefas if tarefas is not None else IndiceTarefas()
+
+
+def _estatisticas(indice: IndiceTarefas) -> dict:
+    return {"total": len(indice), "pendentes": indice.contar(PENDENTE)}
+
+
 def adicionar_tarefa(estado: EstadoTarefas, nova_tarefa: str) -> EstadoTarefas:
     """Adiciona uma nova tarefa"""
-    tarefas = estado.get("tarefas", [])
-    tarefa_obj = {
-        "id": len(tarefas) + 1,
-        "titulo": nova_tarefa,
-        "criada_em": datetime.now().isoformat(),
-        "status": "pendente"
-    }
+    return adicionar_tarefas(estado, [nova_tarefa])
 
-    tarefas.append(tarefa_obj)
 
-    print(f"[TAREFA ADICIONADA] #{tarefa_obj['id']}: {nova_tarefa}")
+def adicionar_tarefas(estado: EstadoTarefas, titulos: list) -> EstadoTarefas:
+    """Adiciona várias tarefas de uma vez"""
+    tarefas = _indice(estado)
+
+    for tarefa_obj in tarefas.adicionar_lote(titulos):
+        print(f"[TAREFA ADICIONADA] #{tarefa_obj['id']}: {tarefa_obj['titulo']}")
 
     return {
         **estado,
-        "tarefas": tarefas
+        "tarefas": tarefas,
+        "estatisticas": _estatisticas(tarefas)
     }
 
 
-def listar_tarefas(estado: EstadoTarefas) -> EstadoTarefas:
-    """Lista todas as tarefas"""
-    tarefas = estado.get("tarefas", [])
+def listar_tarefas(estado: EstadoTarefas, pagina: int = 1, tamanho: int = 20) -> EstadoTarefas:
+    """Lista uma página das tarefas pendentes"""
+    tarefas = _indice(estado)
     concluidas = estado.get("concluidas", [])
+    total_pendentes = tarefas.contar(PENDENTE)
 
-    print("\n[TAREFAS PENDENTES]")
-    for tarefa in tarefas:
+    print(f"\n[TAREFAS PENDENTES] página {pagina} ({total_pendentes} no total)")
+    for tarefa in tarefas.listar(PENDENTE, pagina, tamanho):
         print(f"  #{tarefa['id']}: {tarefa['titulo']}")
 
     print(f"\n[TAREFAS CONCLUÍDAS] {len(concluidas)} tarefas")
-    for tarefa in concluidas:
+    for tarefa in concluidas[-tamanho:]:
         print(f"  ✓ #{tarefa['id']}: {tarefa['titulo']}")
 
     return estado
@@ -142,22 +162,23 @@ def listar_tarefas(estado: EstadoTarefas) -> EstadoTarefas:
 
 def concluir_tarefa(estado: EstadoTarefas, tarefa_id: int) -> EstadoTarefas:
     """Marca uma tarefa como concluída"""
-    tarefas = estado.get("tarefas", [])
+    return concluir_tarefas(estado, [tarefa_id])
+
+
+def concluir_tarefas(estado: EstadoTarefas, tarefa_ids: list) -> EstadoTarefas:
+    """Marca várias tarefas como concluídas (O(1) cada)"""
+    tarefas = _indice(estado)
     concluidas = estado.get("concluidas", [])
 
-    for i, tarefa in enumerate(tarefas):
-        if tarefa["id"] == tarefa_id:
-            tarefa["concluida_em"] = datetime.now().isoformat()
-            tarefa["status"] = "concluida"
-            concluidas.append(tarefa)
-            tarefas.pop(i)
-            print(f"[TAREFA CONCLUÍDA] #{tarefa_id}: {tarefa['titulo']}")
-            break
+    for tarefa in tarefas.concluir_lote(tarefa_ids):
+        concluidas.append(tarefa)
+        print(f"[TAREFA CONCLUÍDA] #{tarefa['id']}: {tarefa['titulo']}")
 
     return {
         **estado,
         "tarefas": tarefas,
-        "concluidas": concluidas
+        "concluidas": concluidas,
+        "estatisticas": _estatisticas(tarefas)
     }
 
 
@@ -197,14 +218,17 @@ class GerenciadorEstado:
 class EstadoVersionado(TypedDict):
     versao: int
     dados: dict
-    historico_versoes: list
+    historico_versoes: HistoricoVersoes
 
 
 def criar_checkpoint(estado: EstadoVersionado) -> EstadoVersionado:
     """Cria um checkpoint do estado atual"""
-    versao = estado.get("versao", 0) + 1
+    historico = estado.get("historico_versoes")
+    if historico is None:
+        historico = HistoricoVersoes()
+    # Depois de um rollback a próxima versão não pode reaproveitar um número já usado
+    versao = max(estado.get("versao", 0), historico.ultima_versao) + 1
     dados = estado.get("dados", {})
-    historico = estado.get("historico_versoes", [])
 
     checkpoint = {
         "versao": versao,
@@ -225,19 +249,35 @@ def criar_checkpoint(estado: EstadoVersionado) -> EstadoVersionado:
 
 def rollback(estado: EstadoVersionado, versao_alvo: int) -> EstadoVersionado:
     """Volta para uma versão anterior"""
-    historico = estado.get("historico_versoes", [])
-
-    for checkpoint in historico:
-        if checkpoint["versao"] == versao_alvo:
-            print(f"[ROLLBACK] Voltando para versão {versao_alvo}")
-            return {
-                "versao": checkpoint["versao"],
-                "dados": checkpoint["dados"],
-                "historico_versoes": historico
-            }
-
-    print(f"[ERRO] Versão {versao_alvo} não encontrada")
-    return estado
+    historico = estado.get("historico_versoes")
+    if historico is None:
+        historico = HistoricoVersoes()
+
+    checkpoint = historico.obter(versao_alvo)
+    if checkpoint is None:
+        print(f"[ERRO] Versão {versao_alvo} não encontrada")
+        return estado
+
+    print(f"[ROLLBACK] Voltando para versão {versao_alvo}")
+    return {
+        "versao": checkpoint["versao"],
+        "dados": checkpoint["dados"].copy(),
+        "historico_versoes": historico
+    }
+
+
+def rollback_para_instante(estado: EstadoVersionado, instante: str) -> EstadoVersionado:
+    """Volta para a versão vigente em um instante (timestamp ISO)"""
+    historico = estado.get("historico_versoes")
+    if historico is None:
+        historico = HistoricoVersoes()
+
+    checkpoint = historico.em(instante)
+    if checkpoint is None:
+        print(f"[ERRO] Nenhuma versão existia em {instante}")
+        return estado
+
+    return rollback(estado, checkpoint["versao"])
 
 
 # EXECUTAR EXEMPLOS
@@ -284,7 +324,7 @@ if __name__ == "__main__":
     print("=" * 60)
 
     estado_tarefas = {
-        "tarefas": [],
+        "tarefas": IndiceTarefas(),
         "concluidas": [],
         "em_andamento": "",
         "estatisticas": {}
@@ -301,9 +341,13 @@ if __name__ == "__main__":
     # Concluir uma tarefa
     estado_tarefas = concluir_tarefa(estado_tarefas, 1)
 
+    # IDs nunca se repetem, mesmo depois de concluir
+    estado_tarefas = adicionar_tarefas(estado_tarefas, ["Documentar", "Publicar"])
+
     # Listar novamente
     print()
-    listar_tarefas(estado_tarefas)
+    listar_tarefas(estado_tarefas, pagina=1, tamanho=3)
+    print(f"[ESTATÍSTICAS] {estado_tarefas['estatisticas']}")
 
     print("\n" + "=" * 60)
     print("EXEMPLO 3: Salvar/Carregar Manualmente")
@@ -337,7 +381,7 @@ if __name__ == "__main__":
     estado_v = {
         "versao": 0,
         "dados": {"contador": 0},
-        "historico_versoes": []
+        "historico_versoes": HistoricoVersoes(manter_ultimas=10, intervalo_antigas=5)
     }
 
     print("\n[Criando checkpoints]")
@@ -354,6 +398,11 @@ if __name__ == "__main__":
     estado_v = rollback(estado_v, 2)
     print(f"Dados após rollback: {estado_v['dados']}")
 
+    print(f"\n[Rollback para o instante da versão 1]")
+    instante_v1 = estado_v["historico_versoes"].obter(1)["timestamp"]
+    estado_v = rollback_para_instante(estado_v, instante_v1)
+    print(f"Dados após rollback: {estado_v['dados']}")
+
     print("\n" + "=" * 60)
     print("""
     CONCEITOS-CHAVE:
@@ -362,12 +411,15 @@ if __name__ == "__main__":
     2. Thread ID: Identifica sessões/usuários únicos
     3. Persistência Manual: Salvar em JSON/BD quando necessário
     4. Versionamento: Manter histórico de mudanças
+       (HistoricoVersoes: busca por versão O(1), por instante O(log n))
 
     USO EM PRODUÇÃO:
     - Use SQLite/PostgreSQL para persistência durável
     - Implemente limpeza de dados antigos
     - Adicione autenticação para threads de usuário
-    - Monitore uso de memória
+    - Monitore uso de memória (MemorySaverLimitado.metricas())
+    - Limite threads em memória com MemorySaverLimitado (LRU + disco)
+    - Tire a escrita do caminho crítico com CheckpointerWriteBehind
 
     EXERCÍCIO:
     1. Implemente um chatbot que lembra conversas anteriores
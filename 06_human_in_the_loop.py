@@ -21,7 +21,7 @@ from typing import TypedDict, Annotated, Sequence
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
+from desempenho.modelos import criar_modelo
 import operator
 
 
@@ -159,7 +159,7 @@ def criar_plano(estado: EstadoPlanejamento):
             "5. Deploy"
         ]
     else:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
+        llm = criar_modelo("gpt-4o-mini", temperature=0.3)
 
         ultima_msg = estado["mensagens"][-1].content
 
@@ -383,7 +383,7 @@ Seu nome
 """
         destinatario = "cliente@empresa.com"
     else:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+        llm = criar_modelo("gpt-4o-mini", temperature=0.7)
 
         contexto = estado["mensagens"][-1].content
 
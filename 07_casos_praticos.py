@@ -17,9 +17,17 @@ from typing import TypedDict, Annotated, Sequence, List
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 import operator
 
+from desempenho.busca_hibrida import BuscaHibrida
+from desempenho.busca_lexica import IndiceBM25, cobertura_termos
+from desempenho.canal_mensagens import SequenciaMensagens, anexar_mensagens
+from desempenho.ingestao import IngestorCorpus, ler_corpus
+from desempenho.modelos import criar_modelo
+from desempenho.montador_prompt import MontadorPrompt
+from desempenho.reranking import Reranqueador
+from desempenho.shards import IndiceParticionado
+
 
 # ===================================================================
 # CASO 1: RAG AGENT - AGENTE COM BASE DE CONHECIMENTO
@@ -57,11 +65,101 @@ BASE_CONHECIMENTO = {
 }
 
 
+# Documentos no formato retornado ao agente: doc_id -> (categoria, texto)
+def _documentos_da_base(base: dict) -> dict:
+    documentos = {}
+    for prod in base["produtos"]:
+        documentos[f"produtos:{prod['id']}"] = (
+            "produtos", f"Produto: {prod['nome']} - R${prod['preco']} - {prod['features']}"
+        )
+    for key, value in base["politicas"].items():
+        documentos[f"politicas:{key}"] = ("politicas", f"Política de {key}: {value}")
+    for key, value in base["documentacao"].items():
+        documentos[f"documentacao:{key}"] = ("documentacao", f"Doc {key}: {value}")
+    return documentos
+
+
+def _fabrica_indice(modo: str, embedding=None, similaridade_minima: float = 0.0):
+    """Cria índices vazios (um por shard) para o modo de busca"""
+    if modo == "lexica":
+        return IndiceBM25
+
+    from desempenho.busca_vetorial import EmbeddingHash, IndiceVetorial  # requer numpy
+
+    embedding = embedding or EmbeddingHash()
+    if modo == "vetorial":
+        return lambda: IndiceVetorial(embedding, score_minimo=similaridade_minima)
+    return lambda: BuscaHibrida(IndiceBM25(), IndiceVetorial(embedding, score_minimo=similaridade_minima))
+
+
+# RAG_MODO_BUSCA: lexica (BM25), vetorial (embeddings) ou hibrida (ambos + RRF).
+# A busca densa sempre acha "os k mais parecidos", mesmo para uma pergunta
+# sem relação com a base; RAG_SIMILARIDADE_MINIMA descarta os vizinhos
+# fracos ANTES da fusão, então sem termo em comum e sem similaridade clara
+# não vem documento (e o agente ouve "Nenhum documento relevante").
+# 0.2 é calibrado para o EmbeddingHash: colisões de hash ficam abaixo disso
+MODO_BUSCA_RAG = os.getenv("RAG_MODO_BUSCA", "hibrida")
+RAG_SIMILARIDADE_MINIMA = float(os.getenv("RAG_SIMILARIDADE_MINIMA", "0.2"))
+try:
+    fabrica = _fabrica_indice(MODO_BUSCA_RAG, similaridade_minima=RAG_SIMILARIDADE_MINIMA)
+except ImportError:
+    print("⚠️  numpy não instalado: usando busca lexical (BM25)")
+    MODO_BUSCA_RAG = "lexica"
+    fabrica = _fabrica_indice(MODO_BUSCA_RAG)
+
+# Um shard por categoria, construído UMA vez: buscar numa categoria só
+# toca o shard dela; "all" consulta os shards em paralelo e funde com
+# scores comparáveis (IDF do corpus inteiro, RRF global)
+DOCUMENTOS_RAG = _documentos_da_base(BASE_CONHECIMENTO)
+INDICE_RAG = IndiceParticionado(fabrica, particao_de=lambda doc_id: DOCUMENTOS_RAG[doc_id][0])
+# Perguntas de preço ("quanto custa?") acham os produtos pelo "R$" do
+# texto: custa/valor/caro/R$ viram o mesmo termo em tokenizar()
+INDICE_RAG.adicionar_lote((doc_id, texto) for doc_id, (_, texto) in DOCUMENTOS_RAG.items())
+
+# Corpus em disco (JSONL/Markdown) entra no MESMO índice, em lotes e de
+# forma incremental: INGESTOR_RAG.ingerir(...) / INGESTOR_RAG.remover(doc_id)
+INGESTOR_RAG = IngestorCorpus([INDICE_RAG], DOCUMENTOS_RAG)
+if os.getenv("RAG_CORPUS"):
+    estatisticas = INGESTOR_RAG.ingerir(ler_corpus(os.environ["RAG_CORPUS"].split(os.pathsep)))
+    print(f"📚 Corpus ingerido: {estatisticas}")
+
+TOP_K_RAG = 5
+
+# Recuperação especulativa: busca ANTES da primeira chamada ao LLM e, se os
+# documentos cobrem a pergunta, responde sem o round trip da tool call
+RAG_ESPECULATIVO = os.getenv("RAG_ESPECULATIVO", "1") != "0"
+RAG_COBERTURA_MINIMA = float(os.getenv("RAG_COBERTURA_MINIMA", "0.5"))
+
+# Reranking (opcional): a ferramenta busca mais candidatos e um nó próprio
+# reordena em lote e corta pelo orçamento de tokens antes do próximo turno
+RAG_RERANK = os.getenv("RAG_RERANK", "0") == "1"
+RAG_CANDIDATOS = int(os.getenv("RAG_CANDIDATOS", "20"))
+RERANQUEADOR_RAG = Reranqueador(k=TOP_K_RAG, orcamento_tokens=int(os.getenv("RAG_ORCAMENTO_TOKENS", "800")))
+
+
 class EstadoRAG(TypedDict):
-    mensagens: Annotated[Sequence[BaseMessage], operator.add]
+    mensagens: Annotated[SequenciaMensagens, anexar_mensagens]
     query: str
     documentos_relevantes: List[str]
     resposta_final: str
+    candidatos: dict  # tool_call_id -> {"query", "documentos"} aguardando reranking
+    latencia_rerank_ms: float
+
+
+def _recuperar(query: str, categoria: str = "all", k: int = TOP_K_RAG) -> list[str]:
+    """Top-k textos do índice configurado (sem efeitos de ferramenta)"""
+    particao = None if categoria == "all" else categoria
+    encontrados = INDICE_RAG.buscar(query, k=k, particao=particao)
+
+    tempos = INDICE_RAG.ultimos_tempos
+    print("   ⏱️  " + " | ".join(f"{etapa} {ms:.2f}ms" for etapa, ms in tempos.items()))
+    # Etapas internas só numa categoria: em "all" os shards híbridos devolvem
+    # as listas lexical e densa e a fusão RRF é feita no índice particionado
+    etapas = getattr(INDICE_RAG.shards.get(particao), "ultimos_tempos", None) if particao else None
+    if etapas:
+        print(f"      {particao}: " + " | ".join(f"{etapa} {ms:.2f}ms" for etapa, ms in etapas.items()))
+
+    return [DOCUMENTOS_RAG[doc_id][1] for doc_id, _ in encontrados]
 
 
 @tool
@@ -75,29 +173,7 @@ def buscar_documentos(query: str, categoria: str = "all") -> str:
     """
     print(f"\n🔍 [RETRIEVAL] Buscando: '{query}' em categoria '{categoria}'")
 
-    resultados = []
-
-    query_lower = query.lower()
-
-    # Buscar em produtos
-    if categoria in ["produtos", "all"]:
-        for prod in BASE_CONHECIMENTO["produtos"]:
-            if (query_lower in prod["nome"].lower() or
-                query_lower in prod["features"].lower() or
-                any(term in prod["nome"].lower() for term in ["plano", "preço", "features"] if term in query_lower)):
-                resultados.append(f"Produto: {prod['nome']} - R${prod['preco']} - {prod['features']}")
-
-    # Buscar em políticas
-    if categoria in ["politicas", "all"]:
-        for key, value in BASE_CONHECIMENTO["politicas"].items():
-            if query_lower in key or query_lower in value.lower():
-                resultados.append(f"Política de {key}: {value}")
-
-    # Buscar em documentação
-    if categoria in ["documentacao", "all"]:
-        for key, value in BASE_CONHECIMENTO["documentacao"].items():
-            if query_lower in key or query_lower in value.lower():
-                resultados.append(f"Doc {key}: {value}")
+    resultados = _recuperar(query, categoria)
 
     if not resultados:
         resultados.append("Nenhum documento relevante encontrado.")
@@ -109,6 +185,16 @@ def buscar_documentos(query: str, categoria: str = "all") -> str:
 
 ferramentas_rag = [buscar_documentos]
 
+MONTADOR_RAG = MontadorPrompt("""
+Você é um assistente de suporte especializado.
+
+Use a ferramenta buscar_documentos para encontrar informações relevantes
+na base de conhecimento antes de responder.
+
+Sempre base suas respostas nos documentos encontrados.
+Se não encontrar informação, diga que não tem essa informação.
+""", ferramentas=ferramentas_rag)
+
 
 def agente_rag(estado: EstadoRAG):
     """
@@ -129,22 +215,39 @@ def agente_rag(estado: EstadoRAG):
             "mensagens": [AIMessage(content=resposta)]
         }
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    llm_com_tools = llm.bind_tools(ferramentas_rag)
+    llm = criar_modelo("gpt-4o-mini", temperature=0)
+    llm_com_tools = MONTADOR_RAG.vincular(llm)
 
-    system_prompt = SystemMessage(content="""
-Você é um assistente de suporte especializado.
+    ultima_msg = estado["mensagens"][-1]
+    # Documentos desta pergunta vão DEPOIS do histórico: system + histórico
+    # continuam um prefixo estável para o cache de prompt do provedor
+    recuperados = []
+    docs = []
 
-Use a ferramenta buscar_documentos para encontrar informações relevantes
-na base de conhecimento antes de responder.
+    if RAG_ESPECULATIVO and isinstance(ultima_msg, HumanMessage):
+        # Busca local custa ~1ms; uma rodada extra de LLM custa segundos
+        docs = _recuperar(ultima_msg.content)
+        cobertura = cobertura_termos(ultima_msg.content, docs)
 
-Sempre base suas respostas nos documentos encontrados.
-Se não encontrar informação, diga que não tem essa informação.
-""")
+        if docs:
+            recuperados.append(SystemMessage(content="Documentos já recuperados da base de conhecimento:\n" + "\n".join(docs)))
+
+        if docs and cobertura >= RAG_COBERTURA_MINIMA:
+            print(f"   ⚡ Especulativo: cobertura {cobertura:.0%}, deve responder sem tool call")
+        else:
+            print(f"   🔁 Especulativo: cobertura {cobertura:.0%}, modelo pode buscar mais")
+            docs = []
 
-    mensagens = [system_prompt] + list(estado["mensagens"])
-    resposta = llm_com_tools.invoke(mensagens)
+    # Sempre o modelo com as ferramentas: o prefixo (system + tools) fica
+    # idêntico nos dois caminhos, e o modelo ainda pode buscar se precisar
+    resposta = MONTADOR_RAG.invocar(llm_com_tools, estado["mensagens"], sufixo=recuperados)
 
+    if docs and not resposta.tool_calls:
+        return {
+            "mensagens": [resposta],
+            "documentos_relevantes": docs,
+            "resposta_final": resposta.content
+        }
     return {"mensagens": [resposta]}
 
 
@@ -157,6 +260,17 @@ def executar_ferramentas_rag(estado: EstadoRAG):
     ultima_msg = estado["mensagens"][-1]
     resultados = []
 
+    if RAG_RERANK:
+        # Só busca os candidatos; o nó "rerank" responde às tool calls
+        candidatos = {}
+        for tool_call in ultima_msg.tool_calls:
+            args = tool_call["args"]
+            candidatos[tool_call["id"]] = {
+                "query": args["query"],
+                "documentos": _recuperar(args["query"], args.get("categoria", "all"), k=RAG_CANDIDATOS),
+            }
+        return {"candidatos": candidatos}
+
     for tool_call in ultima_msg.tool_calls:
         ferramenta = ferramentas_rag[0]  # buscar_documentos
         resultado = ferramenta.invoke(tool_call["args"])
@@ -168,6 +282,33 @@ def executar_ferramentas_rag(estado: EstadoRAG):
     return {"mensagens": resultados, "documentos_relevantes": [str(r.content) for r in resultados]}
 
 
+def reranquear_documentos_rag(estado: EstadoRAG):
+    """Reordena os candidatos de cada tool call num lote e devolve os ToolMessages"""
+    print("\n🎯 [RERANK]")
+
+    from langchain_core.messages import ToolMessage
+
+    resultados = []
+    latencia = 0.0
+
+    for tool_call_id, busca in estado["candidatos"].items():
+        selecionados = RERANQUEADOR_RAG.reranquear(busca["query"], busca["documentos"])
+        medicao = RERANQUEADOR_RAG.ultima_medicao
+        latencia += medicao["latencia_ms"]
+        print(f"   {medicao['candidatos']} -> {medicao['selecionados']} documentos | "
+              f"{medicao['tokens_antes']} -> {medicao['tokens_depois']} tokens | {medicao['latencia_ms']:.2f}ms")
+
+        conteudo = "\n".join(selecionados) or "Nenhum documento relevante encontrado."
+        resultados.append(ToolMessage(content=conteudo, tool_call_id=tool_call_id))
+
+    return {
+        "mensagens": resultados,
+        "documentos_relevantes": [str(r.content) for r in resultados],
+        "candidatos": {},
+        "latencia_rerank_ms": latencia
+    }
+
+
 def should_continue_rag(estado: EstadoRAG) -> str:
     """Router para RAG agent"""
     ultima_msg = estado["mensagens"][-1]
@@ -193,7 +334,12 @@ def criar_rag_agent():
         {"ferramentas": "ferramentas", "fim": END}
     )
 
-    workflow.add_edge("ferramentas", "agente")
+    if RAG_RERANK:
+        workflow.add_node("rerank", reranquear_documentos_rag)
+        workflow.add_edge("ferramentas", "rerank")
+        workflow.add_edge("rerank", "agente")
+    else:
+        workflow.add_edge("ferramentas", "agente")
 
     return workflow.compile()
 
@@ -280,6 +426,18 @@ def executar_python(codigo: str) -> str:
 
 ferramentas_code = [executar_python]
 
+MONTADOR_PROGRAMADOR = MontadorPrompt("""
+Você é um programador especialista em Python.
+
+Quando receber uma tarefa:
+1. Escreva código Python limpo e funcional
+2. Use a ferramenta executar_python para testar o código
+3. Se houver erro, corrija e tente novamente
+4. Explique o código para o usuário
+
+Sempre teste o código antes de apresentar ao usuário!
+""", ferramentas=ferramentas_code)
+
 
 def agente_programador(estado: EstadoCodeAgent):
     """
@@ -312,23 +470,10 @@ print("Hello from Code Agent!")
             "mensagens": [AIMessage(content=f"Código gerado:\n```python\n{codigo}\n```")]
         }
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    llm_com_tools = llm.bind_tools(ferramentas_code)
-
-    system_prompt = SystemMessage(content="""
-Você é um programador especialista em Python.
-
-Quando receber uma tarefa:
-1. Escreva código Python limpo e funcional
-2. Use a ferramenta executar_python para testar o código
-3. Se houver erro, corrija e tente novamente
-4. Explique o código para o usuário
-
-Sempre teste o código antes de apresentar ao usuário!
-""")
+    llm = criar_modelo("gpt-4o-mini", temperature=0)
+    llm_com_tools = MONTADOR_PROGRAMADOR.vincular(llm)
 
-    mensagens = [system_prompt] + list(estado["mensagens"])
-    resposta = llm_com_tools.invoke(mensagens)
+    resposta = MONTADOR_PROGRAMADOR.invocar(llm_com_tools, estado["mensagens"])
 
     return {"mensagens": [resposta]}
 
@@ -519,7 +664,7 @@ def criar_research_agent():
                 "mensagens": [AIMessage(content=sintese)]
             }
 
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
+        llm = criar_modelo("gpt-4o-mini", temperature=0.3)
 
         prompt = f"""
 Você é um pesquisador especializado.
@@ -0,0 +1,107 @@
+"""
+Benchmark: busca vetorial com NumPy em 10k / 100k / 1M chunks.
+
+Para cada tamanho de corpus mede:
+- construção do índice (inserção em lotes de vetores já calculados)
+- latência por consulta (p50/p95) com argpartition vs. argsort completo
+- latência com a matriz aberta via memory-map (páginas já em cache)
+- memória da matriz
+
+Os vetores são aleatórios e normalizados: o custo da busca não depende
+do conteúdo, só de n e d. O custo do EmbeddingHash (por texto) é
+medido à parte.
+
+Executar a partir da raiz do repositório:
+    python -m benchmarks.bench_busca_vetorial
+    python -m benchmarks.bench_busca_vetorial --tamanhos 10000 100000 --dimensao 128
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from desempenho.busca_vetorial import EmbeddingHash, IndiceVetorial
+
+
+def vetores_aleatorios(rng: np.random.Generator, n: int, dimensao: int) -> np.ndarray:
+    vetores = rng.standard_normal((n, dimensao), dtype=np.float32)
+    vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+    return vetores
+
+
+def percentis(amostras: list[float]) -> tuple[float, float]:
+    ordenadas = sorted(amostras)
+    return statistics.median(ordenadas), ordenadas[int(0.95 * (len(ordenadas) - 1))]
+
+
+def medir_consultas(buscar, consultas: np.ndarray) -> tuple[float, float]:
+    tempos = []
+    for consulta in consultas:
+        inicio = time.perf_counter()
+        buscar(consulta)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return percentis(tempos)
+
+
+def top_k_argsort(indice: IndiceVetorial, consulta: np.ndarray, k: int):
+    """Referência: ordena TODOS os scores"""
+    scores = indice.vetores @ consulta
+    return np.argsort(scores)[::-1][:k]
+
+
+def bench_tamanho(n: int, dimensao: int, k: int, n_consultas: int, rng: np.random.Generator) -> None:
+    embedding = EmbeddingHash(dimensao)
+    indice = IndiceVetorial(embedding)
+
+    inicio = time.perf_counter()
+    lote = 50_000
+    for base in range(0, n, lote):
+        tamanho = min(lote, n - base)
+        indice.adicionar_vetores(range(base, base + tamanho), vetores_aleatorios(rng, tamanho, dimensao))
+    construcao = time.perf_counter() - inicio
+
+    consultas = vetores_aleatorios(rng, n_consultas, dimensao)
+    p50, p95 = medir_consultas(lambda q: indice.buscar_vetor(q, k), consultas)
+    s50, s95 = medir_consultas(lambda q: top_k_argsort(indice, q, k), consultas)
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        indice.salvar(diretorio)
+        mapeado = IndiceVetorial.carregar(diretorio, embedding, mmap=True)
+        mapeado.buscar_vetor(consultas[0], k)  # aquece o cache de páginas
+        m50, m95 = medir_consultas(lambda q: mapeado.buscar_vetor(q, k), consultas)
+        del mapeado
+
+    mb = indice.vetores.nbytes / 1024 / 1024
+    print(f"{n:>9,} | {construcao:7.2f}s | {mb:8.1f} MB | "
+          f"{p50:7.2f} / {p95:7.2f} | {s50:7.2f} / {s95:7.2f} | {m50:7.2f} / {m95:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dimensao", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--consultas", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+
+    textos = [f"Política de cancelamento {i}: reembolso proporcional até 7 dias" for i in range(2000)]
+    inicio = time.perf_counter()
+    EmbeddingHash(args.dimensao)(textos)
+    por_texto = (time.perf_counter() - inicio) / len(textos) * 1e6
+    print(f"EmbeddingHash(d={args.dimensao}): {por_texto:.0f} µs por texto\n")
+
+    print(f"d={args.dimensao}, k={args.k}, {args.consultas} consultas; latência em ms (p50 / p95)")
+    print(f"{'chunks':>9} | {'constr.':>8} | {'matriz':>11} | {'argpartition':>17} | "
+          f"{'argsort':>17} | {'memmap':>17}")
+    print("-" * 96)
+    for n in args.tamanhos:
+        bench_tamanho(n, args.dimensao, args.k, args.consultas, rng)
+
+
+if __name__ == "__main__":
+    main()
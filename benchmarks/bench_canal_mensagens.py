@@ -0,0 +1,151 @@
+"""
+Benchmark: canal de mensagens operator.add vs. SequenciaMensagens.
+
+Simula uma thread que cresce até 10k mensagens, uma mensagem por passo,
+e mede:
+- reducer: custo de anexar uma mensagem ao histórico (operator.add copia
+  a lista inteira; anexar_mensagens reaproveita os blocos selados)
+- checkpoint: tempo e bytes NOVOS por passo para serializar o canal no
+  MemorySaverLimitado com ArmazemConteudo (lista: hash de cada mensagem
+  a cada passo; sequência: só a cauda)
+- grafo: ms por turno de um StateGraph com checkpointer e os bytes
+  retidos (checkpoints residentes + armazém), lista vs. sequência
+
+Executar a partir da raiz do repositório:
+    python -m benchmarks.bench_canal_mensagens
+    python -m benchmarks.bench_canal_mensagens --tamanhos 1000 10000 --passos-grafo 500
+"""
+
+import argparse
+import operator
+import statistics
+import time
+import uuid
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, StateGraph
+
+from desempenho.blobs import ArmazemConteudo
+from desempenho.canal_mensagens import SequenciaMensagens, anexar_mensagens
+from desempenho.checkpoint_lru import MemorySaverLimitado, _tamanho
+
+
+def mensagem(i: int):
+    if i % 2 == 0:
+        return HumanMessage(content=f"Pergunta {i}: qual o status do pedido {i}?", id=f"m{i}")
+    return AIMessage(content=f"Resposta {i}: o pedido está em separação. " * 3, id=f"m{i}")
+
+
+def ms_por_passo(amostras: list[float]) -> str:
+    return f"{statistics.median(amostras) * 1000:8.3f}"
+
+
+def bench_reducer(n: int) -> None:
+    """Custo total e no fim da thread de anexar uma mensagem por passo"""
+    mensagens = [mensagem(i) for i in range(n)]
+    janela = max(1, n // 100)
+
+    for nome, reducer, inicial in (
+        ("operator.add", operator.add, []),
+        ("anexar_mensagens", anexar_mensagens, SequenciaMensagens()),
+    ):
+        historico = inicial
+        finais = []
+        inicio = time.perf_counter()
+        for i, m in enumerate(mensagens):
+            t = time.perf_counter()
+            historico = reducer(historico, [m])
+            if i >= n - janela:
+                finais.append(time.perf_counter() - t)
+        total = time.perf_counter() - inicio
+        print(f"{n:>7,} | {nome:<17} | {total * 1000:10.1f} ms | {ms_por_passo(finais)} ms")
+
+
+def bench_checkpoint(n: int) -> None:
+    """Serialização do canal num passo em que a thread tem n mensagens"""
+    mensagens = [mensagem(i) for i in range(n)]
+    lista = list(mensagens)
+    sequencia = SequenciaMensagens.de(mensagens)
+
+    for nome, valor, proximo in (
+        ("lista", lista, lista + [mensagem(n)]),
+        ("SequenciaMensagens", sequencia, anexar_mensagens(sequencia, [mensagem(n)])),
+    ):
+        armazem = ArmazemConteudo()
+        memory = MemorySaverLimitado(armazem=armazem)
+        memory._serializar("mensagens", valor)  # passo anterior: histórico já guardado
+        antes = armazem.metricas()["bytes_armazenados"]
+
+        amostras = []
+        for _ in range(5):
+            inicio = time.perf_counter()
+            blob = memory._serializar("mensagens", proximo)
+            amostras.append(time.perf_counter() - inicio)
+            memory._liberar(blob)
+        blob = memory._serializar("mensagens", proximo)
+        novos = armazem.metricas()["bytes_armazenados"] - antes + _tamanho(blob)
+        print(f"{n:>7,} | {nome:<19} | {ms_por_passo(amostras)} ms | {novos:>12,} B")
+
+
+class EstadoLista(TypedDict):
+    mensagens: Annotated[list, operator.add]
+
+
+class EstadoSequencia(TypedDict):
+    mensagens: Annotated[SequenciaMensagens, anexar_mensagens]
+
+
+def bench_grafo(passos: int) -> None:
+    """
+    Um nó que responde a cada turno; histórico salvo no checkpointer.
+    Todas as mensagens têm id (como as vindas da API), senão o armazém
+    deduplicaria envelopes idênticos e a comparação ficaria injusta.
+    """
+    for nome, estado in (("operator.add", EstadoLista), ("anexar_mensagens", EstadoSequencia)):
+        def responder(estado_atual):
+            texto = f"ok ({len(estado_atual['mensagens'])} no histórico)"
+            return {"mensagens": [AIMessage(content=texto, id=str(uuid.uuid4()))]}
+
+        workflow = StateGraph(estado)
+        workflow.add_node("responder", responder)
+        workflow.set_entry_point("responder")
+        workflow.add_edge("responder", END)
+        armazem = ArmazemConteudo()
+        memory = MemorySaverLimitado(armazem=armazem)
+        app = workflow.compile(checkpointer=memory)
+        config = {"configurable": {"thread_id": "bench"}}
+
+        inicio = time.perf_counter()
+        for i in range(passos):
+            app.invoke({"mensagens": [HumanMessage(content=f"turno {i}", id=str(uuid.uuid4()))]}, config)
+        total = time.perf_counter() - inicio
+        print(f"{passos:>7,} turnos | {nome:<17} | {total / passos * 1000:7.2f} ms/turno | "
+              f"checkpoints {memory.metricas()['bytes_residentes']:>12,} B | "
+              f"armazém {armazem.metricas()['bytes_armazenados']:>10,} B")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 5_000, 10_000])
+    parser.add_argument("--passos-grafo", type=int, default=1_000)
+    args = parser.parse_args()
+
+    print("Reducer: thread crescendo até n mensagens (total e mediana do último 1%)")
+    print(f"{'n':>7} | {'reducer':<17} | {'total':>13} | {'por passo':>11}")
+    print("-" * 60)
+    for n in args.tamanhos:
+        bench_reducer(n)
+
+    print("\nCheckpoint: serializar o canal com n mensagens (ArmazemConteudo já tem o passo anterior)")
+    print(f"{'n':>7} | {'valor':<19} | {'por passo':>11} | {'bytes novos':>14}")
+    print("-" * 62)
+    for n in args.tamanhos:
+        bench_checkpoint(n)
+
+    print("\nGrafo com MemorySaverLimitado(armazem=...)")
+    bench_grafo(args.passos_grafo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: compressão de checkpoints de conversa.
+
+Gera históricos realistas no formato dos agentes do estudo
+(03_agente_conversacional.py e o RAG Agent do 07_casos_praticos.py),
+serializa o canal "mensagens" como o checkpointer faria a cada passo
+e mede, para cada algoritmo:
+- razão de compressão (bytes originais / bytes comprimidos)
+- custo de CPU por checkpoint (compressão e descompressão)
+
+O dicionário é treinado com conversas DIFERENTES das medidas.
+
+Executar a partir da raiz do repositório:
+    python -m benchmarks.bench_compressao
+"""
+
+import random
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from desempenho.compressao import CompressaoPorCanal, treinar_dicionario
+
+
+# Trechos no formato das ferramentas e respostas dos agentes do estudo
+PERGUNTAS_RAG = [
+    "Quais são os planos disponíveis e preços?",
+    "Como funciona o cancelamento?",
+    "Vocês têm API disponível?",
+    "Qual plano tem suporte 24/7?",
+    "Vocês são compatíveis com a LGPD?",
+    "Posso fazer upgrade do Plano Basic para o Pro?",
+]
+
+DOCUMENTOS_RAG = [
+    "Produto: Plano Basic - R$29.9 - 5GB storage, suporte email",
+    "Produto: Plano Pro - R$79.9 - 50GB storage, suporte 24/7, API access",
+    "Produto: Plano Enterprise - R$199.9 - Ilimitado, suporte dedicado, SLA",
+    "Política de cancelamento: Pode cancelar a qualquer momento. Reembolso proporcional até 7 dias.",
+    "Política de upgrade: Upgrade imediato com cobrança proporcional.",
+    "Política de suporte: Basic: email. Pro: email + chat. Enterprise: telefone dedicado.",
+    "Doc api: Nossa API REST usa OAuth2. Endpoint base: api.empresa.com/v1",
+    "Doc integracao: Suportamos Zapier, Slack, Microsoft Teams",
+    "Doc seguranca: Certificação ISO 27001, LGPD compliant, criptografia end-to-end",
+]
+
+FALAS_CONVERSA = [
+    "Olá! Meu nome é {nome} e sou {profissao}.",
+    "Você lembra qual é minha profissão?",
+    "Salva uma nota lembrando que tenho reunião amanhã às {hora}h",
+    "O que você salvou pra mim?",
+    "Agenda um lembrete para sexta às {hora}h: revisar o relatório",
+]
+
+NOMES = ["Maria", "João", "Ana", "Carlos", "Beatriz", "Pedro"]
+PROFISSOES = ["designer", "desenvolvedor", "professora", "médico", "advogada"]
+
+
+def conversa_rag(rng: random.Random, turnos: int) -> list:
+    """Histórico do RAG Agent: pergunta -> tool call -> documentos -> resposta"""
+    mensagens = []
+    for t in range(turnos):
+        pergunta = rng.choice(PERGUNTAS_RAG)
+        docs = "\n".join(rng.sample(DOCUMENTOS_RAG, k=rng.randint(2, 5)))
+        call_id = f"call_{rng.getrandbits(64):016x}"
+        mensagens += [
+            HumanMessage(content=pergunta),
+            AIMessage(content="", tool_calls=[{
+                "name": "buscar_documentos", "args": {"query": pergunta, "categoria": "all"}, "id": call_id,
+            }]),
+            ToolMessage(content=docs, tool_call_id=call_id),
+            AIMessage(content=f"Baseado na documentação:\n{docs}"),
+        ]
+    return mensagens
+
+
+def conversa_assistente(rng: random.Random, turnos: int) -> list:
+    """Histórico do agente conversacional do 03 (com ferramentas de nota/lembrete)"""
+    nome, profissao = rng.choice(NOMES), rng.choice(PROFISSOES)
+    mensagens = []
+    for t in range(turnos):
+        fala = rng.choice(FALAS_CONVERSA).format(nome=nome, profissao=profissao, hora=rng.randint(8, 18))
+        mensagens.append(HumanMessage(content=fala))
+        if "nota" in fala or "lembrete" in fala:
+            call_id = f"call_{rng.getrandbits(64):016x}"
+            mensagens += [
+                AIMessage(content="", tool_calls=[{
+                    "name": "salvar_nota", "args": {"titulo": "Lembrete", "conteudo": fala}, "id": call_id,
+                }]),
+                ToolMessage(content="Nota 'Lembrete' salva com sucesso!", tool_call_id=call_id),
+            ]
+        mensagens.append(AIMessage(content=f"Claro, {nome}! Como {profissao}, {fala.lower()} Anotado."))
+    return mensagens
+
+
+def checkpoints(serde, conversas: list) -> list[tuple[str, bytes]]:
+    """Serializa o canal "mensagens" a cada passo, como o checkpointer faz"""
+    payloads = []
+    for mensagens in conversas:
+        for fim in range(2, len(mensagens) + 1, 2):
+            payloads.append(serde.dumps_typed(mensagens[:fim]))
+    return payloads
+
+
+def medir(nome: str, compressao: CompressaoPorCanal, payloads: list) -> None:
+    comprimidos = []
+    inicio = time.perf_counter()
+    for p in payloads:
+        comprimidos.append(compressao.comprimir("mensagens", p))
+    t_comp = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for c in comprimidos:
+        compressao.descomprimir(c)
+    t_desc = time.perf_counter() - inicio
+
+    originais = sum(len(p[1]) for p in payloads)
+    finais = sum(len(c[1]) for c in comprimidos)
+    n = len(payloads)
+    print(f"  {nome:<10} razão {originais / finais:5.2f}x   "
+          f"compressão {t_comp / n * 1e6:7.1f} µs/ckpt   "
+          f"descompressão {t_desc / n * 1e6:7.1f} µs/ckpt")
+
+
+def main():
+    serde = JsonPlusSerializer()
+    rng = random.Random(42)
+
+    treino = [conversa_rag(rng, 5) for _ in range(30)] + [conversa_assistente(rng, 5) for _ in range(30)]
+    dicionario = treinar_dicionario(p[1] for p in checkpoints(serde, treino))
+    print(f"Dicionário treinado: {len(dicionario)} bytes")
+
+    cenarios = {
+        "RAG Agent (07)": [conversa_rag(rng, 10) for _ in range(20)],
+        "Conversacional (03)": [conversa_assistente(rng, 10) for _ in range(20)],
+    }
+
+    for cenario, conversas in cenarios.items():
+        payloads = checkpoints(serde, conversas)
+        media = sum(len(p[1]) for p in payloads) / len(payloads)
+        print(f"\n{cenario}: {len(payloads)} checkpoints, {media:.0f} bytes em média")
+        for algoritmo in ("zlib", "zlib-dict", "lzma"):
+            compressao = CompressaoPorCanal({"mensagens": algoritmo}, dicionario)
+            medir(algoritmo, compressao, payloads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: bytes por mensagem no histórico, BaseMessage vs. BlocoCompacto.
+
+Mede com tracemalloc a memória retida por um histórico de n mensagens
+no formato de uma conversa real com ferramentas (pergunta, tool call,
+resultado, resposta com response_metadata/usage_metadata):
+- lista de BaseMessage (o que operator.add/add_messages guardam)
+- SequenciaMensagens (blocos selados em colunas + cauda)
+
+E o custo de reidratar (colunas -> BaseMessage), que é pago quando o
+histórico é lido para enviar ao modelo.
+
+Executar a partir da raiz do repositório:
+    python -m benchmarks.bench_mensagens_compactas
+    python -m benchmarks.bench_mensagens_compactas --tamanhos 10000 100000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from desempenho.canal_mensagens import SequenciaMensagens
+
+
+def turno(i: int) -> list[BaseMessage]:
+    metadados = {
+        "response_metadata": {"model_name": "gpt-4o-mini", "finish_reason": "stop", "system_fingerprint": "fp_0"},
+        "usage_metadata": {"input_tokens": 250, "output_tokens": 30, "total_tokens": 280},
+    }
+    chamada = {"id": f"call_{i:08d}", "name": "buscar_documentos", "args": {"query": f"pedido {i}"}}
+    return [
+        HumanMessage(content=f"Qual o status do pedido {i}?", id=f"h-{i:08d}"),
+        AIMessage(content="", tool_calls=[chamada], id=f"run-{i:08d}-0", **metadados),
+        ToolMessage(content=f"Pedido {i}: em separação, envio previsto para amanhã.",
+                    tool_call_id=chamada["id"], name="buscar_documentos", id=f"t-{i:08d}"),
+        AIMessage(content=f"Seu pedido {i} está em separação e deve sair amanhã.", id=f"run-{i:08d}-1", **metadados),
+    ]
+
+
+def historico(n: int) -> list[BaseMessage]:
+    mensagens = []
+    for i in range(n // 4 + 1):
+        mensagens.extend(turno(i))
+    return mensagens[:n]
+
+
+def bytes_retidos(construir) -> tuple[object, int]:
+    gc.collect()
+    tracemalloc.start()
+    objeto = construir()
+    gc.collect()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return objeto, atual
+
+
+def bench(n: int) -> None:
+    lista, bytes_lista = bytes_retidos(lambda: historico(n))
+    # A sequência é medida sem a lista original viva: só o que ela retém
+    sequencia, bytes_sequencia = bytes_retidos(lambda: SequenciaMensagens.de(historico(n)))
+    del lista
+
+    inicio = time.perf_counter()
+    for _ in sequencia:
+        pass
+    reidratar = (time.perf_counter() - inicio) / n * 1e6
+
+    print(f"{n:>9,} | {bytes_lista / n:10.0f} | {bytes_sequencia / n:10.0f} | "
+          f"{bytes_lista / bytes_sequencia:6.1f}x | {reidratar:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    print("Bytes retidos por mensagem (tracemalloc) e custo de reidratação")
+    print(f"{'mensagens':>9} | {'BaseMessage':>10} | {'compacto':>10} | {'razão':>7} | {'µs/msg':>8}")
+    print("-" * 58)
+    for n in args.tamanhos:
+        bench(n)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+===========================================
+ESTUDO GUIADO LANGGRAPH - MÓDULOS DE DESEMPENHO
+===========================================
+
+Componentes reutilizáveis pelos arquivos do estudo (01 a 07) quando
+os agentes saem do exemplo e vão para produção.
+
+Cada submódulo é independente e deve ser importado diretamente,
+por exemplo:
+
+    from desempenho.checkpoint_lru import MemorySaverLimitado
+
+Submódulos:
+- checkpoint_lru: Checkpointer em memória com orçamento e despejo LRU
+- versoes: Histórico de versões indexado e viagem no tempo
+- compressao: Compressão por canal com dicionário treinado (zlib/lzma)
+- write_behind: Gravação de checkpoints em segundo plano (fila limitada)
+- tarefas: Armazém de tarefas indexado por id, status e criação
+- blobs: Armazém endereçado por conteúdo (deduplicação de mensagens)
+- busca_lexica: Índice invertido com ranking BM25 para português
+- busca_vetorial: Índice denso em matriz NumPy (top-k por argpartition)
+- busca_hibrida: BM25 + busca densa em paralelo com Reciprocal Rank Fusion
+- ingestao: Leitura em streaming de JSONL/Markdown, chunking e indexação incremental
+- tokens: Contagem de tokens (estimativa local ou tokenizador plugável)
+- reranking: Reranking em lote dos candidatos com orçamento de tokens
+- shards: Índice particionado por categoria com busca paralela
+- contexto: Janela de contexto com orçamento de tokens (grupos de tool call intactos)
+- compactacao: Resumo corrente incremental dos turnos antigos, em segundo plano
+- canal_mensagens: Histórico append-only em blocos compartilhados (reducer anexar_mensagens)
+- mensagens_compactas: Mensagens em colunas (papel, textos UTF-8, offsets), reidratadas na leitura
+- montador_prompt: Prompt com prefixo estável (system canônico, ferramentas ordenadas) e métricas de cache
+- limitador: Token buckets rpm/tpm, concorrência AIMD e fila justa por conversa
+- coalescencia: Single-flight: chamadas idênticas em voo viram uma só requisição (sync e async)
+- hedging: Requisição duplicada no p95 observado para chamadas idempotentes (taxa limitada)
+- intencoes: Roteador local de intenções (regex combinada sobre texto normalizado, µs)
+- cascata: Regras/modelo rápido primeiro, escalada por confiança (JSON, rótulo, logprob)
+- json_incremental: Parser JSON incremental, reparo local e decisões lidas do stream até o campo de roteamento
+- modelos: criar_modelo() com limitador compartilhado, coalescência e hedge opcional
+
+Módulos com demonstração rodam a partir da raiz do repositório:
+    python -m desempenho.<modulo>
+
+Benchmarks ficam em benchmarks/ (python -m benchmarks.<nome>).
+"""
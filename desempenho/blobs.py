@@ -0,0 +1,106 @@
+"""
+Armazém de conteúdo endereçado por hash (content-addressed storage).
+
+Em checkpoints de conversa o mesmo conteúdo aparece MUITAS vezes:
+- Cada checkpoint de uma thread repete o histórico inteiro
+- Saídas idênticas de ferramentas (ex: buscar_documentos) se repetem
+  em threads de usuários diferentes
+
+O ArmazemConteudo guarda cada conteúdo UMA vez, identificado pelo
+seu hash SHA-256. Checkpoints guardam só os hashes. Uma contagem de
+referências diz quando um conteúdo não é mais usado por ninguém e
+pode ser coletado.
+
+Uso:
+    armazem = ArmazemConteudo()
+    memory = MemorySaverLimitado(armazem=armazem)   # pode ser compartilhado
+    print(armazem.metricas())
+"""
+
+import hashlib
+import threading
+
+
+class ArmazemConteudo:
+    """
+    Blobs endereçados por conteúdo com contagem de referências.
+
+    Args:
+        coletar_imediatamente: Remove o blob assim que a contagem chega a
+            zero. Se False, blobs sem referência ficam até coletar().
+    """
+
+    def __init__(self, coletar_imediatamente: bool = True):
+        self.coletar_imediatamente = coletar_imediatamente
+        self._blobs: dict[str, bytes] = {}
+        self._referencias: dict[str, int] = {}
+        self._bytes_logicos = 0
+        self._bytes_referenciados = 0
+        self._lock = threading.Lock()
+
+    def guardar(self, dados: bytes) -> str:
+        """Guarda o conteúdo (se ainda não existir) e adiciona uma referência"""
+        chave = hashlib.sha256(dados).hexdigest()
+        with self._lock:
+            if chave not in self._blobs:
+                self._blobs[chave] = dados
+                self._referencias[chave] = 0
+            if self._referencias[chave] == 0:
+                self._bytes_referenciados += len(self._blobs[chave])
+            self._referencias[chave] += 1
+            self._bytes_logicos += len(dados)
+        return chave
+
+    def obter(self, chave: str) -> bytes:
+        return self._blobs[chave]
+
+    def referenciar(self, chave: str) -> bool:
+        """
+        Adiciona uma referência a um conteúdo já guardado. Retorna False
+        (sem referenciar) se o conteúdo já foi coletado.
+        """
+        with self._lock:
+            if chave not in self._blobs:
+                return False
+            if self._referencias[chave] == 0:
+                self._bytes_referenciados += len(self._blobs[chave])
+            self._referencias[chave] += 1
+            self._bytes_logicos += len(self._blobs[chave])
+            return True
+
+    def liberar(self, chave: str) -> None:
+        """Remove uma referência; sem referências, o conteúdo pode ser coletado"""
+        with self._lock:
+            self._referencias[chave] -= 1
+            self._bytes_logicos -= len(self._blobs[chave])
+            if self._referencias[chave] == 0:
+                self._bytes_referenciados -= len(self._blobs[chave])
+            if self._referencias[chave] == 0 and self.coletar_imediatamente:
+                del self._blobs[chave]
+                del self._referencias[chave]
+
+    def coletar(self) -> int:
+        """Remove conteúdos sem referências. Retorna quantos foram removidos."""
+        with self._lock:
+            mortos = [chave for chave, n in self._referencias.items() if n <= 0]
+            for chave in mortos:
+                del self._blobs[chave]
+                del self._referencias[chave]
+            return len(mortos)
+
+    def bytes_referenciados(self) -> int:
+        """Bytes dos conteúdos ainda referenciados (o que coletar() não libera), em O(1)"""
+        return self._bytes_referenciados
+
+    def metricas(self) -> dict:
+        """Bytes realmente guardados vs. bytes que seriam guardados sem deduplicação"""
+        with self._lock:
+            armazenados = sum(len(b) for b in self._blobs.values())
+            return {
+                "blobs": len(self._blobs),
+                "referencias": sum(self._referencias.values()),
+                "bytes_armazenados": armazenados,
+                "bytes_referenciados": self._bytes_referenciados,
+                "bytes_logicos": self._bytes_logicos,
+                "razao_deduplicacao": round(self._bytes_logicos / armazenados, 2) if armazenados else 1.0,
+            }
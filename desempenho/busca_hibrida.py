@@ -0,0 +1,179 @@
+"""
+Busca híbrida: lexical (BM25) + densa (embeddings) com Reciprocal Rank Fusion.
+
+Cada busca sozinha erra de um jeito:
+- BM25 acerta nomes exatos ("Plano Enterprise", "OAuth2") mas não
+  entende paráfrases ("como encerro minha conta?")
+- A busca densa entende paráfrases mas mistura nomes parecidos
+
+A BuscaHibrida consulta os dois índices AO MESMO TEMPO (thread pool;
+o produto matriz-vetor do NumPy libera o GIL) e junta as listas com
+Reciprocal Rank Fusion:
+
+    score(doc) = soma, em cada lista, de peso / (k_rrf + posição)
+
+RRF usa só as POSIÇÕES, então não é preciso calibrar scores BM25 contra
+similaridades de cosseno. Por isso mesmo o RRF não sabe se o 1º da lista
+densa é relevante: a busca densa sempre devolve k vizinhos. Dê um piso
+ao índice denso (IndiceVetorial(..., score_minimo=...)) para que uma
+consulta sem termo em comum e sem similaridade clara volte vazia.
+
+Cada busca registra o tempo de cada etapa (lexica, densa, fusao, total)
+em ms, para ajustar o orçamento de latência:
+
+    busca = BuscaHibrida(indice_bm25, indice_vetorial)
+    busca.buscar("como cancelo?", k=5)
+    busca.ultimos_tempos   # {"lexica": 0.1, "densa": 0.4, "fusao": 0.01, "total": 0.6}
+    busca.metricas()       # p50/p95 por etapa
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Optional, Sequence
+
+
+def fundir_rrf(
+    listas: Sequence[Sequence[tuple[Hashable, float]]],
+    k_rrf: int = 60,
+    pesos: Optional[Sequence[float]] = None,
+) -> list[tuple[Hashable, float]]:
+    """Reciprocal Rank Fusion de listas ranqueadas [(doc_id, score)]"""
+    pesos = pesos or [1.0] * len(listas)
+    scores: dict[Hashable, float] = {}
+    for lista, peso in zip(listas, pesos):
+        for posicao, (doc_id, _) in enumerate(lista, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + peso / (k_rrf + posicao)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BuscaHibrida:
+    """
+    Combina dois índices com a interface buscar(consulta, k, filtro).
+
+    Args:
+        lexico: Índice lexical (ex: IndiceBM25)
+        denso: Índice denso (ex: IndiceVetorial)
+        k_rrf: Constante do RRF (60 é o valor usual da literatura)
+        candidatos: Quantos resultados pedir a cada índice antes da fusão
+        pesos: Peso (lexico, denso) na fusão
+        amostras: Quantas medições guardar para metricas()
+    """
+
+    ETAPAS = ("lexica", "densa", "fusao", "total")
+
+    def __init__(
+        self,
+        lexico,
+        denso,
+        k_rrf: int = 60,
+        candidatos: int = 20,
+        pesos: tuple[float, float] = (1.0, 1.0),
+        amostras: int = 1000,
+    ):
+        self.lexico = lexico
+        self.denso = denso
+        self.k_rrf = k_rrf
+        self.candidatos = candidatos
+        self.pesos = pesos
+        self.ultimos_tempos: dict[str, float] = {}
+        self._historico = {etapa: deque(maxlen=amostras) for etapa in self.ETAPAS}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="busca-hibrida")
+
+    def __len__(self) -> int:
+        return len(self.lexico)
+
+    def adicionar_lote(self, documentos) -> None:
+        """Indexa os mesmos documentos nos dois índices"""
+        documentos = list(documentos)
+        self.lexico.adicionar_lote(documentos)
+        self.denso.adicionar_lote(documentos)
+
+    def remover(self, doc_id) -> bool:
+        removido = self.lexico.remover(doc_id)
+        return self.denso.remover(doc_id) or removido
+
+    @staticmethod
+    def _cronometrar(buscar: Callable, *args) -> tuple[list, float]:
+        inicio = time.perf_counter()
+        resultado = buscar(*args)
+        return resultado, (time.perf_counter() - inicio) * 1000
+
+    def buscar(
+        self,
+        consulta: str,
+        k: int = 5,
+        filtro: Optional[Callable[[Hashable], bool]] = None,
+    ) -> list[tuple[Hashable, float]]:
+        """Os k documentos com maior score RRF"""
+        inicio = time.perf_counter()
+        n = max(k, self.candidatos)
+
+        futuro_denso = self._executor.submit(self._cronometrar, self.denso.buscar, consulta, n, filtro)
+        lexicos, t_lexica = self._cronometrar(self.lexico.buscar, consulta, n, filtro)
+        densos, t_densa = futuro_denso.result()
+
+        inicio_fusao = time.perf_counter()
+        fundidos = fundir_rrf([lexicos, densos], self.k_rrf, self.pesos)[:k]
+        fim = time.perf_counter()
+
+        tempos = {
+            "lexica": t_lexica,
+            "densa": t_densa,
+            "fusao": (fim - inicio_fusao) * 1000,
+            "total": (fim - inicio) * 1000,
+        }
+        with self._lock:
+            self.ultimos_tempos = tempos
+            for etapa, ms in tempos.items():
+                self._historico[etapa].append(ms)
+        return fundidos
+
+    def metricas(self) -> dict:
+        """p50/p95 (ms) de cada etapa nas últimas buscas"""
+        with self._lock:
+            resumo = {}
+            for etapa, amostras in self._historico.items():
+                ordenadas = sorted(amostras)
+                if not ordenadas:
+                    continue
+                resumo[etapa] = {
+                    "p50_ms": round(ordenadas[len(ordenadas) // 2], 3),
+                    "p95_ms": round(ordenadas[int(0.95 * (len(ordenadas) - 1))], 3),
+                }
+            resumo["buscas"] = len(self._historico["total"])
+            return resumo
+
+    def fechar(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    from desempenho.busca_lexica import IndiceBM25
+    from desempenho.busca_vetorial import EmbeddingHash, IndiceVetorial
+
+    documentos = [
+        ("basic", "Produto: Plano Basic - R$29.9 - 5GB storage, suporte email"),
+        ("pro", "Produto: Plano Pro - R$79.9 - 50GB storage, suporte 24/7, API access"),
+        ("enterprise", "Produto: Plano Enterprise - R$199.9 - Ilimitado, suporte dedicado, SLA"),
+        ("cancelamento", "Política de cancelamento: Pode cancelar a qualquer momento. Reembolso proporcional até 7 dias."),
+        ("seguranca", "Doc seguranca: Certificação ISO 27001, LGPD compliant, criptografia end-to-end"),
+    ]
+
+    lexico = IndiceBM25()
+    lexico.adicionar_lote(documentos)
+    denso = IndiceVetorial(EmbeddingHash(), score_minimo=0.2)
+    denso.adicionar_lote(documentos)
+    busca = BuscaHibrida(lexico, denso)
+
+    for pergunta in ["Plano Enterprise", "quero cancelamentos e reembolsos", "dados criptografados?", "xyzzy qwerty"]:
+        print(f"{pergunta!r}")
+        print(f"   lexica: {[d for d, _ in lexico.buscar(pergunta, 3)]}")
+        print(f"   densa:  {[d for d, _ in denso.buscar(pergunta, 3)]}")
+        print(f"   rrf:    {[d for d, _ in busca.buscar(pergunta, 3)]}")
+        print(f"   tempos: { {etapa: round(ms, 3) for etapa, ms in busca.ultimos_tempos.items()} }")
+
+    print(busca.metricas())
+    busca.fechar()
@@ -0,0 +1,215 @@
+"""
+Busca lexical com índice invertido e ranking BM25.
+
+O buscar_documentos original fazia "query in texto" em TODOS os
+documentos a cada chamada: custo linear no tamanho da base, e nenhum
+resultado para perguntas com várias palavras que não aparecem
+literalmente no texto ("Quanto custa o plano mais caro?").
+
+Aqui o texto passa por uma normalização pensada para português:
+- minúsculas e remoção de acentos ("Políticas" -> "politicas")
+- remoção de stopwords ("de", "o", "que", ...)
+- redução a um radical simples ("planos", "plano" -> "plano";
+  "cancelamento", "cancelar" -> "cancel")
+- sinônimos de domínio viram um termo só ("custa", "valor", "caro" e o
+  símbolo "R$" -> "preco"), do mesmo jeito no documento e na consulta:
+  "Quanto custa o plano mais caro?" acha "Plano Pro - R$79.9"
+
+O índice invertido (termo -> documentos) é construído uma vez; a busca
+só visita os documentos que contêm algum termo da consulta, e o BM25
+ordena por relevância.
+
+Uso:
+    indice = IndiceBM25()
+    indice.adicionar("doc1", "Plano Pro com suporte 24/7")
+    indice.buscar("qual plano tem suporte?", k=3)  # [("doc1", 1.23)]
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Callable, Hashable, Iterable, Optional
+
+
+STOPWORDS_PT = frozenset("""
+a ao aos aquela aquele aquilo as ate com como da das de dela dele deles
+do dos e ela ele eles em entre era essa esse esta este eu foi for ha isso
+isto ja la lhe mais mas me mesmo meu minha muito na nao nas nem no nos
+nossa nosso num numa o os ou para pela pelas pelo pelos por qual quais
+quando que quem se sem ser seu sua sao so sobre tambem te tem tu tua um
+uma umas uns voce voces vos
+""".split())
+
+_PALAVRA = re.compile(r"[a-z0-9]+")
+
+# Radical -> termo canônico (aplicado depois do stemmer, nos dois lados)
+SINONIMOS_PT = {
+    "custa": "preco", "custam": "preco", "custo": "preco", "valor": "preco",
+    "caro": "preco", "cara": "preco", "barato": "preco", "barata": "preco",
+}
+# "R$29.9" é um preço: o símbolo vira o termo "preco"
+_MOEDA = re.compile(r"r\$")
+
+# (sufixo, substituição, tamanho mínimo do radical resultante)
+_PLURAIS = [
+    ("oes", "ao", 2), ("aes", "ao", 2), ("ais", "al", 2), ("eis", "el", 2),
+    ("ois", "ol", 2), ("ns", "m", 2), ("res", "r", 3), ("s", "", 3),
+]
+_SUFIXOS = [
+    ("amentos", "", 4), ("imentos", "", 4), ("amento", "", 4), ("imento", "", 4),
+    ("acoes", "", 3), ("acao", "", 3), ("mente", "", 4), ("idades", "", 4),
+    ("idade", "", 4), ("ismo", "", 4), ("ista", "", 4), ("avel", "", 4),
+    ("ivel", "", 4), ("ador", "", 4), ("ancia", "", 4), ("encia", "", 4),
+    ("ando", "", 4), ("endo", "", 4), ("indo", "", 4), ("ar", "", 4),
+    ("er", "", 4), ("ir", "", 4), ("ica", "", 4), ("ico", "", 4),
+]
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas e sem acentos"""
+    decomposto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def radical(palavra: str) -> str:
+    """Stemmer leve para português: plural, depois um sufixo derivacional"""
+    for sufixo, troca, minimo in _PLURAIS:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= minimo:
+            if sufixo == "s" and palavra.endswith(("ss", "us", "is")):
+                break
+            palavra = palavra[:-len(sufixo)] + troca
+            break
+    for sufixo, troca, minimo in _SUFIXOS:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= minimo:
+            return palavra[:-len(sufixo)] + troca
+    return palavra
+
+
+def tokenizar(texto: str) -> list[str]:
+    """Texto -> lista de radicais (sem stopwords, sinônimos unificados)"""
+    termos = []
+    for palavra in _PALAVRA.findall(_MOEDA.sub(" preco ", normalizar(texto))):
+        if palavra not in STOPWORDS_PT:
+            termo = radical(palavra)
+            termos.append(SINONIMOS_PT.get(termo, termo))
+    return termos
+
+
+class IndiceBM25:
+    """
+    Índice invertido com ranking BM25 e atualização incremental.
+
+    Args:
+        k1: Saturação da frequência do termo
+        b: Peso da normalização pelo tamanho do documento
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # termo -> {doc_id: frequência}
+        self._postings: dict[str, dict[Hashable, int]] = {}
+        # doc_id -> (tamanho, termos distintos)
+        self._documentos: dict[Hashable, tuple[int, tuple[str, ...]]] = {}
+        self._tamanho_total = 0
+
+    def __len__(self) -> int:
+        return len(self._documentos)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._documentos
+
+    def adicionar(self, doc_id: Hashable, texto: str) -> None:
+        """Indexa (ou reindexa) um documento"""
+        if doc_id in self._documentos:
+            self.remover(doc_id)
+
+        frequencias = Counter(tokenizar(texto))
+        tamanho = sum(frequencias.values())
+        for termo, freq in frequencias.items():
+            self._postings.setdefault(termo, {})[doc_id] = freq
+        self._documentos[doc_id] = (tamanho, tuple(frequencias))
+        self._tamanho_total += tamanho
+
+    def adicionar_lote(self, documentos: Iterable[tuple[Hashable, str]]) -> None:
+        for doc_id, texto in documentos:
+            self.adicionar(doc_id, texto)
+
+    def remover(self, doc_id: Hashable) -> bool:
+        """Remove um documento do índice. Retorna False se não existia."""
+        registro = self._documentos.pop(doc_id, None)
+        if registro is None:
+            return False
+
+        tamanho, termos = registro
+        for termo in termos:
+            postings = self._postings[termo]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[termo]
+        self._tamanho_total -= tamanho
+        return True
+
+    def estatisticas(self, consulta: str) -> tuple[int, int, dict[str, int]]:
+        """
+        (documentos, tamanho total, df de cada termo da consulta). Somadas
+        entre shards, dão as estatísticas do corpus inteiro para buscar().
+        """
+        termos = set(tokenizar(consulta))
+        return len(self._documentos), self._tamanho_total, {
+            termo: len(self._postings[termo]) for termo in termos if termo in self._postings
+        }
+
+    def buscar(
+        self,
+        consulta: str,
+        k: int = 5,
+        filtro: Optional[Callable[[Hashable], bool]] = None,
+        estatisticas: Optional[tuple[int, int, dict[str, int]]] = None,
+    ) -> list[tuple[Hashable, float]]:
+        """
+        Os k documentos mais relevantes para a consulta, com seus scores.
+
+        Args:
+            consulta: Texto livre
+            k: Quantidade de resultados
+            filtro: Se informado, só documentos com filtro(doc_id) verdadeiro
+            estatisticas: IDF e tamanho médio vêm daqui (veja estatisticas()),
+                não deste índice: scores de shards diferentes ficam comparáveis
+        """
+        if not self._documentos:
+            return []
+        n, tamanho_total, dfs = estatisticas or (len(self._documentos), self._tamanho_total, {})
+        media = tamanho_total / n
+
+        scores: dict[Hashable, float] = {}
+        for termo in set(tokenizar(consulta)):
+            postings = self._postings.get(termo)
+            if not postings:
+                continue
+            df = dfs.get(termo, len(postings))
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, freq in postings.items():
+                if filtro is not None and not filtro(doc_id):
+                    continue
+                tamanho = self._documentos[doc_id][0]
+                peso = freq * (self.k1 + 1) / (freq + self.k1 * (1 - self.b + self.b * tamanho / media))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * peso
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def cobertura_termos(consulta: str, textos: Iterable[str]) -> float:
+    """
+    Fração dos termos (radicais) da consulta que aparece em algum dos
+    textos. 1.0 = todo termo da pergunta está no contexto recuperado.
+    """
+    termos = set(tokenizar(consulta))
+    if not termos:
+        return 0.0
+    encontrados = set()
+    for texto in textos:
+        encontrados.update(termos.intersection(tokenizar(texto)))
+    return len(encontrados) / len(termos)
@@ -0,0 +1,307 @@
+"""
+Busca vetorial (densa) com NumPy.
+
+O índice BM25 (busca_lexica) só encontra documentos que compartilham
+termos com a pergunta. A busca densa compara EMBEDDINGS e também acha
+correspondências aproximadas ("assinatura" vs "plano", erros de
+digitação, variações de palavra).
+
+Layout pensado para desempenho:
+- Todos os vetores numa única matriz float32 contígua (n x d)
+- Similaridade de TODOS os documentos com um único produto
+  matriz-vetor (BLAS), em vez de um loop Python por documento
+- Top-k com np.argpartition: O(n), ordenando só os k escolhidos
+- A matriz pode ser salva em disco e aberta com memory-map, então
+  corpora maiores que a RAM são paginados sob demanda pelo SO
+
+A função de embedding é plugável: qualquer callable que receba uma
+lista de textos e devolva uma matriz (n x d). EmbeddingHash é local,
+determinística e funciona offline; em produção troque por um modelo
+de embeddings de verdade.
+
+Uso:
+    indice = IndiceVetorial(EmbeddingHash())
+    indice.adicionar_lote([("doc1", "Plano Pro com suporte 24/7")])
+    indice.buscar("tem atendimento o dia todo?", k=3)
+
+    indice.salvar("/tmp/indice")
+    indice = IndiceVetorial.carregar("/tmp/indice", EmbeddingHash())  # memmap
+
+Benchmark: python -m benchmarks.bench_busca_vetorial
+"""
+
+import json
+import os
+import zlib
+from typing import Callable, Hashable, Iterable, Optional, Sequence
+
+import numpy as np
+
+from desempenho.busca_lexica import normalizar, tokenizar
+
+
+FuncaoEmbedding = Callable[[Sequence[str]], np.ndarray]
+
+
+class EmbeddingHash:
+    """
+    Embedding local por feature hashing.
+
+    Cada radical (tokenizar) e cada trigrama de caracteres vira uma
+    posição do vetor via crc32; o vetor é normalizado (norma 1), então
+    produto escalar = similaridade de cosseno. Os trigramas aproximam
+    palavras parecidas que o stemmer não une.
+
+    Args:
+        dimensao: Tamanho do vetor
+        peso_trigramas: Peso dos trigramas em relação aos radicais
+    """
+
+    def __init__(self, dimensao: int = 256, peso_trigramas: float = 0.5):
+        self.dimensao = dimensao
+        self.peso_trigramas = peso_trigramas
+
+    def _acumular(self, vetor: np.ndarray, chave: str, peso: float) -> None:
+        h = zlib.crc32(chave.encode())
+        vetor[h % self.dimensao] += peso if h & 0x80000000 else -peso
+
+    def __call__(self, textos: Sequence[str]) -> np.ndarray:
+        matriz = np.zeros((len(textos), self.dimensao), dtype=np.float32)
+        for i, texto in enumerate(textos):
+            for termo in tokenizar(texto):
+                self._acumular(matriz[i], termo, 1.0)
+            for palavra in normalizar(texto).split():
+                palavra = f"#{palavra}#"
+                for j in range(len(palavra) - 2):
+                    self._acumular(matriz[i], palavra[j:j + 3], self.peso_trigramas)
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        np.divide(matriz, normas, out=matriz, where=normas > 0)
+        return matriz
+
+
+class IndiceVetorial:
+    """
+    Matriz float32 contígua de embeddings com top-k por argpartition.
+
+    Remoção troca a linha removida pela última (O(d)), então a matriz
+    nunca tem buracos. A capacidade dobra quando enche (inserção
+    amortizada O(d)).
+
+    Args:
+        embedding: Função textos -> matriz (n x d)
+        dimensao: Dimensão dos vetores (padrão: embedding.dimensao)
+        capacidade_inicial: Linhas pré-alocadas
+        score_minimo: Piso de similaridade padrão de buscar(). Sem piso, o
+            top-k sempre vem cheio, mesmo para uma consulta sem relação
+            com a base; numa BuscaHibrida, o piso vale antes da fusão
+    """
+
+    def __init__(
+        self,
+        embedding: FuncaoEmbedding,
+        dimensao: Optional[int] = None,
+        capacidade_inicial: int = 1024,
+        score_minimo: float = 0.0,
+    ):
+        self.embedding = embedding
+        self.score_minimo = score_minimo
+        self.dimensao = dimensao or getattr(embedding, "dimensao")
+        self._matriz = np.empty((capacidade_inicial, self.dimensao), dtype=np.float32)
+        self._n = 0
+        self._ids: list[Hashable] = []
+        self._posicao: dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._posicao
+
+    @property
+    def vetores(self) -> np.ndarray:
+        """View (sem cópia) das linhas ocupadas"""
+        return self._matriz[:self._n]
+
+    def _garantir_capacidade(self, extra: int) -> None:
+        necessario = self._n + extra
+        somente_leitura = not self._matriz.flags.writeable
+        if necessario <= len(self._matriz) and not somente_leitura:
+            return
+        capacidade = max(necessario, 2 * len(self._matriz), 1024)
+        nova = np.empty((capacidade, self.dimensao), dtype=np.float32)
+        nova[:self._n] = self._matriz[:self._n]
+        # Uma matriz memory-mapped (somente leitura) vira RAM na primeira escrita
+        self._matriz = nova
+
+    # ---------------------------------------------------------------
+    # Escrita
+    # ---------------------------------------------------------------
+
+    def adicionar_vetores(self, doc_ids: Sequence[Hashable], vetores: np.ndarray) -> None:
+        """Insere vetores já calculados (devem estar normalizados)"""
+        vetores = np.asarray(vetores, dtype=np.float32)
+        if vetores.shape != (len(doc_ids), self.dimensao):
+            raise ValueError(f"Esperado ({len(doc_ids)}, {self.dimensao}), recebido {vetores.shape}")
+
+        novos = []
+        for doc_id, vetor in zip(doc_ids, vetores):
+            if doc_id in self._posicao:
+                # Atualização: sobrescreve a linha existente
+                if not self._matriz.flags.writeable:
+                    self._garantir_capacidade(0)
+                self._matriz[self._posicao[doc_id]] = vetor
+            else:
+                novos.append((doc_id, vetor))
+        if not novos:
+            return
+
+        self._garantir_capacidade(len(novos))
+        inicio = self._n
+        self._matriz[inicio:inicio + len(novos)] = np.stack([v for _, v in novos])
+        for i, (doc_id, _) in enumerate(novos):
+            self._posicao[doc_id] = inicio + i
+            self._ids.append(doc_id)
+        self._n += len(novos)
+
+    def adicionar(self, doc_id: Hashable, texto: str) -> None:
+        self.adicionar_vetores([doc_id], self.embedding([texto]))
+
+    def adicionar_lote(self, documentos: Iterable[tuple[Hashable, str]], tamanho_lote: int = 512) -> None:
+        """Indexa documentos calculando embeddings em lotes"""
+        lote: list[tuple[Hashable, str]] = []
+        for documento in documentos:
+            lote.append(documento)
+            if len(lote) >= tamanho_lote:
+                self.adicionar_vetores([d for d, _ in lote], self.embedding([t for _, t in lote]))
+                lote = []
+        if lote:
+            self.adicionar_vetores([d for d, _ in lote], self.embedding([t for _, t in lote]))
+
+    def remover(self, doc_id: Hashable) -> bool:
+        """Remove em O(d) trocando pela última linha. Retorna False se não existia."""
+        posicao = self._posicao.pop(doc_id, None)
+        if posicao is None:
+            return False
+
+        self._garantir_capacidade(0)
+        ultima = self._n - 1
+        if posicao != ultima:
+            self._matriz[posicao] = self._matriz[ultima]
+            movido = self._ids[ultima]
+            self._ids[posicao] = movido
+            self._posicao[movido] = posicao
+        self._ids.pop()
+        self._n -= 1
+        return True
+
+    # ---------------------------------------------------------------
+    # Busca
+    # ---------------------------------------------------------------
+
+    def buscar_vetor(
+        self,
+        vetor: np.ndarray,
+        k: int = 5,
+        filtro: Optional[Callable[[Hashable], bool]] = None,
+    ) -> list[tuple[Hashable, float]]:
+        """Top-k por produto escalar com um vetor de consulta"""
+        if self._n == 0 or k <= 0:
+            return []
+
+        scores = self.vetores @ np.asarray(vetor, dtype=np.float32)
+
+        # Com filtro, pega mais candidatos e filtra; se não bastar, amplia
+        candidatos = k if filtro is None else 4 * k
+        while True:
+            if candidatos < self._n:
+                topo = np.argpartition(scores, -candidatos)[-candidatos:]
+            else:
+                topo = np.arange(self._n)
+            topo = topo[np.argsort(scores[topo])[::-1]]
+
+            resultados = []
+            for i in topo:
+                doc_id = self._ids[i]
+                if filtro is None or filtro(doc_id):
+                    resultados.append((doc_id, float(scores[i])))
+                    if len(resultados) == k:
+                        return resultados
+            if candidatos >= self._n:
+                return resultados
+            candidatos *= 4
+
+    def buscar(
+        self,
+        consulta: str,
+        k: int = 5,
+        filtro: Optional[Callable[[Hashable], bool]] = None,
+        score_minimo: Optional[float] = None,
+    ) -> list[tuple[Hashable, float]]:
+        """
+        Os k documentos mais similares à consulta.
+
+        Args:
+            consulta: Texto livre
+            k: Quantidade de resultados
+            filtro: Se informado, só documentos com filtro(doc_id) verdadeiro
+            score_minimo: Descarta resultados com similaridade menor ou igual
+                (padrão: o score_minimo do índice)
+        """
+        if score_minimo is None:
+            score_minimo = self.score_minimo
+        resultados = self.buscar_vetor(self.embedding([consulta])[0], k, filtro)
+        return [(doc_id, score) for doc_id, score in resultados if score > score_minimo]
+
+    # ---------------------------------------------------------------
+    # Persistência
+    # ---------------------------------------------------------------
+
+    def salvar(self, diretorio: str) -> None:
+        """Grava vetores.npy e ids.json (ids precisam ser serializáveis em JSON)"""
+        os.makedirs(diretorio, exist_ok=True)
+        np.save(os.path.join(diretorio, "vetores.npy"), self.vetores)
+        with open(os.path.join(diretorio, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(self._ids, f)
+
+    @classmethod
+    def carregar(
+        cls, diretorio: str, embedding: FuncaoEmbedding, mmap: bool = True, score_minimo: float = 0.0
+    ) -> "IndiceVetorial":
+        """
+        Abre um índice salvo. Com mmap=True a matriz não é lida para a
+        RAM: o SO carrega as páginas conforme as buscas as tocam.
+        """
+        vetores = np.load(os.path.join(diretorio, "vetores.npy"), mmap_mode="r" if mmap else None)
+        with open(os.path.join(diretorio, "ids.json"), encoding="utf-8") as f:
+            ids = json.load(f)
+
+        indice = cls(embedding, dimensao=vetores.shape[1], capacidade_inicial=0, score_minimo=score_minimo)
+        indice._matriz = vetores
+        indice._n = len(ids)
+        indice._ids = ids
+        indice._posicao = {doc_id: i for i, doc_id in enumerate(ids)}
+        return indice
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    documentos = [
+        ("planos", "Plano Basic, Plano Pro e Plano Enterprise com preços mensais"),
+        ("cancelamento", "Pode cancelar a qualquer momento. Reembolso proporcional até 7 dias."),
+        ("api", "Nossa API REST usa OAuth2. Endpoint base: api.empresa.com/v1"),
+        ("seguranca", "Certificação ISO 27001, LGPD compliant, criptografia end-to-end"),
+    ]
+
+    indice = IndiceVetorial(EmbeddingHash())
+    indice.adicionar_lote(documentos)
+
+    for pergunta in ["como cancelo minha assinatura?", "endpoint da api", "criptografado?"]:
+        print(f"{pergunta!r:35} -> {indice.buscar(pergunta, k=2)}")
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        indice.salvar(diretorio)
+        mapeado = IndiceVetorial.carregar(diretorio, EmbeddingHash())
+        print(f"\nmemmap: {type(mapeado.vetores).__name__}, {len(mapeado)} vetores")
+        print(mapeado.buscar("reembolso", k=1))
+        del mapeado
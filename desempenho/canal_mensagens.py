@@ -0,0 +1,172 @@
+"""
+Canal de mensagens append-only com compartilhamento estrutural.
+
+Com Annotated[Sequence[BaseMessage], operator.add] cada passo do grafo
+cria uma lista NOVA com todas as mensagens (O(n) por passo, O(n²) por
+conversa) e o checkpointer re-serializa a lista inteira a cada passo.
+
+SequenciaMensagens é uma sequência imutável feita de:
+- blocos selados de TAMANHO_BLOCO mensagens (nunca mudam), guardados
+  em colunas (BlocoCompacto, veja desempenho.mensagens_compactas) e
+  reidratados para BaseMessage só quando lidos
+- uma cauda pequena com as mensagens mais recentes, como BaseMessage
+
+Anexar copia só a cauda e a tupla de referências aos blocos; os blocos
+são COMPARTILHADOS entre a versão antiga e a nova. Um checkpointer que
+conheça o tipo (MemorySaverLimitado com ArmazemConteudo) guarda cada
+bloco selado uma única vez e, por passo, serializa só a cauda.
+
+Para outros checkpointers é um dataclass comum: funciona, mas sem o
+ganho de serialização (registre em allowed_msgpack_modules:
+("desempenho.canal_mensagens", "SequenciaMensagens") e
+("desempenho.mensagens_compactas", "BlocoCompacto")).
+
+Mensagens seladas perdem response_metadata e usage_metadata
+(mensagens_compactas.CAMPOS_DESCARTADOS) e a identidade: cada leitura
+devolve um objeto novo.
+
+Uso:
+    class EstadoAgente(TypedDict):
+        mensagens: Annotated[SequenciaMensagens, anexar_mensagens]
+
+O reducer aceita os mesmos retornos de nó que operator.add/add_messages
+(lista, mensagem única) e também RemoveMessage (compactação).
+"""
+
+import uuid
+from collections.abc import Sequence
+from copy import deepcopy
+from dataclasses import dataclass
+from itertools import chain
+from typing import Iterable, Iterator, Optional, Union
+
+from langchain_core.messages import BaseMessage, RemoveMessage, convert_to_messages
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from desempenho.mensagens_compactas import BlocoCompacto
+
+
+TAMANHO_BLOCO = 64
+
+
+@dataclass(frozen=True, eq=False)
+class SequenciaMensagens(Sequence):
+    """Sequência persistente de mensagens (blocos selados + cauda)"""
+    blocos: tuple = ()
+    cauda: tuple = ()
+
+    def __post_init__(self):
+        blocos = tuple(
+            b if isinstance(b, BlocoCompacto) else BlocoCompacto.de(b) for b in self.blocos
+        )
+        object.__setattr__(self, "blocos", blocos)
+        if not isinstance(self.cauda, tuple):
+            object.__setattr__(self, "cauda", tuple(self.cauda))
+
+    @classmethod
+    def de(cls, mensagens: Iterable[BaseMessage]) -> "SequenciaMensagens":
+        return cls().anexar(mensagens)
+
+    def anexar(self, novas: Iterable[BaseMessage]) -> "SequenciaMensagens":
+        """Nova sequência com as mensagens no fim; os blocos existentes são reaproveitados"""
+        cauda = self.cauda + tuple(novas)
+        if len(cauda) < TAMANHO_BLOCO:
+            return SequenciaMensagens(self.blocos, cauda)
+        cheios = len(cauda) - len(cauda) % TAMANHO_BLOCO
+        novos_blocos = tuple(
+            BlocoCompacto.de(cauda[i:i + TAMANHO_BLOCO]) for i in range(0, cheios, TAMANHO_BLOCO)
+        )
+        return SequenciaMensagens(self.blocos + novos_blocos, cauda[cheios:])
+
+    # ---------------------------------------------------------------
+    # Protocolo de sequência
+    # ---------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.blocos) * TAMANHO_BLOCO + len(self.cauda)
+
+    def __getitem__(self, indice: Union[int, slice]):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        n = len(self)
+        if indice < 0:
+            indice += n
+        if not 0 <= indice < n:
+            raise IndexError("índice fora da sequência de mensagens")
+        selados = len(self.blocos) * TAMANHO_BLOCO
+        if indice >= selados:
+            return self.cauda[indice - selados]
+        return self.blocos[indice // TAMANHO_BLOCO].reidratar(indice % TAMANHO_BLOCO)
+
+    def __iter__(self) -> Iterator[BaseMessage]:
+        return chain(chain.from_iterable(self.blocos), self.cauda)
+
+    def __reversed__(self) -> Iterator[BaseMessage]:
+        yield from reversed(self.cauda)
+        for bloco in reversed(self.blocos):
+            yield from reversed(bloco)
+
+    def __add__(self, outras) -> "SequenciaMensagens":
+        if isinstance(outras, (Sequence, Iterator)) and not isinstance(outras, str):
+            return self.anexar(outras)
+        return NotImplemented
+
+    def __radd__(self, outras) -> list:
+        # [system] + estado["mensagens"]: lista comum para enviar ao modelo
+        return list(outras) + list(self)
+
+    def __eq__(self, outra) -> bool:
+        if isinstance(outra, (Sequence, list)) and not isinstance(outra, str):
+            return len(self) == len(outra) and all(a == b for a, b in zip(self, outra))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __deepcopy__(self, memo) -> "SequenciaMensagens":
+        # Blocos selados são imutáveis: só a cauda (BaseMessage) é copiada
+        return SequenciaMensagens(self.blocos, deepcopy(self.cauda, memo))
+
+    def __repr__(self) -> str:
+        return f"SequenciaMensagens({len(self)} mensagens, {len(self.blocos)} blocos selados)"
+
+
+def anexar_mensagens(
+    atual: Optional[Sequence],
+    novas: Union[BaseMessage, Sequence, dict, str],
+) -> SequenciaMensagens:
+    """
+    Reducer append-only para o canal de mensagens.
+
+    - Caminho comum: anexa em O(TAMANHO_BLOCO + blocos), sem copiar mensagens
+    - Mensagens sem id recebem um (como no add_messages), para que
+      RemoveMessage possa referenciá-las depois
+    - RemoveMessage (inclusive REMOVE_ALL_MESSAGES) reconstrói a sequência
+      (O(n), só na compactação)
+    """
+    if atual is None:
+        atual = SequenciaMensagens()
+    elif not isinstance(atual, SequenciaMensagens):
+        atual = SequenciaMensagens.de(convert_to_messages(atual))
+
+    if isinstance(novas, SequenciaMensagens):
+        novas = list(novas)
+    elif not isinstance(novas, (list, tuple)):
+        novas = [novas]
+    if not all(isinstance(m, BaseMessage) for m in novas):
+        novas = convert_to_messages(novas)
+
+    for mensagem in novas:
+        if mensagem.id is None:
+            mensagem.id = str(uuid.uuid4())
+
+    remocoes = {m.id for m in novas if isinstance(m, RemoveMessage)}
+    if not remocoes:
+        return atual.anexar(novas)
+
+    if REMOVE_ALL_MESSAGES in remocoes:
+        ultimo = max(i for i, m in enumerate(novas) if isinstance(m, RemoveMessage) and m.id == REMOVE_ALL_MESSAGES)
+        return SequenciaMensagens.de(m for m in novas[ultimo + 1:] if not isinstance(m, RemoveMessage))
+
+    mantidas = [m for m in atual if m.id not in remocoes]
+    mantidas.extend(m for m in novas if not isinstance(m, RemoveMessage))
+    return SequenciaMensagens.de(mantidas)
@@ -0,0 +1,258 @@
+"""
+Cascata de modelos: tenta o nível barato e só escala quando não confia.
+
+Supervisor, triagem e análise de sentimento usavam sempre o mesmo
+modelo, mesmo quando a resposta é óbvia ("esqueci minha senha" é tech).
+A Cascata tenta os níveis em ordem, do mais barato ao mais forte:
+
+    regras locais (µs)  ->  modelo rápido  ->  modelo forte
+
+e aceita a resposta do primeiro nível cuja CONFIANÇA passa do limiar:
+- regras: a própria regra diz quão segura está (ex: só uma categoria bateu)
+- modelo: a saída é válida (JSON que parseia, rótulo no conjunto
+  permitido) e, se o modelo devolveu logprobs, a probabilidade dos
+  tokens até o rótulo passa do limiar
+
+O último nível sempre decide (mesmo com confiança baixa). Exceção num
+nível intermediário conta como confiança 0 e escala.
+
+Métricas por nó (uma Cascata por nó): tentativas, aceites, taxa de
+escalada e latência média de cada nível, e a economia de latência
+estimada contra chamar sempre o último nível.
+
+Uso:
+    CASCATA = Cascata("triagem", [
+        Nivel("regras", regras_triagem),                        # -> (rótulo, confiança)
+        Nivel("gpt-4o-mini", chamar_rapido, rotulo_em(CATEGORIAS)),
+        Nivel("gpt-4o", chamar_forte, rotulo_em(CATEGORIAS)),
+    ], limiar=0.8)
+
+    resultado = CASCATA.executar(texto)
+    resultado.valor, resultado.nivel, resultado.confianca
+    CASCATA.metricas()
+"""
+
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+
+def extrair_json(texto: str) -> Optional[Any]:
+    """JSON da resposta, com ou sem cerca de código (```json ... ```); None se não parsear"""
+    if "```json" in texto:
+        texto = texto.split("```json")[1].split("```")[0]
+    elif "```" in texto:
+        texto = texto.split("```")[1].split("```")[0]
+    try:
+        return json.loads(texto.strip())
+    except json.JSONDecodeError:
+        return None
+
+
+def confianca_logprob(resposta: Any, ate: Optional[str] = None) -> Optional[float]:
+    """
+    Probabilidade dos tokens gerados até `ate` aparecer no texto (sem
+    diferenciar maiúsculas; todos os tokens, se None): exp(soma dos
+    logprobs). None se o modelo não devolveu logprobs
+    (ChatOpenAI(logprobs=True) devolve em response_metadata).
+    """
+    metadados = getattr(resposta, "response_metadata", None) or {}
+    tokens = (metadados.get("logprobs") or {}).get("content")
+    if not tokens:
+        return None
+    alvo = ate.casefold() if ate is not None else None
+    soma, texto = 0.0, ""
+    for token in tokens:
+        soma += token["logprob"]
+        texto += token["token"].casefold()
+        if alvo is not None and alvo in texto:
+            break
+    return math.exp(soma)
+
+
+def rotulo_em(permitidos: Iterable[str], campo: Optional[str] = None) -> Callable[[Any], tuple]:
+    """
+    Avaliador de resposta de modelo: rótulo dentro de `permitidos`
+    (sem diferenciar maiúsculas; devolve a grafia de `permitidos`).
+
+    Com `campo`, a resposta deve ser um JSON e o rótulo é dados[campo];
+    o valor devolvido é o dict inteiro, com o campo normalizado.
+    """
+    canonicos = {rotulo.casefold(): rotulo for rotulo in permitidos}
+
+    def avaliar(resposta: Any) -> tuple[Optional[Any], float]:
+        texto = getattr(resposta, "content", resposta)
+        if not isinstance(texto, str):
+            return None, 0.0
+        if campo is None:
+            rotulo = canonicos.get(texto.strip().strip(".\"'").casefold())
+            valor = rotulo
+        else:
+            dados = extrair_json(texto)
+            if not isinstance(dados, dict):
+                return None, 0.0
+            rotulo = canonicos.get(str(dados.get(campo, "")).casefold())
+            valor = {**dados, campo: rotulo}
+        if rotulo is None:
+            return None, 0.0
+        confianca = confianca_logprob(resposta, ate=rotulo)
+        return valor, 1.0 if confianca is None else confianca
+
+    return avaliar
+
+
+@dataclass
+class Nivel:
+    """
+    Um nível da cascata.
+
+    Args:
+        nome: Nome nas métricas (ex: "regras", "gpt-4o-mini")
+        chamar: entrada -> resposta
+        avaliar: resposta -> (valor, confiança 0..1); valor None = resposta
+            inválida. Sem avaliar, `chamar` já devolve (valor, confiança)
+        limiar: Confiança mínima para aceitar (None = limiar da Cascata)
+    """
+    nome: str
+    chamar: Callable[[Any], Any]
+    avaliar: Optional[Callable[[Any], tuple]] = None
+    limiar: Optional[float] = None
+
+
+@dataclass
+class ResultadoCascata:
+    valor: Any            # None = nem o último nível deu uma resposta válida
+    confianca: float
+    nivel: str            # nível que decidiu
+    resposta: Any = None  # resposta bruta do nível que decidiu
+    latencia_ms: float = 0.0
+
+
+class Cascata:
+    """
+    Níveis em ordem crescente de custo; o primeiro confiante decide.
+
+    Args:
+        nome: Nó que usa a cascata (aparece nas métricas)
+        niveis: Níveis, do mais barato ao mais forte
+        limiar: Confiança mínima padrão para aceitar uma resposta
+    """
+
+    def __init__(self, nome: str, niveis: list[Nivel], limiar: float = 0.8):
+        if not niveis:
+            raise ValueError("a cascata precisa de pelo menos um nível")
+        self.nome = nome
+        self.niveis = niveis
+        self.limiar = limiar
+        self._lock = threading.Lock()
+        self._chamadas = 0
+        self._ms_total = 0.0
+        self._por_nivel = {n.nome: {"tentativas": 0, "aceites": 0, "erros": 0, "ms": 0.0} for n in niveis}
+
+    def _tentar(self, nivel: Nivel, entrada: Any) -> tuple[Any, Optional[Any], float]:
+        resposta = nivel.chamar(entrada)
+        if nivel.avaliar is None:
+            valor, confianca = resposta
+            return None, valor, confianca
+        valor, confianca = nivel.avaliar(resposta)
+        return resposta, valor, confianca
+
+    def executar(self, entrada: Any) -> ResultadoCascata:
+        inicio = time.perf_counter()
+        ultimo = len(self.niveis) - 1
+        for posicao, nivel in enumerate(self.niveis):
+            limiar = self.limiar if nivel.limiar is None else nivel.limiar
+            t = time.perf_counter()
+            try:
+                resposta, valor, confianca = self._tentar(nivel, entrada)
+                erro = False
+            except Exception:
+                if posicao == ultimo:
+                    raise
+                resposta, valor, confianca, erro = None, None, 0.0, True
+            ms = (time.perf_counter() - t) * 1000
+
+            aceito = posicao == ultimo or (valor is not None and confianca >= limiar)
+            with self._lock:
+                estatistica = self._por_nivel[nivel.nome]
+                estatistica["tentativas"] += 1
+                estatistica["erros"] += erro
+                estatistica["ms"] += ms
+                if aceito:
+                    estatistica["aceites"] += 1
+                    total_ms = (time.perf_counter() - inicio) * 1000
+                    self._chamadas += 1
+                    self._ms_total += total_ms
+            if aceito:
+                return ResultadoCascata(valor, confianca, nivel.nome, resposta, total_ms)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            por_nivel = {nome: dict(e) for nome, e in self._por_nivel.items()}
+            chamadas, ms_total = self._chamadas, self._ms_total
+        niveis = {}
+        for nome, e in por_nivel.items():
+            niveis[nome] = {
+                "tentativas": e["tentativas"],
+                "aceites": e["aceites"],
+                "erros": e["erros"],
+                "taxa_escalada": round(1 - e["aceites"] / e["tentativas"], 3) if e["tentativas"] else 0.0,
+                "latencia_media_ms": round(e["ms"] / e["tentativas"], 2) if e["tentativas"] else None,
+            }
+        ultimo = niveis[self.niveis[-1].nome]["latencia_media_ms"]
+        media = ms_total / chamadas if chamadas else None
+        primeiro = niveis[self.niveis[0].nome]
+        return {
+            "no": self.nome,
+            "chamadas": chamadas,
+            # fração das chamadas que não foram resolvidas pelo primeiro nível
+            "taxa_escalada": primeiro["taxa_escalada"],
+            "latencia_media_ms": round(media, 2) if media is not None else None,
+            # contra chamar sempre o último nível (None até o último nível ser usado)
+            "economia_ms_por_chamada": round(ultimo - media, 2) if ultimo is not None and media is not None else None,
+            "niveis": niveis,
+        }
+
+
+if __name__ == "__main__":
+    import random
+
+    from langchain_core.messages import AIMessage
+
+    CATEGORIAS = ("tech", "billing", "general")
+
+    def regras(texto: str) -> tuple[Optional[str], float]:
+        texto = texto.lower()
+        batidas = [c for c, termos in (("tech", ("senha", "login")), ("billing", ("reembolso", "pagamento")))
+                   if any(t in texto for t in termos)]
+        return (batidas[0], 0.95) if len(batidas) == 1 else (None, 0.0)
+
+    def modelo_fake(nome: str, atraso_s: float, acerto: float):
+        """Simula um modelo que devolve logprobs: o rápido às vezes fica em dúvida"""
+        def chamar(texto: str) -> AIMessage:
+            time.sleep(atraso_s)
+            seguro = random.random() < acerto
+            logprob = math.log(0.97 if seguro else 0.55)
+            rotulo = "general" if "feedback" in texto else "billing"
+            return AIMessage(content=rotulo, response_metadata={
+                "logprobs": {"content": [{"token": rotulo, "logprob": logprob}]}})
+        return Nivel(nome, chamar, rotulo_em(CATEGORIAS))
+
+    random.seed(3)
+    cascata = Cascata("triagem", [
+        Nivel("regras", regras),
+        modelo_fake("modelo-rapido", 0.02, acerto=0.85),
+        modelo_fake("modelo-forte", 0.15, acerto=1.0),
+    ])
+    pedidos = ["Esqueci minha senha", "Quero reembolso do pagamento", "Tenho um feedback sobre o app",
+               "Meu login e meu pagamento falharam"] * 25
+    for pedido in pedidos:
+        cascata.executar(pedido)
+    print(json.dumps(cascata.metricas(), indent=2, ensure_ascii=False))
+
+    supervisor = rotulo_em(["pesquisador", "programador", "escritor", "FINISH"], campo="proximo_agente")
+    print(supervisor(AIMessage(content='```json\n{"proximo_agente": "Programador", "raciocinio": "..."}\n```')))
+    print(supervisor(AIMessage(content='{"proximo_agente": "designer"}')))
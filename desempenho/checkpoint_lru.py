@@ -0,0 +1,821 @@
+"""
+Checkpointer em memória com orçamento e despejo LRU por thread.
+
+O MemorySaver do LangGraph guarda TODAS as threads já vistas para
+sempre. Em um worker que atende milhares de usuários isso significa
+memória crescendo até o processo cair.
+
+O MemorySaverLimitado mantém o mesmo comportamento do MemorySaver,
+mas com um orçamento (bytes e/ou quantidade de threads):
+- Threads usadas recentemente ficam em memória
+- Threads "frias" são despejadas (LRU)
+- Opcionalmente, threads despejadas vão para um diretório local
+  e são recarregadas de forma transparente no próximo acesso
+
+Também indexa cada thread por instante e por passo, permitindo
+"viagem no tempo" em O(log n) / O(1) (veja desempenho.versoes),
+pode comprimir os valores de cada canal (veja desempenho.compressao)
+e deduplicar mensagens entre checkpoints e threads (veja desempenho.blobs).
+Com o armazém, canais SequenciaMensagens (desempenho.canal_mensagens)
+gravam cada bloco selado uma única vez: por passo, só a cauda nova
+é serializada.
+
+Uso:
+    memory = MemorySaverLimitado(max_bytes=50_000_000, diretorio_spill="/tmp/ckpt")
+    app = workflow.compile(checkpointer=memory)
+    print(memory.metricas())
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+import weakref
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from desempenho.blobs import ArmazemConteudo
+from desempenho.canal_mensagens import SequenciaMensagens
+from desempenho.compressao import CompressaoPorCanal
+from desempenho.mensagens_compactas import BlocoCompacto
+
+
+# Valor de canal guardado como hashes no ArmazemConteudo
+_TIPO_CAS = "cas-mensagens"
+# SequenciaMensagens: hashes dos blocos selados + cauda serializada
+_TIPO_SEQ = "seq-mensagens"
+
+
+@dataclass
+class MetricasCheckpoint:
+    """Métricas do checkpointer limitado"""
+    bytes_residentes: int = 0
+    bytes_armazem: int = 0
+    threads_residentes: int = 0
+    threads_em_disco: int = 0
+    evicoes: int = 0
+    recarregamentos: int = 0
+
+
+class _DadosThread:
+    """Tudo que pertence a uma thread: checkpoints, writes e blobs serializados"""
+
+    __slots__ = ("checkpoints", "writes", "blobs", "bytes", "linha_do_tempo", "passos")
+
+    def __init__(self):
+        # checkpoint_ns -> checkpoint_id -> (checkpoint, metadata, parent_id)
+        self.checkpoints: dict = {}
+        # (checkpoint_ns, checkpoint_id) -> (task_id, idx) -> (task_id, canal, valor, task_path)
+        self.writes: dict = {}
+        # (checkpoint_ns, canal, versao) -> valor serializado
+        self.blobs: dict = {}
+        self.bytes = 0
+        # checkpoint_ns -> [(ts, checkpoint_id)] ordenado
+        self.linha_do_tempo: dict = {}
+        # checkpoint_ns -> passo -> checkpoint_id
+        self.passos: dict = {}
+
+    def __getstate__(self):
+        return tuple(getattr(self, nome) for nome in self.__slots__)
+
+    def __setstate__(self, estado):
+        for nome, valor in zip(self.__slots__, estado):
+            setattr(self, nome, valor)
+
+    def indexar(self, checkpoint_ns: str, checkpoint_id: str, ts: str, passo) -> None:
+        linha = self.linha_do_tempo.setdefault(checkpoint_ns, [])
+        entrada = (ts, checkpoint_id)
+        if not linha or linha[-1] <= entrada:
+            linha.append(entrada)
+        else:
+            insort(linha, entrada)
+        if passo is not None:
+            self.passos.setdefault(checkpoint_ns, {})[passo] = checkpoint_id
+
+
+def _tamanho(tipado: tuple) -> int:
+    """Tamanho aproximado de um valor serializado (tipo, bytes)"""
+    return len(tipado[0]) + len(tipado[1])
+
+
+def _eh_lista_de_mensagens(valor: Any) -> bool:
+    return (
+        isinstance(valor, (list, tuple))
+        and len(valor) > 0
+        and all(isinstance(m, BaseMessage) for m in valor)
+    )
+
+
+def _chaves_armazem(tipado: tuple[str, bytes]) -> list[str]:
+    """Hashes do armazém referenciados por um valor serializado"""
+    if tipado[0] == _TIPO_CAS:
+        return tipado[1].decode("ascii").split()
+    if tipado[0] == _TIPO_SEQ:
+        return tipado[1].partition(b"\n")[0].decode("ascii").split()
+    return []
+
+
+def _valores_thread(dados: _DadosThread) -> Iterator[tuple[str, bytes]]:
+    """Todos os valores serializados da thread (blobs de canal e writes pendentes)"""
+    yield from dados.blobs.values()
+    for writes in dados.writes.values():
+        for write in writes.values():
+            yield write[2]
+
+
+def _empacotar(tipado: tuple[str, bytes]) -> bytes:
+    return tipado[0].encode("utf-8") + b"\0" + tipado[1]
+
+
+def _desempacotar(dados: bytes) -> tuple[str, bytes]:
+    tipo, _, conteudo = dados.partition(b"\0")
+    return (tipo.decode("utf-8"), conteudo)
+
+
+class MemorySaverLimitado(BaseCheckpointSaver[str]):
+    """
+    Checkpointer em memória com orçamento e despejo LRU.
+
+    Args:
+        max_bytes: Orçamento de bytes serializados residentes (None = sem limite).
+            Com armazém, conta também os conteúdos referenciados nele (do
+            armazém inteiro, se for compartilhado entre checkpointers)
+        max_threads: Máximo de threads residentes (None = sem limite)
+        diretorio_spill: Diretório para onde threads frias são despejadas.
+            Se None, threads despejadas são descartadas.
+        compressao: Compressão por canal dos valores salvos (None = sem compressão)
+        armazem: Armazém endereçado por conteúdo para listas de mensagens.
+            Pode ser compartilhado entre checkpointers (None = sem deduplicação).
+            Threads despejadas devolvem suas referências; com diretorio_spill,
+            os conteúdos que usam vão junto para o disco
+        serde: Serializador (padrão do LangGraph)
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        diretorio_spill: Optional[str] = None,
+        compressao: Optional[CompressaoPorCanal] = None,
+        armazem: Optional[ArmazemConteudo] = None,
+        serde: Optional[SerializerProtocol] = None,
+    ) -> None:
+        super().__init__(serde=serde)
+        self.max_bytes = max_bytes
+        self.max_threads = max_threads
+        self.diretorio_spill = diretorio_spill
+        self.compressao = compressao
+        self.armazem = armazem
+        if diretorio_spill:
+            os.makedirs(diretorio_spill, exist_ok=True)
+
+        # thread_id -> _DadosThread, do menos para o mais recentemente usado
+        self._residentes: "OrderedDict[str, _DadosThread]" = OrderedDict()
+        # thread_id -> caminho do arquivo em disco
+        self._em_disco: dict[str, str] = {}
+        self._bytes_residentes = 0
+        self._evicoes = 0
+        self._recarregamentos = 0
+        self._lock = threading.RLock()
+        # hash -> BlocoCompacto já desserializado (checkpoints compartilham o objeto)
+        self._blocos: "weakref.WeakValueDictionary[str, BlocoCompacto]" = weakref.WeakValueDictionary()
+
+    # ---------------------------------------------------------------
+    # Gerenciamento do orçamento
+    # ---------------------------------------------------------------
+
+    def metricas(self) -> dict:
+        """Retorna métricas de uso de memória, despejos e recarregamentos"""
+        with self._lock:
+            return asdict(MetricasCheckpoint(
+                bytes_residentes=self._bytes_residentes,
+                bytes_armazem=self._bytes_armazem(),
+                threads_residentes=len(self._residentes),
+                threads_em_disco=len(self._em_disco),
+                evicoes=self._evicoes,
+                recarregamentos=self._recarregamentos,
+            ))
+
+    def _caminho_spill(self, thread_id: str) -> str:
+        nome = hashlib.sha256(thread_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.diretorio_spill, f"{nome}.ckpt")
+
+    def _ler_disco(self, thread_id: str) -> Optional[_DadosThread]:
+        """
+        Lê a thread despejada e devolve ao armazém as referências dela
+        (quem não for mantê-la residente chama _liberar_thread depois)
+        """
+        caminho = self._em_disco.get(thread_id)
+        if caminho is None:
+            return None
+        with open(caminho, "rb") as f:
+            dados, conteudos = pickle.load(f)
+        if self.armazem is not None:
+            for tipado in _valores_thread(dados):
+                for chave in _chaves_armazem(tipado):
+                    if not self.armazem.referenciar(chave):
+                        self.armazem.guardar(conteudos[chave])
+        return dados
+
+    def _thread(self, thread_id: str, criar: bool = False) -> Optional[_DadosThread]:
+        """Obtém os dados da thread, recarregando do disco se necessário"""
+        dados = self._residentes.get(thread_id)
+        if dados is not None:
+            self._residentes.move_to_end(thread_id)
+            return dados
+
+        dados = self._ler_disco(thread_id)
+        if dados is not None:
+            os.remove(self._em_disco.pop(thread_id))
+            self._recarregamentos += 1
+        elif criar:
+            dados = _DadosThread()
+        else:
+            return None
+
+        self._residentes[thread_id] = dados
+        self._bytes_residentes += dados.bytes
+        self._aplicar_orcamento()
+        return dados
+
+    def _contabilizar(self, dados: _DadosThread, delta: int) -> None:
+        dados.bytes += delta
+        self._bytes_residentes += delta
+
+    def _bytes_armazem(self) -> int:
+        return self.armazem.bytes_referenciados() if self.armazem is not None else 0
+
+    def _estourou(self) -> bool:
+        if self.max_threads is not None and len(self._residentes) > self.max_threads:
+            return True
+        if self.max_bytes is not None and self._bytes_residentes + self._bytes_armazem() > self.max_bytes:
+            return True
+        return False
+
+    def _aplicar_orcamento(self) -> None:
+        """Despeja threads frias até caber no orçamento (nunca a mais recente)"""
+        while self._estourou() and len(self._residentes) > 1:
+            thread_id, dados = self._residentes.popitem(last=False)
+            self._bytes_residentes -= dados.bytes
+            self._evicoes += 1
+
+            if self.diretorio_spill:
+                # Os conteúdos do armazém vão junto: a thread em disco não os segura na memória
+                conteudos = {}
+                if self.armazem is not None:
+                    for tipado in _valores_thread(dados):
+                        for chave in _chaves_armazem(tipado):
+                            if chave not in conteudos:
+                                conteudos[chave] = self.armazem.obter(chave)
+                caminho = self._caminho_spill(thread_id)
+                with open(caminho, "wb") as f:
+                    pickle.dump((dados, conteudos), f, protocol=pickle.HIGHEST_PROTOCOL)
+                self._em_disco[thread_id] = caminho
+            self._liberar_thread(dados)
+
+    # ---------------------------------------------------------------
+    # Serialização de valores de canal
+    # ---------------------------------------------------------------
+
+    def _serializar(self, canal: str, valor: Any) -> tuple[str, bytes]:
+        if self.armazem is not None and isinstance(valor, SequenciaMensagens):
+            return (_TIPO_SEQ, self._guardar_sequencia(valor))
+        if self.armazem is not None and _eh_lista_de_mensagens(valor):
+            return (_TIPO_CAS, self._guardar_mensagens(valor))
+
+        tipado = self.serde.dumps_typed(valor)
+        if self.compressao is not None:
+            tipado = self.compressao.comprimir(canal, tipado)
+        return tipado
+
+    def _desserializar(self, canal: str, tipado: tuple[str, bytes]) -> Any:
+        if tipado[0] == _TIPO_CAS:
+            return self._carregar_mensagens(tipado[1])
+        if tipado[0] == _TIPO_SEQ:
+            return self._carregar_sequencia(tipado[1])
+
+        if self.compressao is not None:
+            tipado = self.compressao.descomprimir(tipado, canal)
+        return self.serde.loads_typed(tipado)
+
+    def _guardar_mensagens(self, mensagens: Sequence[BaseMessage]) -> bytes:
+        """Guarda envelope e conteúdo de cada mensagem separadamente no armazém"""
+        chaves = []
+        for mensagem in mensagens:
+            envelope = self.serde.dumps_typed(mensagem.model_copy(update={"content": ""}))
+            conteudo = self.serde.dumps_typed(mensagem.content)
+            chaves.append(self.armazem.guardar(_empacotar(envelope)))
+            chaves.append(self.armazem.guardar(_empacotar(conteudo)))
+        return " ".join(chaves).encode("ascii")
+
+    def _carregar_mensagens(self, referencias: bytes) -> list[BaseMessage]:
+        chaves = referencias.decode("ascii").split()
+        mensagens = []
+        for chave_envelope, chave_conteudo in zip(chaves[::2], chaves[1::2]):
+            envelope = self.serde.loads_typed(_desempacotar(self.armazem.obter(chave_envelope)))
+            conteudo = self.serde.loads_typed(_desempacotar(self.armazem.obter(chave_conteudo)))
+            mensagens.append(envelope.model_copy(update={"content": conteudo}))
+        return mensagens
+
+    def _guardar_sequencia(self, sequencia: SequenciaMensagens) -> bytes:
+        """
+        Blocos selados viram referências ao armazém (serializados só na
+        primeira vez que aparecem, direto das colunas compactas); a cauda
+        vai serializada no próprio valor.
+        """
+        armazem_id = id(self.armazem)
+        chaves = []
+        for bloco in sequencia.blocos:
+            chave = bloco.chaves.get(armazem_id)
+            if chave is None or not self.armazem.referenciar(chave):
+                colunas = {"papeis": bloco.papeis, "textos": bloco.textos, "fins": bloco.fins, "extras": bloco.extras}
+                dados = _empacotar(self.serde.dumps_typed(colunas))
+                chave = self.armazem.guardar(dados)
+                bloco.chaves[armazem_id] = chave
+                self._blocos[chave] = bloco
+            chaves.append(chave)
+        cauda = _empacotar(self.serde.dumps_typed(list(sequencia.cauda)))
+        return " ".join(chaves).encode("ascii") + b"\n" + cauda
+
+    def _carregar_sequencia(self, dados: bytes) -> SequenciaMensagens:
+        referencias, _, cauda = dados.partition(b"\n")
+        blocos = []
+        for chave in referencias.decode("ascii").split():
+            bloco = self._blocos.get(chave)
+            if bloco is None:
+                colunas = self.serde.loads_typed(_desempacotar(self.armazem.obter(chave)))
+                bloco = BlocoCompacto(**colunas)
+                bloco.chaves[id(self.armazem)] = chave
+                self._blocos[chave] = bloco
+            blocos.append(bloco)
+        return SequenciaMensagens(tuple(blocos), tuple(self.serde.loads_typed(_desempacotar(cauda))))
+
+    def _liberar(self, tipado: tuple[str, bytes]) -> None:
+        """Devolve as referências ao armazém quando um valor deixa de existir"""
+        for chave in _chaves_armazem(tipado):
+            self.armazem.liberar(chave)
+
+    def _liberar_thread(self, dados: _DadosThread) -> None:
+        if self.armazem is None:
+            return
+        for tipado in _valores_thread(dados):
+            self._liberar(tipado)
+
+    # ---------------------------------------------------------------
+    # Leitura
+    # ---------------------------------------------------------------
+
+    def _montar_tupla(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        dados: _DadosThread,
+        metadata: Optional[CheckpointMetadata] = None,
+    ) -> CheckpointTuple:
+        checkpoint_b, metadata_b, parent_id = dados.checkpoints[checkpoint_ns][checkpoint_id]
+        checkpoint: Checkpoint = self.serde.loads_typed(checkpoint_b)
+
+        valores = {}
+        for canal, versao in checkpoint["channel_versions"].items():
+            blob = dados.blobs.get((checkpoint_ns, canal, versao))
+            if blob is None or blob[0] == "empty":
+                continue
+            valores[canal] = self._desserializar(canal, blob)
+
+        writes = dados.writes.get((checkpoint_ns, checkpoint_id), {})
+        ordenados = sorted(writes, key=lambda k: writes_sort_key(writes[k][3], *k))
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={**checkpoint, "channel_values": valores},
+            metadata=metadata if metadata is not None else self.serde.loads_typed(metadata_b),
+            pending_writes=[
+                (writes[k][0], writes[k][1], self._desserializar(writes[k][1], writes[k][2]))
+                for k in ordenados
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """Busca um checkpoint (o mais recente, se não houver checkpoint_id)"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        with self._lock:
+            dados = self._thread(thread_id)
+            if dados is None:
+                return None
+
+            checkpoints = dados.checkpoints.get(checkpoint_ns)
+            if not checkpoints:
+                return None
+
+            checkpoint_id = get_checkpoint_id(config) or max(checkpoints)
+            if checkpoint_id not in checkpoints:
+                return None
+
+            return self._montar_tupla(thread_id, checkpoint_ns, checkpoint_id, dados)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Lista checkpoints do mais recente para o mais antigo"""
+        with self._lock:
+            if config:
+                thread_ids = [config["configurable"]["thread_id"]]
+            else:
+                thread_ids = list(self._residentes) + list(self._em_disco)
+            config_ns = config["configurable"].get("checkpoint_ns") if config else None
+            config_id = get_checkpoint_id(config) if config else None
+            before_id = get_checkpoint_id(before) if before else None
+
+            resultados = []
+            for thread_id in thread_ids:
+                # Listar tudo (config=None) não deve bagunçar a ordem LRU
+                emprestada = False
+                if config:
+                    dados = self._thread(thread_id)
+                else:
+                    dados = self._residentes.get(thread_id)
+                    if dados is None:
+                        dados = self._ler_disco(thread_id)
+                        emprestada = dados is not None
+                if dados is None:
+                    continue
+                try:
+                    self._listar_thread(
+                        resultados, thread_id, dados, config_ns, config_id, before_id, filter, limit
+                    )
+                finally:
+                    if emprestada:
+                        # Lida do disco só para listar: as referências voltam ao armazém
+                        self._liberar_thread(dados)
+
+        yield from resultados
+
+    def _listar_thread(
+        self,
+        resultados: list,
+        thread_id: str,
+        dados: _DadosThread,
+        config_ns: Optional[str],
+        config_id: Optional[str],
+        before_id: Optional[str],
+        filter: Optional[dict[str, Any]],
+        limit: Optional[int],
+    ) -> None:
+        """Acrescenta a resultados os checkpoints da thread que passam nos filtros"""
+        for checkpoint_ns, checkpoints in dados.checkpoints.items():
+            if config_ns is not None and checkpoint_ns != config_ns:
+                continue
+
+            for checkpoint_id in sorted(checkpoints, reverse=True):
+                if config_id and checkpoint_id != config_id:
+                    continue
+                if before_id and checkpoint_id >= before_id:
+                    continue
+
+                metadata = self.serde.loads_typed(checkpoints[checkpoint_id][1])
+                if filter and not all(
+                    metadata.get(chave) == valor for chave, valor in filter.items()
+                ):
+                    continue
+
+                if limit is not None and len(resultados) >= limit:
+                    break
+
+                resultados.append(
+                    self._montar_tupla(thread_id, checkpoint_ns, checkpoint_id, dados, metadata)
+                )
+
+    # ---------------------------------------------------------------
+    # Escrita
+    # ---------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Salva um checkpoint e aplica o orçamento de memória"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        c = checkpoint.copy()
+        valores = c.pop("channel_values")
+
+        with self._lock:
+            dados = self._thread(thread_id, criar=True)
+            delta = 0
+
+            for canal, versao in new_versions.items():
+                chave = (checkpoint_ns, canal, versao)
+                blob = self._serializar(canal, valores[canal]) if canal in valores else ("empty", b"")
+                if chave in dados.blobs:
+                    delta -= _tamanho(dados.blobs[chave])
+                    self._liberar(dados.blobs[chave])
+                dados.blobs[chave] = blob
+                delta += _tamanho(blob)
+
+            registro = (
+                self.serde.dumps_typed(c),
+                self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+                config["configurable"].get("checkpoint_id"),  # parent
+            )
+            dados.checkpoints.setdefault(checkpoint_ns, {})[checkpoint["id"]] = registro
+            dados.indexar(checkpoint_ns, checkpoint["id"], checkpoint["ts"], metadata.get("step"))
+            delta += _tamanho(registro[0]) + _tamanho(registro[1])
+
+            self._contabilizar(dados, delta)
+            self._aplicar_orcamento()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Salva writes pendentes de um checkpoint"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self._lock:
+            dados = self._thread(thread_id, criar=True)
+            existentes = dados.writes.setdefault((checkpoint_ns, checkpoint_id), {})
+            delta = 0
+
+            for idx, (canal, valor) in enumerate(writes):
+                chave = (task_id, WRITES_IDX_MAP.get(canal, idx))
+                if chave[1] >= 0 and chave in existentes:
+                    continue
+                serializado = self._serializar(canal, valor)
+                anterior = existentes.get(chave)
+                if anterior is not None:
+                    # Índice negativo (__error__, __interrupt__, ...) substitui o write anterior:
+                    # devolve o tamanho e as referências dele (depois de serializar o novo,
+                    # para um conteúdo repetido não ser coletado e guardado de novo)
+                    delta -= _tamanho(anterior[2])
+                    self._liberar(anterior[2])
+                existentes[chave] = (task_id, canal, serializado, task_path)
+                delta += _tamanho(serializado)
+
+            self._contabilizar(dados, delta)
+            self._aplicar_orcamento()
+
+    # ---------------------------------------------------------------
+    # Viagem no tempo e retenção
+    # ---------------------------------------------------------------
+
+    def checkpoint_em(self, config: RunnableConfig, instante: str) -> Optional[CheckpointTuple]:
+        """Checkpoint vigente no instante (ISO) informado, em O(log n)"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        with self._lock:
+            dados = self._thread(thread_id)
+            if dados is None:
+                return None
+            linha = dados.linha_do_tempo.get(checkpoint_ns, [])
+            posicao = bisect_right(linha, (instante, "\uffff"))
+            if posicao == 0:
+                return None
+            return self._montar_tupla(thread_id, checkpoint_ns, linha[posicao - 1][1], dados)
+
+    def checkpoint_no_passo(self, config: RunnableConfig, passo: int) -> Optional[CheckpointTuple]:
+        """Checkpoint de um passo (metadata["step"]) em O(1)"""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        with self._lock:
+            dados = self._thread(thread_id)
+            if dados is None:
+                return None
+            checkpoint_id = dados.passos.get(checkpoint_ns, {}).get(passo)
+            if checkpoint_id is None:
+                return None
+            return self._montar_tupla(thread_id, checkpoint_ns, checkpoint_id, dados)
+
+    def reter(self, thread_id: str, manter_ultimas: int, intervalo_antigas: Optional[int] = None) -> int:
+        """
+        Aplica política de retenção aos checkpoints de uma thread.
+
+        Os manter_ultimas (>= 1) checkpoints mais recentes ficam intactos; dos
+        mais antigos sobra 1 a cada intervalo_antigas (ou nenhum).
+        Retorna quantos checkpoints foram removidos.
+
+        Checkpoints restantes podem apontar (parent_config) para um pai
+        removido; get_state_history continua funcionando normalmente.
+        """
+        if manter_ultimas < 1:
+            raise ValueError(f"manter_ultimas deve ser >= 1 (o checkpoint atual nunca é descartado), recebido {manter_ultimas}")
+        with self._lock:
+            dados = self._thread(thread_id)
+            if dados is None:
+                return 0
+
+            removidos = 0
+            delta = 0
+            for checkpoint_ns, linha in dados.linha_do_tempo.items():
+                antigas = linha[:-manter_ultimas]
+                remover = {
+                    checkpoint_id for i, (_, checkpoint_id) in enumerate(antigas)
+                    if not intervalo_antigas or i % intervalo_antigas != 0
+                }
+                if not remover:
+                    continue
+
+                checkpoints = dados.checkpoints[checkpoint_ns]
+                for checkpoint_id in remover:
+                    registro = checkpoints.pop(checkpoint_id)
+                    delta -= _tamanho(registro[0]) + _tamanho(registro[1])
+                    for write in dados.writes.pop((checkpoint_ns, checkpoint_id), {}).values():
+                        delta -= _tamanho(write[2])
+                        self._liberar(write[2])
+
+                linha[:] = [e for e in linha if e[1] not in remover]
+                passos = dados.passos.get(checkpoint_ns, {})
+                for passo in [p for p, c in passos.items() if c in remover]:
+                    del passos[passo]
+                removidos += len(remover)
+
+                # Blobs só ficam se algum checkpoint restante ainda os referencia
+                referenciados = set()
+                for checkpoint_b, _, _ in checkpoints.values():
+                    versoes = self.serde.loads_typed(checkpoint_b)["channel_versions"]
+                    referenciados.update((checkpoint_ns, c, v) for c, v in versoes.items())
+                for chave in [k for k in dados.blobs if k[0] == checkpoint_ns and k not in referenciados]:
+                    blob = dados.blobs.pop(chave)
+                    delta -= _tamanho(blob)
+                    self._liberar(blob)
+
+            self._contabilizar(dados, delta)
+            return removidos
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Remove a thread da memória e do disco"""
+        with self._lock:
+            dados = self._residentes.pop(thread_id, None)
+            if dados is not None:
+                self._bytes_residentes -= dados.bytes
+            else:
+                dados = self._ler_disco(thread_id)
+            if dados is not None:
+                self._liberar_thread(dados)
+            caminho = self._em_disco.pop(thread_id, None)
+            if caminho and os.path.exists(caminho):
+                os.remove(caminho)
+
+    # ---------------------------------------------------------------
+    # Versões assíncronas (mesma implementação, tudo é local)
+    # ---------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+
+# ===================================================================
+# DEMONSTRAÇÃO
+# ===================================================================
+if __name__ == "__main__":
+    import tempfile
+    from typing import TypedDict, Annotated
+    import operator
+    from langgraph.graph import StateGraph, END
+
+    class EstadoEco(TypedDict):
+        mensagens: Annotated[list, operator.add]
+
+    def ecoar(estado: EstadoEco):
+        return {"mensagens": [f"eco: {estado['mensagens'][-1]}"]}
+
+    workflow = StateGraph(EstadoEco)
+    workflow.add_node("eco", ecoar)
+    workflow.set_entry_point("eco")
+    workflow.add_edge("eco", END)
+
+    diretorio = tempfile.mkdtemp(prefix="ckpt_spill_")
+    memory = MemorySaverLimitado(max_threads=3, diretorio_spill=diretorio)
+    app = workflow.compile(checkpointer=memory)
+
+    print("=" * 60)
+    print("MemorySaverLimitado: 10 usuários, no máximo 3 em memória")
+    print("=" * 60)
+
+    for i in range(10):
+        config = {"configurable": {"thread_id": f"usuario_{i}"}}
+        app.invoke({"mensagens": [f"olá do usuário {i}"]}, config)
+
+    print(f"[MÉTRICAS] {memory.metricas()}")
+
+    # usuario_0 foi despejado para disco, mas volta de forma transparente
+    config = {"configurable": {"thread_id": "usuario_0"}}
+    resultado = app.invoke({"mensagens": ["voltei!"]}, config)
+    print(f"[USUÁRIO 0] {resultado['mensagens']}")
+    print(f"[MÉTRICAS] {memory.metricas()}")
+
+    # Com armazém, o orçamento de bytes conta também os conteúdos guardados nele,
+    # e threads despejadas levam os seus para o disco
+    from langchain_core.messages import AIMessage
+
+    def responder(estado: EstadoEco):
+        return {"mensagens": [AIMessage(content=f"eco: {estado['mensagens'][-1].content}")]}
+
+    workflow = StateGraph(EstadoEco)
+    workflow.add_node("eco", responder)
+    workflow.set_entry_point("eco")
+    workflow.add_edge("eco", END)
+
+    armazem = ArmazemConteudo()
+    memory = MemorySaverLimitado(max_bytes=20_000, diretorio_spill=tempfile.mkdtemp(prefix="ckpt_spill_"),
+                                 armazem=armazem)
+    app = workflow.compile(checkpointer=memory)
+    for i in range(10):
+        config = {"configurable": {"thread_id": f"usuario_{i}"}}
+        app.invoke({"mensagens": [AIMessage(content=f"histórico do usuário {i} " * 40)]}, config)
+    print(f"\n[ARMAZÉM] {memory.metricas()}")
+    resultado = app.invoke({"mensagens": [AIMessage(content="voltei!")]}, {"configurable": {"thread_id": "usuario_0"}})
+    print(f"[USUÁRIO 0] {len(resultado['mensagens'])} mensagens após recarregar do disco")
@@ -0,0 +1,234 @@
+"""
+Coalescência (single-flight) de chamadas idênticas em voo.
+
+Quando muitos usuários fazem a mesma pergunta ao mesmo tempo, o
+agente_triagem (04_multi_agentes.py) manda o MESMO prompt várias vezes
+em paralelo: N requisições, N vezes o custo e N vagas no limitador,
+para N respostas iguais.
+
+O VooUnico junta chamadas com a mesma chave enquanto a primeira
+(a líder) ainda está em voo: só ela vai ao provedor, e as demais
+esperam e recebem o mesmo resultado (ou a mesma exceção). Quando a
+líder termina, a chave sai do mapa; a próxima chamada idêntica vai ao
+provedor de novo. Não é um cache de resultados: complementa um (o
+cache evita repetir o que já terminou; o VooUnico, o que ainda está
+em andamento) e deve ficar DEPOIS dele, antes do limitador.
+
+Funciona em código síncrono (threads) e assíncrono (asyncio). Numa
+chamada assíncrona, cancelar um dos que esperam não cancela os outros;
+a requisição só é cancelada quando todos desistem.
+
+A chave é um hash de (identidade do modelo e parâmetros, mensagens,
+kwargs da chamada): veja chave_requisicao().
+
+Uso:
+    voos = VooUnico()
+    resposta = voos.chamar(chave, lambda: llm.invoke(mensagens))
+    resposta = await voos.achamar(chave, lambda: llm.ainvoke(mensagens))
+    voos.metricas()   # requisições, coalescidas, taxa_coalescencia, em_voo
+
+O desempenho.modelos.criar_modelo() já faz isso em invoke/ainvoke.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.messages import BaseMessage
+
+
+def _json(valor: Any) -> str:
+    return json.dumps(valor, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=repr)
+
+
+def identidade_modelo(modelo: Any) -> str:
+    """
+    Modelo e parâmetros que mudam a resposta: _identifying_params do
+    ChatModel (modelo, temperatura...) e os kwargs vinculados
+    (ferramentas de bind_tools, stop...) em RunnableBinding
+    """
+    partes = []
+    while hasattr(modelo, "bound") and hasattr(modelo, "kwargs"):
+        partes.append(_json(modelo.kwargs))
+        modelo = modelo.bound
+    parametros = getattr(modelo, "_identifying_params", None)
+    partes.append(_json(parametros) if parametros else f"{type(modelo).__qualname__}@{id(modelo)}")
+    return "|".join(reversed(partes))
+
+
+def chave_requisicao(identidade: str, entrada: Any, kwargs: Optional[dict] = None) -> str:
+    """Hash de (identidade do modelo, mensagens, kwargs da chamada)"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(identidade.encode("utf-8"))
+    if isinstance(entrada, str):
+        h.update(b"\x00" + entrada.encode("utf-8"))
+    else:
+        if hasattr(entrada, "to_messages"):  # PromptValue
+            entrada = entrada.to_messages()
+        for m in entrada:
+            if isinstance(m, BaseMessage):
+                campos = [m.type, m.content, getattr(m, "tool_calls", None),
+                          getattr(m, "tool_call_id", None), m.name]
+            else:
+                campos = m
+            h.update(b"\x00" + _json(campos).encode("utf-8"))
+    if kwargs:
+        h.update(b"\x01" + _json(kwargs).encode("utf-8"))
+    return h.hexdigest()
+
+
+class _Voo:
+    """Uma chamada síncrona em andamento e quem espera por ela"""
+    __slots__ = ("pronto", "resultado", "erro")
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resultado = None
+        self.erro: Optional[BaseException] = None
+
+
+class _VooAsync:
+    """Uma chamada assíncrona em andamento: a tarefa e quantos a aguardam"""
+    __slots__ = ("tarefa", "esperando")
+
+    def __init__(self, tarefa: asyncio.Task):
+        self.tarefa = tarefa
+        self.esperando = 0
+
+
+class VooUnico:
+    """
+    Mapa chave -> chamada em voo, compartilhado por threads e event loops.
+
+    Args:
+        copiar: Aplicada ao resultado entregue aos que esperam (não à
+            líder), para que ninguém altere o objeto dos outros
+            (ex: lambda m: m.model_copy())
+    """
+
+    def __init__(self, copiar: Optional[Callable[[Any], Any]] = None):
+        self.copiar = copiar
+        self._lock = threading.Lock()
+        self._voos: dict[str, _Voo] = {}
+        self._voos_async: dict[tuple, _VooAsync] = {}
+        self._totais = {"requisicoes": 0, "coalescidas": 0}
+
+    def _entregar(self, resultado: Any) -> Any:
+        return self.copiar(resultado) if self.copiar is not None else resultado
+
+    def chamar(self, chave: str, funcao: Callable[[], Any]) -> Any:
+        """funcao() uma vez por chave em voo; as chamadas concorrentes recebem o mesmo resultado"""
+        with self._lock:
+            voo = self._voos.get(chave)
+            if voo is None:
+                voo = self._voos[chave] = _Voo()
+                lider = True
+                self._totais["requisicoes"] += 1
+            else:
+                lider = False
+                self._totais["coalescidas"] += 1
+
+        if not lider:
+            voo.pronto.wait()
+            if voo.erro is not None:
+                raise voo.erro
+            return self._entregar(voo.resultado)
+
+        try:
+            voo.resultado = funcao()
+            return voo.resultado
+        except BaseException as erro:
+            voo.erro = erro
+            raise
+        finally:
+            with self._lock:
+                del self._voos[chave]
+            voo.pronto.set()
+
+    async def achamar(self, chave: str, funcao: Callable[[], Awaitable[Any]]) -> Any:
+        """Versão assíncrona: a coroutine roda numa tarefa compartilhada pelos que esperam"""
+        laco = asyncio.get_running_loop()
+        indice = (id(laco), chave)
+        with self._lock:
+            voo = self._voos_async.get(indice)
+            lider = voo is None
+            if lider:
+                voo = self._voos_async[indice] = _VooAsync(laco.create_task(funcao()))
+                voo.tarefa.add_done_callback(lambda _: self._encerrar_async(indice, voo))
+                self._totais["requisicoes"] += 1
+            else:
+                self._totais["coalescidas"] += 1
+            voo.esperando += 1
+
+        try:
+            resultado = await asyncio.shield(voo.tarefa)
+        except asyncio.CancelledError:
+            with self._lock:
+                voo.esperando -= 1
+                abandonada = voo.esperando == 0
+            if abandonada:
+                voo.tarefa.cancel()  # ninguém mais espera: cancela a requisição
+            raise
+        with self._lock:
+            voo.esperando -= 1
+        return resultado if lider else self._entregar(resultado)
+
+    def _encerrar_async(self, indice: tuple, voo: _VooAsync) -> None:
+        with self._lock:
+            if self._voos_async.get(indice) is voo:
+                del self._voos_async[indice]
+
+    def metricas(self) -> dict:
+        with self._lock:
+            t = dict(self._totais)
+            em_voo = len(self._voos) + len(self._voos_async)
+        chamadas = t["requisicoes"] + t["coalescidas"]
+        return {
+            **t,
+            "taxa_coalescencia": round(t["coalescidas"] / chamadas, 3) if chamadas else 0.0,
+            "em_voo": em_voo,
+        }
+
+
+if __name__ == "__main__":
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from langchain_core.messages import HumanMessage
+
+    voos = VooUnico()
+    chamadas_provedor = 0
+
+    def provedor(pergunta: str) -> str:
+        global chamadas_provedor
+        chamadas_provedor += 1
+        time.sleep(0.2)
+        return f"categoria de {pergunta!r}: billing"
+
+    # 20 usuários, 2 perguntas diferentes, todos ao mesmo tempo
+    perguntas = ["Quero um reembolso do meu pagamento", "Esqueci minha senha"] * 10
+
+    def triagem(pergunta: str) -> str:
+        chave = chave_requisicao("gpt-4o-mini|temperature=0", [HumanMessage(content=f"Problema: {pergunta}")])
+        return voos.chamar(chave, lambda: provedor(pergunta))
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        respostas = list(executor.map(triagem, perguntas))
+    print(f"Threads: {len(respostas)} respostas, {chamadas_provedor} chamadas ao provedor, "
+          f"{time.perf_counter() - inicio:.2f}s")
+
+    async def provedor_async(pergunta: str) -> str:
+        await asyncio.sleep(0.2)
+        return f"categoria de {pergunta!r}"
+
+    async def principal():
+        return await asyncio.gather(*[
+            voos.achamar(chave_requisicao("gpt-4o-mini", [HumanMessage(content=p)]), lambda p=p: provedor_async(p))
+            for p in perguntas
+        ])
+
+    print(f"asyncio: {len(asyncio.run(principal()))} respostas")
+    print(voos.metricas())
@@ -0,0 +1,192 @@
+"""
+Compactação incremental de conversas longas em um resumo corrente.
+
+O GerenciadorContexto (contexto.py) só CORTA o que vai para o modelo;
+o histórico no checkpoint continua crescendo e o que foi cortado é
+esquecido. O CompactadorConversa dobra os turnos antigos num resumo:
+
+- Quando o histórico passa do limite, os turnos antigos (menos os
+  `manter_mensagens` mais recentes) são resumidos
+- Incremental: o resumidor recebe o resumo anterior + SÓ as mensagens
+  novas desde a última compactação, nunca a conversa inteira
+- Fora do caminho crítico: o resumo roda num executor em segundo plano
+  enquanto o turno atual segue; no turno seguinte o resultado pronto é
+  aplicado ao estado (novo "resumo" + RemoveMessage das mensagens
+  resumidas), que o checkpointer salva
+- Grupos de tool call (AIMessage + ToolMessages) nunca são divididos
+
+Requer um reducer que aceite RemoveMessage no canal de mensagens
+(add_messages ou desempenho.canal_mensagens.anexar_mensagens).
+
+Uso (num nó de entrada do grafo):
+    compactador = CompactadorConversa(resumidor_extrativo, limite_tokens=2000)
+
+    def no_compactar(estado, config):
+        thread_id = config["configurable"]["thread_id"]
+        return compactador.preparar(thread_id, estado["mensagens"], estado.get("resumo", ""))
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, Sequence
+
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from desempenho.contexto import agrupar_mensagens
+from desempenho.tokens import contar_tokens_mensagens
+
+
+# (resumo_anterior, mensagens_novas) -> resumo atualizado
+Resumidor = Callable[[str, Sequence[BaseMessage]], str]
+
+_PAPEIS = {HumanMessage: "Usuário", AIMessage: "Assistente", ToolMessage: "Ferramenta", SystemMessage: "Sistema"}
+
+
+def formatar_mensagens(mensagens: Sequence[BaseMessage]) -> list[str]:
+    linhas = []
+    for mensagem in mensagens:
+        papel = _PAPEIS.get(type(mensagem), type(mensagem).__name__)
+        conteudo = mensagem.content if isinstance(mensagem.content, str) else str(mensagem.content)
+        if not conteudo and getattr(mensagem, "tool_calls", None):
+            conteudo = ", ".join(f"{c['name']}({c['args']})" for c in mensagem.tool_calls)
+        if conteudo:
+            linhas.append(f"{papel}: {' '.join(conteudo.split())}")
+    return linhas
+
+
+def resumidor_extrativo(resumo_anterior: str, mensagens: Sequence[BaseMessage], max_linhas: int = 40) -> str:
+    """Resumidor sem LLM: primeira frase de cada mensagem, limitado às últimas max_linhas"""
+    linhas = resumo_anterior.splitlines() if resumo_anterior else []
+    for linha in formatar_mensagens(mensagens):
+        papel, _, conteudo = linha.partition(": ")
+        frase = conteudo.split(". ")[0]
+        linhas.append(f"{papel}: {frase[:160]}")
+    return "\n".join(linhas[-max_linhas:])
+
+
+def resumidor_llm(modelo) -> Resumidor:
+    """Resumidor que pede ao modelo para ATUALIZAR o resumo com as mensagens novas"""
+    def resumir(resumo_anterior: str, mensagens: Sequence[BaseMessage]) -> str:
+        novas = "\n".join(formatar_mensagens(mensagens))
+        prompt = (
+            "Atualize o resumo de uma conversa entre um usuário e um assistente.\n"
+            "Mantenha fatos sobre o usuário, decisões, pedidos pendentes e resultados de ferramentas.\n"
+            "Responda apenas com o resumo atualizado, em tópicos curtos.\n\n"
+            f"Resumo atual:\n{resumo_anterior or '(vazio)'}\n\n"
+            f"Mensagens novas:\n{novas}"
+        )
+        return modelo.invoke(prompt).content
+    return resumir
+
+
+class CompactadorConversa:
+    """
+    Dobra mensagens antigas num resumo, em segundo plano.
+
+    Args:
+        resumidor: (resumo_anterior, mensagens_novas) -> resumo
+        limite_tokens: Compacta quando o histórico passa disso
+        manter_mensagens: Mínimo de mensagens recentes mantidas intactas
+        executor: Executor para os resumos (padrão: 1 thread)
+        sincrono: Resume e aplica no mesmo turno (útil em testes)
+    """
+
+    def __init__(
+        self,
+        resumidor: Resumidor = resumidor_extrativo,
+        limite_tokens: int = 2000,
+        manter_mensagens: int = 6,
+        executor: Optional[ThreadPoolExecutor] = None,
+        sincrono: bool = False,
+    ):
+        self.resumidor = resumidor
+        self.limite_tokens = limite_tokens
+        self.manter_mensagens = manter_mensagens
+        self.sincrono = sincrono
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="compactacao")
+        # thread_id -> Future[(resumo, ids resumidos, ms)]
+        self._pendentes: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._metricas = {"disparadas": 0, "aplicadas": 0, "falhas": 0, "mensagens_removidas": 0, "ms_resumindo": 0.0}
+
+    def _corte(self, mensagens: Sequence[BaseMessage]) -> list[BaseMessage]:
+        """Mensagens antigas a resumir: tudo antes dos grupos recentes mantidos"""
+        grupos = agrupar_mensagens(mensagens)
+        mantidas = 0
+        while grupos and mantidas < self.manter_mensagens:
+            mantidas += len(grupos.pop())
+        return [m for grupo in grupos for m in grupo]
+
+    def _resumir(self, resumo: str, antigas: list[BaseMessage]) -> tuple[str, list[str], float]:
+        inicio = time.perf_counter()
+        novo = self.resumidor(resumo, antigas)
+        return novo, [m.id for m in antigas], (time.perf_counter() - inicio) * 1000
+
+    def preparar(self, thread_id: str, mensagens: Sequence[BaseMessage], resumo: str = "") -> dict:
+        """
+        Chamado no início de cada turno. Retorna a atualização de estado
+        ({"resumo", "mensagens": [RemoveMessage...]}) se um resumo ficou
+        pronto, e dispara um novo em segundo plano se o limite foi passado.
+        """
+        atualizacao: dict = {}
+
+        with self._lock:
+            futuro = self._pendentes.get(thread_id)
+            if futuro is not None and futuro.done():
+                del self._pendentes[thread_id]
+                try:
+                    novo_resumo, ids, ms = futuro.result()
+                except Exception as erro:
+                    print(f"   ⚠️  Compactação falhou: {erro}")
+                    self._metricas["falhas"] += 1
+                else:
+                    presentes = {m.id for m in mensagens}
+                    ids = [i for i in ids if i in presentes]
+                    atualizacao = {"resumo": novo_resumo, "mensagens": [RemoveMessage(id=i) for i in ids]}
+                    resumo = novo_resumo
+                    removidos = set(ids)
+                    mensagens = [m for m in mensagens if m.id not in removidos]
+                    self._metricas["aplicadas"] += 1
+                    self._metricas["mensagens_removidas"] += len(ids)
+                    self._metricas["ms_resumindo"] += ms
+            elif futuro is not None:
+                return atualizacao  # ainda resumindo; não dispara outro
+
+        if contar_tokens_mensagens(mensagens) <= self.limite_tokens:
+            return atualizacao
+        antigas = self._corte(mensagens)
+        if not antigas:
+            return atualizacao
+
+        with self._lock:
+            self._metricas["disparadas"] += 1
+        if self.sincrono:
+            novo_resumo, ids, ms = self._resumir(resumo, antigas)
+            with self._lock:
+                self._metricas["aplicadas"] += 1
+                self._metricas["mensagens_removidas"] += len(ids)
+                self._metricas["ms_resumindo"] += ms
+            remocoes = atualizacao.get("mensagens", []) + [RemoveMessage(id=i) for i in ids]
+            return {"resumo": novo_resumo, "mensagens": remocoes}
+
+        with self._lock:
+            self._pendentes[thread_id] = self._executor.submit(self._resumir, resumo, antigas)
+        return atualizacao
+
+    def aguardar(self, thread_id: str, timeout: Optional[float] = None) -> None:
+        """Espera o resumo pendente de uma thread (ex: antes de encerrar o processo)"""
+        futuro = self._pendentes.get(thread_id)
+        if futuro is not None:
+            futuro.exception(timeout)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            return dict(self._metricas, pendentes=len(self._pendentes))
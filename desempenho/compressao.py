@@ -0,0 +1,195 @@
+"""
+Compressão transparente de payloads de checkpoint por canal.
+
+Checkpoints de conversa são dominados por conteúdo repetido: o mesmo
+formato de mensagem, os mesmos nomes de ferramentas, os mesmos trechos
+da base de conhecimento. Compressores genéricos ganham muito quando
+recebem um DICIONÁRIO COMPARTILHADO com esses trechos frequentes
+(zlib aceita um "preset dictionary" via zdict).
+
+Algoritmos disponíveis (todos da biblioteca padrão):
+- "zlib":       zlib sem dicionário
+- "zlib-dict":  zlib com dicionário treinado (melhor para payloads pequenos)
+- "lzma":       lzma/xz (mais lento, melhor razão em payloads grandes)
+- "nenhum":     sem compressão
+
+Uso:
+    dicionario = treinar_dicionario(amostras_serializadas)
+    compressao = CompressaoPorCanal({"mensagens": "zlib-dict", "*": "zlib"}, dicionario)
+    memory = MemorySaverLimitado(compressao=compressao)
+"""
+
+import hashlib
+import lzma
+import re
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, asdict
+from typing import Iterable, Optional
+
+
+ALGORITMOS = ("zlib", "zlib-dict", "lzma", "nenhum")
+
+# Segmentos usados no treino: palavras e pontuação/espaços que as acompanham
+_SEGMENTO = re.compile(rb"[\w\x80-\xff]+[^\w\x80-\xff]{0,3}")
+
+
+def treinar_dicionario(amostras: Iterable[bytes], tamanho: int = 32 * 1024, tokens_por_trecho: int = 4) -> bytes:
+    """
+    Treina um dicionário compartilhado a partir de payloads de exemplo.
+
+    Conta sequências de tokens que se repetem ENTRE amostras e monta o
+    dicionário com as mais valiosas (frequência x tamanho). O zlib
+    referencia melhor o fim do dicionário, então as mais valiosas vão
+    por último.
+
+    Args:
+        amostras: Payloads serializados típicos (ex: canal "mensagens")
+        tamanho: Tamanho máximo do dicionário (zlib usa no máximo 32KB)
+        tokens_por_trecho: Quantos tokens formam cada trecho candidato
+    """
+    contagem: Counter = Counter()
+    for amostra in amostras:
+        tokens = _SEGMENTO.findall(amostra)
+        trechos = {
+            b"".join(tokens[i:i + tokens_por_trecho])
+            for i in range(0, max(len(tokens) - tokens_por_trecho + 1, 0))
+        }
+        # Conta uma vez por amostra: queremos o que é comum a muitas
+        contagem.update(trechos)
+
+    candidatos = [
+        (frequencia * len(trecho), trecho)
+        for trecho, frequencia in contagem.items()
+        if frequencia > 1
+    ]
+    candidatos.sort(reverse=True)
+
+    escolhidos = []
+    total = 0
+    for _, trecho in candidatos:
+        if total + len(trecho) > tamanho:
+            continue
+        escolhidos.append(trecho)
+        total += len(trecho)
+
+    return b"".join(reversed(escolhidos))
+
+
+@dataclass
+class EstatisticasCanal:
+    """Estatísticas acumuladas de um canal"""
+    payloads: int = 0
+    bytes_originais: int = 0
+    bytes_comprimidos: int = 0
+    segundos_compressao: float = 0.0
+    segundos_descompressao: float = 0.0
+
+    @property
+    def razao(self) -> float:
+        return self.bytes_originais / self.bytes_comprimidos if self.bytes_comprimidos else 1.0
+
+
+class CompressaoPorCanal:
+    """
+    Comprime valores serializados (tipo, bytes) conforme o canal.
+
+    O tipo resultante carrega o algoritmo (e o id do dicionário), então
+    descomprimir() não precisa saber de qual canal veio o payload.
+
+    Args:
+        canais: canal -> algoritmo. A chave "*" vale para canais não listados.
+        dicionario: Dicionário treinado (obrigatório para "zlib-dict")
+        nivel: Nível de compressão do zlib (1-9)
+        minimo_bytes: Payloads menores que isso não são comprimidos
+    """
+
+    def __init__(
+        self,
+        canais: dict[str, str],
+        dicionario: Optional[bytes] = None,
+        nivel: int = 6,
+        minimo_bytes: int = 64,
+    ):
+        for algoritmo in canais.values():
+            if algoritmo not in ALGORITMOS:
+                raise ValueError(f"Algoritmo desconhecido: {algoritmo}. Use um de {ALGORITMOS}")
+        if "zlib-dict" in canais.values() and not dicionario:
+            raise ValueError("'zlib-dict' exige um dicionário (use treinar_dicionario)")
+
+        self.canais = canais
+        self.nivel = nivel
+        self.minimo_bytes = minimo_bytes
+        # id -> dicionário; ids antigos continuam legíveis se o dicionário for trocado
+        self._dicionarios: dict[str, bytes] = {}
+        self._id_dicionario = self.registrar_dicionario(dicionario) if dicionario else None
+        self._estatisticas: dict[str, EstatisticasCanal] = {}
+
+    def registrar_dicionario(self, dicionario: bytes) -> str:
+        """Registra um dicionário e retorna seu id"""
+        id_dicionario = hashlib.sha256(dicionario).hexdigest()[:12]
+        self._dicionarios[id_dicionario] = dicionario
+        return id_dicionario
+
+    def algoritmo(self, canal: str) -> str:
+        return self.canais.get(canal, self.canais.get("*", "nenhum"))
+
+    def comprimir(self, canal: str, tipado: tuple[str, bytes]) -> tuple[str, bytes]:
+        """Comprime um valor já serializado pelo serde"""
+        tipo, dados = tipado
+        algoritmo = self.algoritmo(canal)
+        if algoritmo == "nenhum" or len(dados) < self.minimo_bytes:
+            return tipado
+
+        inicio = time.perf_counter()
+        if algoritmo == "zlib":
+            comprimido = zlib.compress(dados, self.nivel)
+            marcador = "zlib"
+        elif algoritmo == "zlib-dict":
+            compressor = zlib.compressobj(self.nivel, zdict=self._dicionarios[self._id_dicionario])
+            comprimido = compressor.compress(dados) + compressor.flush()
+            marcador = f"zd:{self._id_dicionario}"
+        else:
+            comprimido = lzma.compress(dados)
+            marcador = "lzma"
+        duracao = time.perf_counter() - inicio
+
+        estatisticas = self._estatisticas.setdefault(canal, EstatisticasCanal())
+        estatisticas.payloads += 1
+        estatisticas.bytes_originais += len(dados)
+        estatisticas.bytes_comprimidos += len(comprimido)
+        estatisticas.segundos_compressao += duracao
+
+        return (f"{marcador}|{tipo}", comprimido)
+
+    def descomprimir(self, tipado: tuple[str, bytes], canal: Optional[str] = None) -> tuple[str, bytes]:
+        """Desfaz comprimir(); valores não comprimidos passam direto"""
+        tipo, dados = tipado
+        if "|" not in tipo:
+            return tipado
+
+        marcador, tipo_original = tipo.split("|", 1)
+        inicio = time.perf_counter()
+        if marcador == "zlib":
+            dados = zlib.decompress(dados)
+        elif marcador.startswith("zd:"):
+            descompressor = zlib.decompressobj(zdict=self._dicionarios[marcador[3:]])
+            dados = descompressor.decompress(dados) + descompressor.flush()
+        elif marcador == "lzma":
+            dados = lzma.decompress(dados)
+        else:
+            raise ValueError(f"Payload com compressão desconhecida: {marcador}")
+
+        if canal is not None:
+            estatisticas = self._estatisticas.setdefault(canal, EstatisticasCanal())
+            estatisticas.segundos_descompressao += time.perf_counter() - inicio
+
+        return (tipo_original, dados)
+
+    def estatisticas(self) -> dict:
+        """Razão de compressão e custo de CPU por canal"""
+        return {
+            canal: {**asdict(e), "razao": round(e.razao, 2)}
+            for canal, e in self._estatisticas.items()
+        }
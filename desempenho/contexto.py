@@ -0,0 +1,204 @@
+"""
+Gerenciador de janela de contexto com orçamento de tokens.
+
+No 03_agente_conversacional.py o histórico cresce com operator.add e
+TODO ele vai para o modelo em cada turno: custo e latência sobem
+linearmente com a conversa, até estourar a janela de contexto.
+
+O GerenciadorContexto escolhe o que enviar, sem alterar o histórico
+salvo no checkpoint:
+- SystemMessages do início sempre vão
+- A última mensagem sempre vai (é a pergunta atual)
+- Do mais recente para o mais antigo, entram grupos inteiros enquanto
+  couberem no orçamento; para no primeiro que não cabe (sem buracos)
+- Um AIMessage com tool_calls e seus ToolMessages formam UM grupo:
+  nunca é enviado um resultado de ferramenta sem a chamada, nem uma
+  chamada sem os resultados (a API rejeita os dois casos)
+
+Tokens são estimados localmente (desempenho.tokens), sem downloads.
+
+Custo por turno proporcional ao orçamento e às mensagens novas, não ao
+histórico: a seleção lê do fim para o começo por índice (funciona sobre
+VisaoPrompt/SequenciaMensagens sem copiar) e para no primeiro grupo que
+não cabe; a contagem de cada mensagem fica em cache pelo id, e o total
+(tokens_entrada) continua da soma guardada na chamada anterior. Mensagens
+sem id (fora do reducer) são contadas sempre.
+
+Uso:
+    contexto = GerenciadorContexto(orcamento_tokens=3000)
+    resposta = llm.invoke(contexto.selecionar(mensagens))
+    contexto.metricas()   # tokens_economizados, mensagens_descartadas, ...
+"""
+
+import threading
+from typing import Iterator, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, ToolMessage
+
+from desempenho.tokens import contar_tokens_mensagem
+
+
+def agrupar_mensagens(mensagens: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """Agrupa cada AIMessage com tool_calls junto dos ToolMessages que respondem a ela"""
+    grupos: list[list[BaseMessage]] = []
+    pendentes: set = set()
+    for mensagem in mensagens:
+        if isinstance(mensagem, ToolMessage) and mensagem.tool_call_id in pendentes:
+            grupos[-1].append(mensagem)
+            pendentes.discard(mensagem.tool_call_id)
+            continue
+        grupos.append([mensagem])
+        pendentes = set()
+        if isinstance(mensagem, AIMessage) and mensagem.tool_calls:
+            pendentes = {chamada["id"] for chamada in mensagem.tool_calls}
+    return grupos
+
+
+class GerenciadorContexto:
+    """
+    Mantém as mensagens enviadas ao modelo dentro de um orçamento de tokens.
+
+    Args:
+        orcamento_tokens: Máximo de tokens das mensagens enviadas
+        limite_cache: Máximo de mensagens com contagem de tokens em cache
+    """
+
+    def __init__(self, orcamento_tokens: int = 3000, limite_cache: int = 50_000):
+        self.orcamento_tokens = orcamento_tokens
+        self.limite_cache = limite_cache
+        self._custos: dict[str, int] = {}
+        self._prefixos: dict[str, tuple[int, int]] = {}
+        self.ultima_medicao: dict = {}
+        self._totais = {"chamadas": 0, "tokens_entrada": 0, "tokens_enviados": 0, "mensagens_descartadas": 0}
+        self._lock = threading.Lock()
+
+    def selecionar(self, mensagens: Sequence[BaseMessage]) -> list[BaseMessage]:
+        """Sufixo mais recente do histórico que cabe no orçamento (mais as SystemMessages iniciais)"""
+        n = len(mensagens)
+        inicio = 0
+        while inicio < n and isinstance(mensagens[inicio], SystemMessage):
+            inicio += 1
+        sistema = [mensagens[i] for i in range(inicio)]
+
+        # Leitura por índice, do fim para o começo: mensagens de blocos
+        # selados são reidratadas uma vez e só as que forem visitadas
+        lidas: dict[int, BaseMessage] = {}
+
+        def ler(indice: int) -> BaseMessage:
+            if indice not in lidas:
+                lidas[indice] = mensagens[indice]
+            return lidas[indice]
+
+        custo_sistema = sum(self._custo(m) for m in sistema)
+        usados, corte = custo_sistema, n
+        for primeiro, custo in self._grupos_do_fim(ler, inicio, n):
+            # O grupo mais recente (pergunta atual) vai mesmo se estourar
+            if corte < n and usados + custo > self.orcamento_tokens:
+                break
+            corte = primeiro
+            usados += custo
+
+        selecionadas = sistema + [ler(i) for i in range(corte, n)]
+        total = custo_sistema + self._total_conversa(ler, inicio, n)
+
+        medicao = {
+            "tokens_entrada": total,
+            "tokens_enviados": usados,
+            "tokens_economizados": total - usados,
+            "mensagens_descartadas": n - len(selecionadas),
+            "mensagens_lidas": len(lidas),
+        }
+        with self._lock:
+            self.ultima_medicao = medicao
+            self._totais["chamadas"] += 1
+            for chave in ("tokens_entrada", "tokens_enviados", "mensagens_descartadas"):
+                self._totais[chave] += medicao[chave]
+        return selecionadas
+
+    def _grupos_do_fim(self, ler, inicio: int, n: int) -> Iterator[tuple[int, int]]:
+        """(primeiro índice, tokens) de cada grupo, do mais recente para o mais antigo"""
+        i = n - 1
+        while i >= inicio:
+            primeiro = i
+            if isinstance(ler(i), ToolMessage):
+                j, ids = i, set()
+                while j >= inicio and isinstance(ler(j), ToolMessage):
+                    ids.add(ler(j).tool_call_id)
+                    j -= 1
+                chamada = ler(j) if j >= inicio else None
+                if isinstance(chamada, AIMessage) and ids <= {c["id"] for c in chamada.tool_calls}:
+                    primeiro = j
+            yield primeiro, sum(self._custo(ler(k)) for k in range(primeiro, i + 1))
+            i = primeiro - 1
+
+    def _total_conversa(self, ler, inicio: int, n: int) -> int:
+        """
+        Tokens de mensagens[inicio:n], partindo da soma guardada na chamada
+        anterior: o histórico é append-only, então se a última mensagem
+        vista antes ainda está na mesma posição, tudo antes dela é igual
+        e só as mensagens novas são contadas.
+        """
+        depois = 0
+        for i in range(n - 1, inicio - 1, -1):
+            mensagem = ler(i)
+            ancora = self._prefixos.get(mensagem.id) if mensagem.id else None
+            if ancora is not None and ancora[0] == i - inicio:
+                total = ancora[1] + depois
+                break
+            depois += self._custo(mensagem)
+        else:
+            total = depois
+        if n > inicio and ler(n - 1).id:
+            self._guardar(self._prefixos, ler(n - 1).id, (n - 1 - inicio, total))
+        return total
+
+    def _custo(self, mensagem: BaseMessage) -> int:
+        """Tokens da mensagem, contados uma vez por id (mensagens do histórico não mudam)"""
+        if not mensagem.id:
+            return contar_tokens_mensagem(mensagem)
+        custo = self._custos.get(mensagem.id)
+        if custo is None:
+            custo = contar_tokens_mensagem(mensagem)
+            self._guardar(self._custos, mensagem.id, custo)
+        return custo
+
+    def _guardar(self, cache: dict, chave: str, valor) -> None:
+        with self._lock:
+            cache[chave] = valor
+            if len(cache) > self.limite_cache:
+                del cache[next(iter(cache))]
+
+    def metricas(self) -> dict:
+        with self._lock:
+            totais = dict(self._totais)
+        totais["tokens_economizados"] = totais["tokens_entrada"] - totais["tokens_enviados"]
+        return totais
+
+
+if __name__ == "__main__":
+    from langchain_core.messages import HumanMessage
+
+    historico = [SystemMessage(content="Você é um assistente pessoal.")]
+    for i in range(200):
+        historico.append(HumanMessage(content=f"Pergunta {i}: " + "detalhes " * 30, id=f"h{i}"))
+        if i % 10 == 0:
+            chamada = {"id": f"call_{i}", "name": "salvar_nota", "args": {"titulo": f"nota {i}", "conteudo": "x"}}
+            historico.append(AIMessage(content="", tool_calls=[chamada], id=f"c{i}"))
+            historico.append(ToolMessage(content=f"Nota 'nota {i}' salva com sucesso!", tool_call_id=f"call_{i}", id=f"t{i}"))
+        historico.append(AIMessage(content=f"Resposta {i}: " + "explicação " * 40, id=f"r{i}"))
+
+    contexto = GerenciadorContexto(orcamento_tokens=2000)
+    enviadas = contexto.selecionar(historico)
+    print(f"{len(historico)} mensagens no histórico -> {len(enviadas)} enviadas")
+    print(contexto.ultima_medicao)
+    print("Primeiras enviadas:", [type(m).__name__ for m in enviadas[:4]])
+
+    # Próximo turno: só as mensagens novas e a janela do orçamento são lidas
+    historico.append(HumanMessage(content="Pergunta nova: " + "detalhes " * 30, id="h200"))
+    enviadas = contexto.selecionar(historico)
+    medicao = contexto.ultima_medicao
+    print(f"\nTurno seguinte: {medicao['mensagens_lidas']} de {len(historico)} mensagens lidas")
+    total = sum(contar_tokens_mensagem(m) for m in historico)
+    assert medicao["tokens_entrada"] == total, (medicao["tokens_entrada"], total)
+    assert enviadas[-1].id == "h200" and isinstance(enviadas[0], SystemMessage)
+    assert not isinstance(enviadas[1], ToolMessage)
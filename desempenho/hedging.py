@@ -0,0 +1,276 @@
+"""
+Hedging: requisição duplicada quando a primeira passa do p95 observado.
+
+A latência p99 dos agentes é dominada por respostas lentas ocasionais
+do provedor, não pela média. Se a chamada é idempotente (temperatura 0:
+triagem, supervisor, tradutor), dá para não esperar a lenta:
+
+    t=0         dispara a requisição
+    t=p95       sem resposta? dispara uma cópia (o hedge)
+    1ª que chegar vence; a outra é cancelada/descartada
+
+Como só ~5% das chamadas passam do p95, o custo extra fica em ~5% das
+requisições, e a cauda cai para perto de p95 + latência típica.
+
+A PoliticaHedge:
+- estima o p95 (configurável) das latências de cada tentativa
+- só começa a duplicar com `minimo_amostras` medidas
+- limita a taxa: no máximo `taxa_maxima` das últimas `janela` chamadas
+  podem ter hedge (um provedor degradado não recebe o dobro de carga)
+- pode_duplicar() (opcional) veta o hedge na hora de disparar: com um
+  limitador na frente, a cópia só sai se houver vaga sem fila
+- mede quantos hedges foram disparados, quantos venceram e a latência
+  entregue (p50/p95/p99)
+
+Cancelamento do perdedor:
+- aexecutar (asyncio): a tarefa perdedora é cancelada e a conexão HTTP
+  fechada
+- executar (threads): uma chamada HTTP bloqueante não pode ser
+  interrompida; o perdedor é cancelado se ainda estiver na fila do
+  executor e, se já estiver em voo, o resultado é descartado quando chegar
+
+Uso:
+    POLITICA = PoliticaHedge(percentil=0.95, taxa_maxima=0.05)
+    resposta = POLITICA.executar(lambda: llm.invoke(mensagens))
+    resposta = await POLITICA.aexecutar(lambda: llm.ainvoke(mensagens))
+    POLITICA.metricas()
+
+Com desempenho.modelos: criar_modelo(..., temperature=0, hedge=POLITICA).
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Optional
+
+# Threads das tentativas síncronas (primária e hedge rodam fora da thread do nó)
+_EXECUTOR = ThreadPoolExecutor(max_workers=64, thread_name_prefix="hedge")
+
+
+def _percentil(ordenadas: list[float], fracao: float) -> float:
+    return ordenadas[int(fracao * (len(ordenadas) - 1))] if ordenadas else 0.0
+
+
+class PoliticaHedge:
+    """
+    Quando e quanto duplicar chamadas idempotentes.
+
+    Args:
+        percentil: Percentil da latência observada que dispara o hedge
+        taxa_maxima: Fração máxima de chamadas (na janela) com hedge
+        minimo_amostras: Latências medidas antes de começar a duplicar
+        atraso_minimo_ms: Piso do atraso (não duplica respostas rápidas)
+        janela: Quantas chamadas recentes contam para a taxa máxima
+        amostras: Quantas latências guardar para os percentis
+    """
+
+    def __init__(
+        self,
+        percentil: float = 0.95,
+        taxa_maxima: float = 0.05,
+        minimo_amostras: int = 20,
+        atraso_minimo_ms: float = 50.0,
+        janela: int = 200,
+        amostras: int = 500,
+    ):
+        self.percentil = percentil
+        self.taxa_maxima = taxa_maxima
+        self.minimo_amostras = minimo_amostras
+        self.atraso_minimo_ms = atraso_minimo_ms
+        self._lock = threading.Lock()
+        self._tentativas: deque = deque(maxlen=amostras)  # latência de cada requisição (ms)
+        self._entregues: deque = deque(maxlen=amostras)   # latência vista por quem chamou (ms)
+        self._janela: deque = deque(maxlen=janela)        # marca de cada chamada: [1] = com hedge
+        self._totais = {"chamadas": 0, "hedges": 0, "hedges_vencedores": 0, "hedges_negados": 0, "hedges_sem_vaga": 0}
+
+    def atraso_s(self) -> Optional[float]:
+        """Espera antes do hedge (p95 observado), ou None se ainda não há amostras suficientes"""
+        with self._lock:
+            if len(self._tentativas) < self.minimo_amostras:
+                return None
+            ordenadas = sorted(self._tentativas)
+        return max(_percentil(ordenadas, self.percentil), self.atraso_minimo_ms) / 1000
+
+    def _autorizar(self, marca: list, pode_duplicar: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Cabe mais um hedge na janela? (a chamada atual já está na janela)
+
+        Marca a chamada que pediu o hedge, não a última a entrar na janela:
+        com chamadas concorrentes, outras podem ter entrado depois dela.
+        """
+        if pode_duplicar is not None and not pode_duplicar():
+            with self._lock:
+                self._totais["hedges_sem_vaga"] += 1
+            return False
+        with self._lock:
+            if sum(m[0] for m in self._janela) + 1 > self.taxa_maxima * len(self._janela):
+                self._totais["hedges_negados"] += 1
+                return False
+            marca[0] = 1
+            self._totais["hedges"] += 1
+            return True
+
+    def _iniciar(self) -> tuple[float, list]:
+        """Registra a chamada na janela; devolve o início e a marca dela"""
+        marca = [0]
+        with self._lock:
+            self._totais["chamadas"] += 1
+            self._janela.append(marca)
+        return time.perf_counter(), marca
+
+    def _concluir(self, inicio: float, venceu_hedge: bool) -> None:
+        with self._lock:
+            self._entregues.append((time.perf_counter() - inicio) * 1000)
+            if venceu_hedge:
+                self._totais["hedges_vencedores"] += 1
+
+    def _medir(self, funcao: Callable[[], Any]) -> Any:
+        inicio = time.perf_counter()
+        resultado = funcao()
+        with self._lock:
+            self._tentativas.append((time.perf_counter() - inicio) * 1000)
+        return resultado
+
+    def executar(
+        self,
+        funcao: Callable[[], Any],
+        copia: Optional[Callable[[], Any]] = None,
+        pode_duplicar: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """
+        funcao() com hedge; as tentativas rodam no executor, com o contexto de quem chamou.
+
+        Args:
+            funcao: A tentativa primária (a latência medida é a dela)
+            copia: O hedge, se não for funcao() de novo (ex: a primária já tem
+                uma vaga do limitador reservada e a cópia precisa pedir a sua)
+            pode_duplicar: Consultada na hora do hedge; False = sem hedge
+        """
+        inicio, marca = self._iniciar()
+        atraso = self.atraso_s()
+        primaria = _EXECUTOR.submit(contextvars.copy_context().run, self._medir, funcao)
+        if atraso is None or wait([primaria], timeout=atraso).done or not self._autorizar(marca, pode_duplicar):
+            try:
+                return primaria.result()
+            finally:
+                self._concluir(inicio, venceu_hedge=False)
+
+        hedge = _EXECUTOR.submit(contextvars.copy_context().run, self._medir, copia or funcao)
+        pendentes: set[Future] = {primaria, hedge}
+        erro: Optional[BaseException] = None
+        while pendentes:
+            prontas, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for tentativa in sorted(prontas, key=lambda f: f is hedge):  # empate: primária
+                if tentativa.exception() is None:
+                    if hedge in pendentes:
+                        # Só tem efeito se ainda não começou. A primária nunca é
+                        # cancelada: ela pode ter recursos que só ela devolve
+                        hedge.cancel()
+                    self._concluir(inicio, venceu_hedge=tentativa is hedge)
+                    return tentativa.result()
+                erro = erro or tentativa.exception()
+        self._concluir(inicio, venceu_hedge=False)
+        raise erro
+
+    async def _amedir(self, fabrica: Callable[[], Awaitable[Any]]) -> Any:
+        inicio = time.perf_counter()
+        resultado = await fabrica()
+        with self._lock:
+            self._tentativas.append((time.perf_counter() - inicio) * 1000)
+        return resultado
+
+    async def aexecutar(
+        self,
+        fabrica: Callable[[], Awaitable[Any]],
+        copia: Optional[Callable[[], Awaitable[Any]]] = None,
+        pode_duplicar: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """Versão assíncrona: a tentativa perdedora é cancelada"""
+        inicio, marca = self._iniciar()
+        atraso = self.atraso_s()
+        primaria = asyncio.ensure_future(self._amedir(fabrica))
+        tarefas = {primaria}
+        try:
+            if atraso is not None:
+                await asyncio.wait(tarefas, timeout=atraso)
+            if primaria.done() or atraso is None or not self._autorizar(marca, pode_duplicar):
+                resultado = await primaria
+                self._concluir(inicio, venceu_hedge=False)
+                return resultado
+
+            hedge = asyncio.ensure_future(self._amedir(copia or fabrica))
+            tarefas.add(hedge)
+            pendentes = set(tarefas)
+            erro: Optional[BaseException] = None
+            while pendentes:
+                prontas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tentativa in sorted(prontas, key=lambda t: t is hedge):
+                    if tentativa.exception() is None:
+                        self._concluir(inicio, venceu_hedge=tentativa is hedge)
+                        return tentativa.result()
+                    erro = erro or tentativa.exception()
+            self._concluir(inicio, venceu_hedge=False)
+            raise erro
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()  # perdedora (ou todas, se quem chamou foi cancelado)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            t = dict(self._totais)
+            tentativas = sorted(self._tentativas)
+            entregues = sorted(self._entregues)
+        atraso = self.atraso_s()
+        return {
+            **t,
+            "taxa_hedge": round(t["hedges"] / t["chamadas"], 3) if t["chamadas"] else 0.0,
+            "taxa_vitoria_hedge": round(t["hedges_vencedores"] / t["hedges"], 3) if t["hedges"] else 0.0,
+            "atraso_hedge_ms": round(atraso * 1000, 1) if atraso is not None else None,
+            "latencia_requisicao_ms": {"p50": round(_percentil(tentativas, 0.5), 1),
+                                       "p95": round(_percentil(tentativas, 0.95), 1)},
+            "latencia_entregue_ms": {"p50": round(_percentil(entregues, 0.5), 1),
+                                     "p95": round(_percentil(entregues, 0.95), 1),
+                                     "p99": round(_percentil(entregues, 0.99), 1)},
+        }
+
+
+if __name__ == "__main__":
+    import random
+
+    def provedor() -> str:
+        """Cauda pesada: 97% entre 20-40 ms, 3% entre 300-600 ms"""
+        time.sleep(random.uniform(0.3, 0.6) if random.random() < 0.03 else random.uniform(0.02, 0.04))
+        return "billing"
+
+    def p99(latencias: list[float]) -> float:
+        return _percentil(sorted(latencias), 0.99)
+
+    random.seed(7)
+    sem_hedge = []
+    for _ in range(300):
+        inicio = time.perf_counter()
+        provedor()
+        sem_hedge.append((time.perf_counter() - inicio) * 1000)
+
+    politica = PoliticaHedge(percentil=0.95, taxa_maxima=0.1)
+    for _ in range(300):
+        politica.executar(provedor)
+
+    metricas = politica.metricas()
+    print(f"Sem hedge: p50 {_percentil(sorted(sem_hedge), 0.5):.0f} ms | p99 {p99(sem_hedge):.0f} ms")
+    print(f"Com hedge: p50 {metricas['latencia_entregue_ms']['p50']:.0f} ms | "
+          f"p99 {metricas['latencia_entregue_ms']['p99']:.0f} ms | "
+          f"{metricas['hedges']} hedges ({metricas['taxa_hedge']:.0%} das chamadas), "
+          f"{metricas['hedges_vencedores']} venceram")
+    print(metricas)
+
+    # Chamadas concorrentes: cada hedge marca a própria chamada na janela
+    concorrente = PoliticaHedge(percentil=0.5, taxa_maxima=0.5, minimo_amostras=5, atraso_minimo_ms=1, janela=1000)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda _: concorrente.executar(provedor), range(200)))
+    marcadas = sum(m[0] for m in concorrente._janela)
+    print(f"\nConcorrente: {concorrente.metricas()['hedges']} hedges, {marcadas} chamadas marcadas na janela")
+    assert marcadas == concorrente.metricas()["hedges"]
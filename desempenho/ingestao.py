@@ -0,0 +1,297 @@
+"""
+Ingestão de corpus do disco para os índices de busca.
+
+O BASE_CONHECIMENTO do 07_casos_praticos.py é um dict fixo no código.
+Um corpus real tem centenas de MB de JSONL/Markdown, e carregar tudo
+com json.load()/read() antes de indexar multiplica o pico de memória.
+
+Pipeline (tudo com geradores, um documento por vez):
+
+    ler_corpus(caminhos)        JSONL linha a linha, Markdown arquivo a arquivo
+        -> limpar_texto         espaços, markup de Markdown, Unicode NFC
+        -> dividir_em_chunks    janelas de palavras com sobreposição
+        -> lotes                adicionar_lote() em cada índice
+
+O IngestorCorpus lembra o hash de cada documento e os chunks gerados
+("doc_id#0", "doc_id#1", ...). Reingerir um documento sem mudanças não
+custa nada; se o texto mudou, só os chunks DELE são trocados; remover
+apaga só os chunks dele. Não é preciso reconstruir o índice.
+
+Uso:
+    ingestor = IngestorCorpus([indice_bm25, indice_vetorial], documentos)
+    ingestor.ingerir(ler_corpus(["corpus/faq.jsonl", "corpus/docs/"]))
+    ingestor.remover("faq-42")
+"""
+
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+
+@dataclass
+class Documento:
+    doc_id: str
+    texto: str
+    categoria: str = "documentacao"
+
+
+# ---------------------------------------------------------------
+# Leitura (geradores: memória constante por documento)
+# ---------------------------------------------------------------
+
+def ler_jsonl(
+    caminho: str,
+    campo_id: str = "id",
+    campo_texto: str = "texto",
+    campo_categoria: str = "categoria",
+    categoria_padrao: str = "documentacao",
+) -> Iterator[Documento]:
+    """Um Documento por linha; linhas vazias ou sem texto são ignoradas"""
+    with open(caminho, encoding="utf-8") as arquivo:
+        for numero, linha in enumerate(arquivo, start=1):
+            if not linha.strip():
+                continue
+            registro = json.loads(linha)
+            texto = registro.get(campo_texto)
+            if not texto:
+                continue
+            yield Documento(
+                doc_id=str(registro.get(campo_id, f"{os.path.basename(caminho)}:{numero}")),
+                texto=texto,
+                categoria=registro.get(campo_categoria, categoria_padrao),
+            )
+
+
+def ler_markdown(caminho: str, raiz: Optional[str] = None, categoria: Optional[str] = None) -> Iterator[Documento]:
+    """
+    Um Documento por arquivo .md. O doc_id é o caminho relativo à raiz;
+    a categoria padrão é o nome da pasta do arquivo.
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        texto = arquivo.read()
+    raiz = raiz or os.path.dirname(caminho)
+    yield Documento(
+        doc_id=os.path.relpath(caminho, raiz),
+        texto=texto,
+        categoria=categoria or os.path.basename(os.path.dirname(os.path.abspath(caminho))),
+    )
+
+
+def ler_corpus(caminhos: Iterable[str], categoria: Optional[str] = None) -> Iterator[Documento]:
+    """Percorre arquivos e diretórios (recursivo) despachando por extensão"""
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for pasta, _, arquivos in os.walk(caminho):
+                for nome in sorted(arquivos):
+                    yield from _ler_arquivo(os.path.join(pasta, nome), caminho, categoria)
+        else:
+            yield from _ler_arquivo(caminho, os.path.dirname(caminho), categoria)
+
+
+def _ler_arquivo(caminho: str, raiz: str, categoria: Optional[str]) -> Iterator[Documento]:
+    if caminho.endswith(".jsonl"):
+        for documento in ler_jsonl(caminho):
+            if categoria:
+                documento.categoria = categoria
+            yield documento
+    elif caminho.endswith((".md", ".markdown")):
+        yield from ler_markdown(caminho, raiz, categoria)
+
+
+# ---------------------------------------------------------------
+# Normalização e chunking
+# ---------------------------------------------------------------
+
+_LINK_MD = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+_MARKUP_MD = re.compile(r"^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+|[*_`~]{1,3}", re.MULTILINE)
+_ESPACOS = re.compile(r"\s+")
+
+
+def limpar_texto(texto: str) -> str:
+    """Unicode NFC, sem markup de Markdown, espaços colapsados"""
+    texto = unicodedata.normalize("NFC", texto)
+    texto = _LINK_MD.sub(r"\1", texto)
+    texto = _MARKUP_MD.sub("", texto)
+    return _ESPACOS.sub(" ", texto).strip()
+
+
+def dividir_em_chunks(texto: str, tamanho: int = 200, sobreposicao: int = 40) -> Iterator[str]:
+    """Janelas de `tamanho` palavras; janelas vizinhas compartilham `sobreposicao` palavras"""
+    if sobreposicao >= tamanho:
+        raise ValueError("sobreposicao deve ser menor que tamanho")
+    palavras = texto.split()
+    passo = tamanho - sobreposicao
+    for inicio in range(0, max(len(palavras) - sobreposicao, 1), passo):
+        yield " ".join(palavras[inicio:inicio + tamanho])
+
+
+# ---------------------------------------------------------------
+# Ingestão incremental
+# ---------------------------------------------------------------
+
+class IngestorCorpus:
+    """
+    Alimenta um ou mais índices (interface adicionar_lote/remover) em lotes.
+
+    Args:
+        indices: Índices a manter sincronizados (ex: IndiceBM25, IndiceVetorial)
+        documentos: Dict chunk_id -> (categoria, texto) usado para montar
+            as respostas; o ingestor o mantém atualizado
+        tamanho_chunk: Palavras por chunk
+        sobreposicao: Palavras repetidas entre chunks vizinhos
+        tamanho_lote: Chunks por chamada a adicionar_lote
+    """
+
+    def __init__(
+        self,
+        indices: Iterable,
+        documentos: Optional[dict] = None,
+        tamanho_chunk: int = 200,
+        sobreposicao: int = 40,
+        tamanho_lote: int = 512,
+    ):
+        self.indices = [indice for indice in indices if indice is not None]
+        self.documentos = documentos if documentos is not None else {}
+        self.tamanho_chunk = tamanho_chunk
+        self.sobreposicao = sobreposicao
+        self.tamanho_lote = tamanho_lote
+        # doc_id -> (hash do texto, ids dos chunks)
+        self._registros: dict[str, tuple[str, list[str]]] = {}
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._registros
+
+    def _gravar_lote(self, lote: list[tuple[str, str, str]]) -> None:
+        # documentos antes dos índices: um índice particionado consulta a categoria aqui
+        for chunk_id, categoria, texto in lote:
+            self.documentos[chunk_id] = (categoria, texto)
+        pares = [(chunk_id, texto) for chunk_id, _, texto in lote]
+        for indice in self.indices:
+            indice.adicionar_lote(pares)
+
+    def ingerir(self, documentos: Iterable[Documento]) -> dict:
+        """
+        Adiciona documentos novos e atualiza os que mudaram.
+
+        Um doc_id repetido na mesma entrada vale pela última versão: os
+        chunks da versão anterior saem do lote pendente (e dos índices, se
+        o lote já foi gravado) antes de entrar a nova.
+
+        Returns:
+            Contagem de documentos novos, atualizados, inalterados, duplicados
+            (doc_id repetido na entrada) e de chunks gravados
+        """
+        estatisticas = {"novos": 0, "atualizados": 0, "inalterados": 0, "duplicados": 0, "chunks": 0}
+        lote: list[tuple[str, str, str]] = []
+        vistos: set[str] = set()
+
+        for documento in documentos:
+            texto = limpar_texto(documento.texto)
+            assinatura = hashlib.sha256(f"{documento.categoria}\0{texto}".encode()).hexdigest()
+
+            anterior = self._registros.get(documento.doc_id)
+            repetido = documento.doc_id in vistos
+            vistos.add(documento.doc_id)
+            if repetido:
+                estatisticas["duplicados"] += 1
+                if anterior[0] == assinatura:
+                    continue
+                pendentes = set(anterior[1])
+                lote = [item for item in lote if item[0] not in pendentes]
+                self.remover(documento.doc_id)
+            elif anterior is not None:
+                if anterior[0] == assinatura:
+                    estatisticas["inalterados"] += 1
+                    continue
+                self.remover(documento.doc_id)
+                estatisticas["atualizados"] += 1
+            else:
+                estatisticas["novos"] += 1
+
+            chunk_ids = []
+            for n, trecho in enumerate(dividir_em_chunks(texto, self.tamanho_chunk, self.sobreposicao)):
+                chunk_id = f"{documento.doc_id}#{n}"
+                chunk_ids.append(chunk_id)
+                lote.append((chunk_id, documento.categoria, trecho))
+                if len(lote) >= self.tamanho_lote:
+                    self._gravar_lote(lote)
+                    estatisticas["chunks"] += len(lote)
+                    lote = []
+            self._registros[documento.doc_id] = (assinatura, chunk_ids)
+
+        if lote:
+            self._gravar_lote(lote)
+            estatisticas["chunks"] += len(lote)
+        return estatisticas
+
+    def remover(self, doc_id: str) -> bool:
+        """Remove todos os chunks de um documento. Retorna False se não existia."""
+        registro = self._registros.pop(doc_id, None)
+        if registro is None:
+            return False
+        for chunk_id in registro[1]:
+            for indice in self.indices:
+                indice.remover(chunk_id)
+            self.documentos.pop(chunk_id, None)
+        return True
+
+    def sincronizar(self, documentos: Iterable[Documento]) -> dict:
+        """ingerir() + remove documentos já ingeridos que não apareceram desta vez"""
+        vistos = set()
+
+        def registrar(origem):
+            for documento in origem:
+                vistos.add(documento.doc_id)
+                yield documento
+
+        estatisticas = self.ingerir(registrar(documentos))
+        ausentes = [doc_id for doc_id in self._registros if doc_id not in vistos]
+        for doc_id in ausentes:
+            self.remover(doc_id)
+        estatisticas["removidos"] = len(ausentes)
+        return estatisticas
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from desempenho.busca_lexica import IndiceBM25
+
+    with tempfile.TemporaryDirectory() as pasta:
+        faq = os.path.join(pasta, "faq.jsonl")
+        with open(faq, "w", encoding="utf-8") as f:
+            for i in range(1, 1001):
+                f.write(json.dumps({"id": f"faq-{i}", "categoria": "politicas",
+                                    "texto": f"Pergunta {i}: reembolso proporcional em até {i % 30} dias."}) + "\n")
+            f.write(json.dumps({"id": "faq-lgpd", "categoria": "documentacao",
+                                "texto": "Tratamos dados pessoais conforme a LGPD, com criptografia em repouso."}) + "\n")
+
+        os.makedirs(os.path.join(pasta, "documentacao"))
+        with open(os.path.join(pasta, "documentacao", "webhooks.md"), "w", encoding="utf-8") as f:
+            f.write("# Webhooks\n\nConfigure **webhooks** em [Configurações](https://exemplo/config).\n"
+                    + "Cada evento é reenviado até 5 vezes. " * 60)
+
+        indice = IndiceBM25()
+        ingestor = IngestorCorpus([indice], tamanho_chunk=100, sobreposicao=20)
+
+        print("Ingestão inicial:", ingestor.ingerir(ler_corpus([pasta])))
+        print("Reingestão (sem mudanças):", ingestor.ingerir(ler_corpus([pasta])))
+        print("webhooks ->", indice.buscar("webhook reenviado", k=2))
+
+        ingestor.ingerir([Documento("faq-lgpd", "Seguimos a LGPD e a ISO 27001.", "documentacao")])
+        print("Após atualizar faq-lgpd:", ingestor.documentos["faq-lgpd#0"])
+
+        # Mesmo doc_id duas vezes na entrada: vale a última versão, sem chunks órfãos
+        longo = Documento("faq-dup", "versão antiga com bastante texto " * 60, "politicas")
+        curto = Documento("faq-dup", "versão nova e curta", "politicas")
+        print("Duplicado na entrada:", ingestor.ingerir([longo, curto]))
+        orfaos = [c for c in ingestor.documentos if c.startswith("faq-dup#") and c != "faq-dup#0"]
+        assert not orfaos and not indice.buscar("antiga", k=5), orfaos
+        assert ingestor.documentos["faq-dup#0"] == ("politicas", "versão nova e curta")
+
+        ingestor.remover("documentacao/webhooks.md")
+        print("Após remover webhooks:", indice.buscar("webhook", k=2), f"({len(indice)} chunks no índice)")
@@ -0,0 +1,291 @@
+"""
+Roteador local de intenções: uma regex compilada sobre o texto normalizado.
+
+react_pensar (01), decidir_ferramenta (04_integracao_llm.py), a triagem
+e o fallback do supervisor decidiam com cadeias de `"x" in texto.lower()`:
+- "código" não bate com "codigo", "Pesquise" depende do lower()
+- sem noção de confiança: "senha e reembolso" cai no primeiro elif
+
+O RoteadorIntencoes:
+- normaliza o texto uma vez (casefold + sem acentos)
+- junta os termos de TODAS as intenções numa única regex com um grupo
+  nomeado por intenção (alternativas mais longas primeiro) e conta as
+  ocorrências de cada uma numa só passada (finditer)
+- termos literais batem no início de palavra e valem como prefixo
+  ("pesquis" pega pesquisa/pesquisar); `expressoes` aceita regex crua
+  sobre o texto normalizado (ex: r"\\d\\s*[-+*/]\\s*\\d" para contas)
+- confiança: uma intenção só -> alta (0.9, mais ocorrências -> mais);
+  mais de uma -> ambígua (<= 0.5) e vence a mais frequente, empate pela
+  ordem das intenções; nenhuma -> `padrao` com confiança 0
+- opcional: ClassificadorLinear (NumPy) para os casos ambíguos ou sem
+  termo, usado só se a confiança dele passar do limiar
+- métricas em microssegundos (média, p50, p95)
+
+Quem chama decide o que fazer com baixa confiança: a triagem usa o
+roteador como 1º nível da Cascata (desempenho.cascata) e só chama o
+LLM nos casos ambíguos.
+
+Uso:
+    ROTEADOR = RoteadorIntencoes(
+        {"tech": ["senha", "login"], "billing": ["reembolso", "pagamento"]},
+        padrao="general",
+    )
+    intencao = ROTEADOR.classificar("Esqueci minha SENHA")
+    intencao.rotulo, intencao.confianca      # "tech", 0.9
+    ROTEADOR("...")                          # (rótulo, confiança): serve de Nivel da Cascata
+    ROTEADOR.metricas()
+"""
+
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+
+def normalizar(texto: str) -> str:
+    """casefold + sem acentos ("Informação" -> "informacao")"""
+    texto = texto.casefold()
+    if texto.isascii():
+        return texto
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+
+
+def _percentil(ordenadas: list, fracao: float) -> float:
+    return ordenadas[int(fracao * (len(ordenadas) - 1))] if ordenadas else 0.0
+
+
+@dataclass
+class Intencao:
+    rotulo: Optional[str]
+    confianca: float
+    origem: str                      # "regex", "classificador" ou "padrao"
+    contagens: dict = field(default_factory=dict)
+
+    @property
+    def ambigua(self) -> bool:
+        return len(self.contagens) > 1
+
+
+class ClassificadorLinear:
+    """
+    Classificador linear mínimo (requer numpy): palavras e bigramas em
+    `dimensoes` posições por hashing, pesos por regressão ridge na forma
+    dual (poucos exemplos, sem iterar). Prever = somar linhas dos pesos.
+
+    Confiança = margem entre o 1º e o 2º escore, limitada a [0, 1].
+    """
+
+    def __init__(self, dimensoes: int = 4096, regularizacao: float = 0.1):
+        import numpy as np  # opcional: só quem usa o classificador precisa
+
+        self._np = np
+        self.dimensoes = dimensoes
+        self.regularizacao = regularizacao
+        self.rotulos: list[str] = []
+        self.pesos = None
+
+    def _indices(self, texto: str) -> list[int]:
+        palavras = re.findall(r"\w+", normalizar(texto))
+        atributos = palavras + [f"{a} {b}" for a, b in zip(palavras, palavras[1:])]
+        return [zlib.crc32(a.encode("utf-8")) % self.dimensoes for a in atributos]
+
+    def treinar(self, exemplos: Iterable[tuple[str, str]]) -> "ClassificadorLinear":
+        """exemplos: (texto, rótulo)"""
+        np = self._np
+        exemplos = list(exemplos)
+        self.rotulos = sorted({rotulo for _, rotulo in exemplos})
+        posicao = {rotulo: i for i, rotulo in enumerate(self.rotulos)}
+        x = np.zeros((len(exemplos), self.dimensoes))
+        y = np.zeros((len(exemplos), len(self.rotulos)))
+        for linha, (texto, rotulo) in enumerate(exemplos):
+            indices = self._indices(texto)
+            if indices:
+                np.add.at(x[linha], indices, 1.0 / len(indices) ** 0.5)
+            y[linha, posicao[rotulo]] = 1.0
+        # W = Xᵀ (X Xᵀ + λI)⁻¹ Y: sistema n x n (n = nº de exemplos)
+        gram = x @ x.T + self.regularizacao * np.eye(len(exemplos))
+        self.pesos = x.T @ np.linalg.solve(gram, y)
+        return self
+
+    def prever(self, texto: str) -> tuple[Optional[str], float]:
+        indices = self._indices(texto)
+        if self.pesos is None or not indices:
+            return None, 0.0
+        escores = self.pesos[indices].sum(axis=0) / len(indices) ** 0.5
+        ordem = escores.argsort()[::-1]
+        margem = escores[ordem[0]] - (escores[ordem[1]] if len(ordem) > 1 else 0.0)
+        return self.rotulos[ordem[0]], float(min(max(margem, 0.0), 1.0))
+
+
+class RoteadorIntencoes:
+    """
+    Intenções por termos, numa única regex compilada.
+
+    Args:
+        termos: intenção -> termos literais (prefixos de palavra). A
+            ordem das intenções desempata
+        expressoes: intenção -> regex cruas, aplicadas ao texto normalizado
+        padrao: Rótulo quando nada bate
+        prioridade: Se True, na ambiguidade vence a primeira intenção (na
+            ordem) que bateu, como numa cadeia de if/elif; se False, a
+            que bateu mais vezes
+        classificador: ClassificadorLinear treinado (opcional), consultado
+            nos casos ambíguos ou sem termo
+        limiar_classificador: Confiança mínima para usar o classificador
+        amostras: Quantas latências guardar para os percentis
+    """
+
+    def __init__(
+        self,
+        termos: dict[str, Iterable[str]],
+        expressoes: Optional[dict[str, Iterable[str]]] = None,
+        padrao: Optional[str] = None,
+        prioridade: bool = False,
+        classificador: Optional[ClassificadorLinear] = None,
+        limiar_classificador: float = 0.5,
+        amostras: int = 1000,
+    ):
+        expressoes = expressoes or {}
+        self.intencoes = list(dict.fromkeys([*termos, *expressoes]))
+        self.padrao = padrao
+        self.prioridade = prioridade
+        self.classificador = classificador
+        self.limiar_classificador = limiar_classificador
+
+        # Uma regex para tudo, um grupo nomeado por intenção:
+        #   \b(?:(?P<t0>termos de intenções[0])|(?P<t1>...))|(?P<e0>expressões)|...
+        termos_por_grupo, expressoes_por_grupo = [], []
+        self._grupos: dict[str, str] = {}
+        for i, intencao in enumerate(self.intencoes):
+            literais = sorted((re.escape(normalizar(t)) for t in termos.get(intencao, ())), key=len, reverse=True)
+            if literais:
+                termos_por_grupo.append(f"(?P<t{i}>{'|'.join(literais)})")
+                self._grupos[f"t{i}"] = intencao
+            if expressoes.get(intencao):
+                expressoes_por_grupo.append(f"(?P<e{i}>{'|'.join(expressoes[intencao])})")
+                self._grupos[f"e{i}"] = intencao
+        partes = ([rf"\b(?:{'|'.join(termos_por_grupo)})"] if termos_por_grupo else []) + expressoes_por_grupo
+        self._regex = re.compile("|".join(partes))
+
+        self._lock = threading.Lock()
+        self._latencias_us: deque = deque(maxlen=amostras)
+        self._por_rotulo: Counter = Counter()
+        self._totais = {"chamadas": 0, "ambiguas": 0, "sem_intencao": 0, "via_classificador": 0}
+
+    def _classificar(self, texto: str) -> Intencao:
+        normalizado = normalizar(texto)
+        contagens: dict[str, int] = {}
+        for encontrado in self._regex.finditer(normalizado):
+            intencao = self._grupos[encontrado.lastgroup]
+            contagens[intencao] = contagens.get(intencao, 0) + 1
+
+        if len(contagens) == 1:
+            (rotulo, ocorrencias), = contagens.items()
+            return Intencao(rotulo, 1.0 - 0.1 / ocorrencias, "regex", contagens)
+
+        if self.classificador is not None:
+            rotulo, confianca = self.classificador.prever(normalizado)
+            if rotulo is not None and confianca >= self.limiar_classificador:
+                return Intencao(rotulo, confianca, "classificador", contagens)
+
+        if not contagens:
+            return Intencao(self.padrao, 0.0, "padrao")
+        # Ambígua: a primeira na ordem (prioridade) ou a mais frequente (empate
+        # pela ordem), com confiança <= 0.5
+        if self.prioridade:
+            rotulo = min(contagens, key=self.intencoes.index)
+        else:
+            rotulo = min(contagens, key=lambda r: (-contagens[r], self.intencoes.index(r)))
+        return Intencao(rotulo, 0.5 * contagens[rotulo] / sum(contagens.values()), "regex", contagens)
+
+    def classificar(self, texto: str) -> Intencao:
+        inicio = time.perf_counter_ns()
+        intencao = self._classificar(texto)
+        us = (time.perf_counter_ns() - inicio) / 1000
+        with self._lock:
+            self._latencias_us.append(us)
+            self._totais["chamadas"] += 1
+            self._totais["ambiguas"] += intencao.ambigua
+            self._totais["sem_intencao"] += not intencao.contagens
+            self._totais["via_classificador"] += intencao.origem == "classificador"
+            self._por_rotulo[intencao.rotulo] += 1
+        return intencao
+
+    def __call__(self, texto: str) -> tuple[Optional[str], float]:
+        """(rótulo, confiança): o formato de um Nivel sem avaliador na Cascata"""
+        intencao = self.classificar(texto)
+        return intencao.rotulo, intencao.confianca
+
+    def metricas(self) -> dict:
+        with self._lock:
+            latencias = sorted(self._latencias_us)
+            t = dict(self._totais)
+            por_rotulo = dict(self._por_rotulo)
+        return {
+            **t,
+            "por_rotulo": por_rotulo,
+            "latencia_us": {
+                "media": round(sum(latencias) / len(latencias), 2) if latencias else 0.0,
+                "p50": round(_percentil(latencias, 0.5), 2),
+                "p95": round(_percentil(latencias, 0.95), 2),
+            },
+        }
+
+
+if __name__ == "__main__":
+    roteador = RoteadorIntencoes(
+        {
+            "tech": ["senha", "login", "erro", "bug", "trava", "travando", "não carrega", "fecha sozinho"],
+            "billing": ["reembolso", "pagamento", "pagar", "cobrança", "cobrado", "fatura", "boleto", "cartão"],
+            "general": ["feedback", "sugestão", "elogio"],
+        },
+        padrao="general",
+    )
+
+    perguntas = [
+        "Esqueci minha SENHA e não consigo fazer login",
+        "Quero um reembolso do pagamento",
+        "Fui cobrado duas vezes na fatura",
+        "Tenho uma sugestão para o app",
+        "O app fecha sozinho quando tento pagar",   # tech + billing: ambígua -> LLM
+        "Bom dia!",                                 # nada bate -> LLM
+    ]
+    for pergunta in perguntas:
+        intencao = roteador.classificar(pergunta)
+        destino = "instantâneo" if intencao.confianca >= 0.8 else ("ambígua" if intencao.ambigua else "sem termo") + " -> LLM"
+        print(f"   {pergunta!r:50} -> {intencao.rotulo:8} {intencao.confianca:.2f} ({destino}) {intencao.contagens}")
+
+    for _ in range(2_000):
+        for pergunta in perguntas:
+            roteador.classificar(pergunta)
+    latencia = roteador.metricas()["latencia_us"]
+    print(f"   Roteamento local: p50 {latencia['p50']} µs, p95 {latencia['p95']} µs "
+          f"(uma chamada de LLM para classificar: centenas de ms)")
+    print(roteador.metricas())
+
+    # prioridade=True: vence a primeira intenção da lista que bateu (if/elif),
+    # mesmo que outra bata mais vezes
+    acoes = {"buscar_clima": ["clima"], "calcular": ["calcular"]}
+    pergunta = "Qual o clima? Depois calcular 2+2 e calcular 3*3"
+    por_frequencia = RoteadorIntencoes(acoes, padrao="responder").classificar(pergunta)
+    por_ordem = RoteadorIntencoes(acoes, padrao="responder", prioridade=True).classificar(pergunta)
+    print(f"   {pergunta!r}: mais frequente -> {por_frequencia.rotulo}, prioridade -> {por_ordem.rotulo}")
+    assert (por_frequencia.rotulo, por_ordem.rotulo) == ("calcular", "buscar_clima")
+
+    try:
+        classificador = ClassificadorLinear().treinar([
+            ("não consigo entrar na minha conta", "tech"), ("o aplicativo não abre", "tech"),
+            ("a tela fica branca", "tech"), ("quero meu dinheiro de volta", "billing"),
+            ("valor errado na minha conta do mês", "billing"), ("quero cancelar a assinatura", "billing"),
+            ("bom dia", "general"), ("gostaria de falar com alguém", "general"),
+        ])
+        com_classificador = RoteadorIntencoes({"tech": ["senha"], "billing": ["reembolso"]}, padrao="general",
+                                              classificador=classificador)
+        for pergunta in ["quero o dinheiro de volta", "o aplicativo não abre de jeito nenhum", "xyz"]:
+            print(f"   {pergunta!r:40} -> {com_classificador.classificar(pergunta)}")
+    except ImportError:
+        print("numpy não instalado: ClassificadorLinear indisponível")
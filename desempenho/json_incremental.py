@@ -0,0 +1,371 @@
+"""
+JSON incremental: decisões lidas do stream, campo a campo.
+
+O supervisor (05_agente_supervisor.py) esperava a resposta inteira,
+tirava a cerca de código e fazia json.loads; qualquer erro de parse
+terminava a tarefa com FINISH. Mas o roteamento só precisa de
+"proximo_agente", que o modelo emite primeiro; o "raciocinio" que vem
+depois é só texto para o log.
+
+LeitorJSONIncremental:
+- recebe os pedaços do stream (alimentar) e varre cada caractere uma
+  única vez, guardando o estado (dentro de string, escape, pilha de
+  { e [)
+- ignora o que vem antes do primeiro "{" (```json, texto solto)
+- cada campo do objeto de nível superior entra em `campos` assim que o
+  valor fecha (string, número, true/false/null, objeto ou lista)
+
+reparar_json(): conserto local e barato (µs, sem LLM) de JSON
+malformado: fecha string e chaves abertas, tira vírgula sobrando, põe
+aspas em chaves/valores sem aspas, aceita aspas simples. Se ainda assim
+não parsear, devolve os campos que o leitor já tinha fechado.
+
+DecisoesStreaming junta os dois: lê o stream até `campo` fechar e
+devolve na hora uma AIMessage com o JSON dos campos lidos e os
+metadados do stream (logprobs), no formato que
+desempenho.cascata.rotulo_em() avalia. O resto do stream é drenado em
+segundo plano: o provedor manda o uso (tokens, cache) no último pedaço,
+e sem ele o MedidorCache e o limitador ficariam sem os números reais.
+Com drenar=False o stream é fechado na hora (a geração para), e essas
+chamadas ficam com uso desconhecido.
+
+Uso:
+    DECISOES = DecisoesStreaming("proximo_agente")
+    resposta = DECISOES.ler(llm.stream(mensagens))          # volta no campo
+    resposta = await DECISOES.aler(llm.astream(mensagens))
+    rotulo_em(AGENTES, campo="proximo_agente")(resposta)
+    DECISOES.metricas()
+
+    leitor = LeitorJSONIncremental()
+    for pedaco in pedacos:
+        if "proximo_agente" in leitor.alimentar(pedaco): ...
+"""
+
+import ast
+import json
+import re
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterable, Iterable, Optional
+
+from langchain_core.messages import AIMessage
+
+_FECHAMENTO = {"{": "}", "[": "]"}
+
+# Threads que consomem o resto dos streams depois que a decisão saiu
+_DRENAGEM = ThreadPoolExecutor(max_workers=16, thread_name_prefix="drenagem")
+
+
+class LeitorJSONIncremental:
+    """
+    Campos do objeto de nível superior, conforme o texto chega.
+
+    Atributos:
+        texto: Tudo o que já foi alimentado
+        campos: Campos já completos (chave -> valor parseado)
+        completo: O objeto de nível superior já fechou
+        fim: Índice (em texto) do "}" que fecha o objeto
+    """
+
+    def __init__(self):
+        self.texto = ""
+        self.campos: dict[str, Any] = {}
+        self.completo = False
+        self.fim: Optional[int] = None
+        self._posicao = 0
+        self._iniciado = False
+        self._pilha: list[str] = []
+        self._em_string = False
+        self._escape = False
+        self._esperando_valor = False
+        self._chave: Optional[str] = None
+        self._inicio_token: Optional[int] = None
+
+    def _guardar(self, fim: int, novos: list[str]) -> None:
+        """Token de nível superior texto[_inicio_token:fim] fechou: chave ou valor"""
+        token = self.texto[self._inicio_token:fim].strip()
+        self._inicio_token = None
+        try:
+            valor = json.loads(token)
+        except json.JSONDecodeError:
+            return  # malformado: fica para reparar_json()
+        if not self._esperando_valor:
+            self._chave = valor if isinstance(valor, str) else None
+        elif self._chave is not None:
+            self.campos[self._chave] = valor
+            novos.append(self._chave)
+            self._chave = None
+
+    def alimentar(self, pedaco: str) -> list[str]:
+        """Acrescenta um pedaço; devolve as chaves dos campos que fecharam nele"""
+        self.texto += pedaco
+        texto, novos = self.texto, []
+        for i in range(self._posicao, len(texto)):
+            if self.completo:
+                break
+            c = texto[i]
+            if not self._iniciado:
+                if c == "{":
+                    self._iniciado = True
+                    self._pilha.append(c)
+                continue
+            nivel_superior = len(self._pilha) == 1
+
+            if self._em_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._em_string = False
+                    if nivel_superior:
+                        self._guardar(i + 1, novos)
+            elif c == '"':
+                self._em_string = True
+                if nivel_superior and self._inicio_token is None:
+                    self._inicio_token = i
+            elif c in "{[":
+                if nivel_superior and self._inicio_token is None:
+                    self._inicio_token = i
+                self._pilha.append(c)
+            elif c in "}]":
+                if nivel_superior:
+                    if self._inicio_token is not None:
+                        self._guardar(i, novos)  # número/true/false/null antes do "}"
+                    self._pilha.pop()
+                    self.completo, self.fim = True, i
+                else:
+                    self._pilha.pop()
+                    if len(self._pilha) == 1 and self._inicio_token is not None:
+                        self._guardar(i + 1, novos)
+            elif nivel_superior:
+                if c == ":":
+                    self._esperando_valor = True
+                elif c == ",":
+                    if self._inicio_token is not None:
+                        self._guardar(i, novos)
+                    self._esperando_valor = False
+                elif not c.isspace() and self._inicio_token is None:
+                    self._inicio_token = i
+        self._posicao = len(texto)
+        return novos
+
+    def fechamento(self) -> str:
+        """O que falta para fechar o texto lido até aqui (aspas e chaves abertas)"""
+        return ('"' if self._em_string else "") + "".join(_FECHAMENTO[c] for c in reversed(self._pilha))
+
+
+def _parsear(texto: str) -> Optional[Any]:
+    try:
+        return json.loads(texto)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(texto)  # aspas simples: {'proximo_agente': 'escritor'}
+    except (ValueError, SyntaxError):
+        return None
+
+
+def reparar_json(texto: str) -> Optional[dict]:
+    """
+    Conserto local de JSON malformado (sem chamar modelo).
+
+    Tenta, em ordem: o objeto como está (sem cerca de código e sem texto
+    em volta), fechando string/chaves abertas e tirando vírgula sobrando,
+    e pondo aspas em chaves e valores sem aspas. Se nada parsear, devolve
+    os campos que já fecharam (ou None).
+    """
+    inicio = texto.find("{")
+    if inicio < 0:
+        return None
+    leitor = LeitorJSONIncremental()
+    leitor.alimentar(texto[inicio:])
+    if leitor.completo:
+        candidato = leitor.texto[:leitor.fim + 1]
+    else:
+        candidato = leitor.texto[:-1] if leitor._escape else leitor.texto
+        candidato += leitor.fechamento()
+    candidato = re.sub(r",\s*([}\]])", r"\1", candidato)
+
+    dados = _parsear(candidato)
+    if not isinstance(dados, dict):
+        aspas = re.sub(r"([{,]\s*)([A-Za-z_]\w*)\s*:", r'\1"\2":', candidato)
+        aspas = re.sub(r':\s*(?!true\b|false\b|null\b)([A-Za-z_]\w*)\s*([,}])', r': "\1"\2', aspas)
+        dados = _parsear(aspas)
+    if isinstance(dados, dict):
+        return dados
+    return leitor.campos or None
+
+
+def _fechar(iterador: Any) -> None:
+    fechar = getattr(iterador, "close", None)
+    if fechar is not None:
+        fechar()
+
+
+async def _afechar(iterador: Any) -> None:
+    fechar = getattr(iterador, "aclose", None)
+    if fechar is not None:
+        await fechar()
+
+
+def _texto(pedaco: Any) -> str:
+    conteudo = getattr(pedaco, "content", pedaco)
+    return conteudo if isinstance(conteudo, str) else ""
+
+
+class DecisoesStreaming:
+    """
+    Lê uma decisão em JSON de um stream e devolve assim que `campo` fecha.
+
+    Args:
+        campo: Campo que decide (ex: "proximo_agente")
+        drenar: Consumir o resto do stream em segundo plano (registra o
+            uso real); False fecha o stream na hora
+    """
+
+    def __init__(self, campo: str, drenar: bool = True):
+        self.campo = campo
+        self.drenar = drenar
+        self._lock = threading.Lock()
+        self._drenagens: set = set()  # tarefas asyncio em andamento (referência forte)
+        self._totais = {"leituras": 0, "antecipadas": 0, "reparadas": 0, "invalidas": 0,
+                        "drenadas": 0, "ms_ate_campo": 0.0, "ms_completas": 0.0}
+
+    def _iniciar(self) -> tuple[LeitorJSONIncremental, float]:
+        return LeitorJSONIncremental(), time.perf_counter()
+
+    def _concluir(self, leitor: LeitorJSONIncremental, acumulado: Any, inicio: float, antecipada: bool) -> AIMessage:
+        ms = (time.perf_counter() - inicio) * 1000
+        # Sem parada antecipada o campo nunca fechou: só o reparo local pode achá-lo
+        dados = dict(leitor.campos) if antecipada else reparar_json(leitor.texto)
+        reparada = not antecipada and isinstance(dados, dict) and self.campo in dados
+        if not antecipada and not reparada:
+            dados = None
+        with self._lock:
+            self._totais["leituras"] += 1
+            self._totais["antecipadas"] += antecipada
+            self._totais["reparadas"] += reparada
+            self._totais["invalidas"] += dados is None
+            self._totais["ms_ate_campo" if antecipada else "ms_completas"] += ms
+        metadados = getattr(acumulado, "response_metadata", None) or {}
+        conteudo = json.dumps(dados, ensure_ascii=False) if dados is not None else leitor.texto
+        return AIMessage(content=conteudo, response_metadata=metadados)
+
+    def _drenou(self) -> None:
+        with self._lock:
+            self._totais["drenadas"] += 1
+
+    def _drenar(self, iterador) -> None:
+        try:
+            for _ in iterador:
+                pass
+            self._drenou()
+        except Exception:
+            pass  # a decisão já foi entregue; só o registro de uso se perde
+        finally:
+            _fechar(iterador)
+
+    async def _adrenar(self, iterador) -> None:
+        try:
+            async for _ in iterador:
+                pass
+            self._drenou()
+        except Exception:
+            pass
+        finally:
+            await _afechar(iterador)
+
+    def ler(self, pedacos: Iterable) -> AIMessage:
+        """Consome pedaços até `campo` fechar (ou o stream acabar); o resto é drenado ou fechado"""
+        leitor, inicio = self._iniciar()
+        acumulado, antecipada = None, False
+        iterador = iter(pedacos)
+        try:
+            for pedaco in iterador:
+                acumulado = pedaco if acumulado is None or isinstance(pedaco, str) else acumulado + pedaco
+                if self.campo in leitor.alimentar(_texto(pedaco)):
+                    antecipada = True
+                    break
+        except BaseException:
+            _fechar(iterador)
+            raise
+        if antecipada and self.drenar:
+            _DRENAGEM.submit(self._drenar, iterador)
+        else:
+            _fechar(iterador)  # fim do stream, ou para de gerar (e libera a vaga do limitador)
+        return self._concluir(leitor, acumulado, inicio, antecipada)
+
+    async def aler(self, pedacos: AsyncIterable) -> AIMessage:
+        """Versão assíncrona de ler()"""
+        leitor, inicio = self._iniciar()
+        acumulado, antecipada = None, False
+        iterador = pedacos.__aiter__()
+        try:
+            async for pedaco in iterador:
+                acumulado = pedaco if acumulado is None or isinstance(pedaco, str) else acumulado + pedaco
+                if self.campo in leitor.alimentar(_texto(pedaco)):
+                    antecipada = True
+                    break
+        except BaseException:
+            await _afechar(iterador)
+            raise
+        if antecipada and self.drenar:
+            tarefa = asyncio.ensure_future(self._adrenar(iterador))
+            self._drenagens.add(tarefa)
+            tarefa.add_done_callback(self._drenagens.discard)
+        else:
+            await _afechar(iterador)
+        return self._concluir(leitor, acumulado, inicio, antecipada)
+
+    def metricas(self) -> dict:
+        with self._lock:
+            t = dict(self._totais)
+        completas = t["leituras"] - t["antecipadas"]
+        return {
+            "leituras": t["leituras"],
+            "antecipadas": t["antecipadas"],
+            "reparadas": t["reparadas"],
+            "invalidas": t["invalidas"],
+            "drenadas": t["drenadas"],
+            "latencia_media_ms_ate_campo": round(t["ms_ate_campo"] / t["antecipadas"], 1) if t["antecipadas"] else None,
+            "latencia_media_ms_completas": round(t["ms_completas"] / completas, 1) if completas else None,
+        }
+
+
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessageChunk
+
+    def stream_simulado(texto: str, atraso_s: float = 0.01):
+        """Um token a cada ~10 ms, como um provedor gerando o JSON"""
+        for token in re.findall(r"\s+|\w+|[^\w\s]", texto):
+            time.sleep(atraso_s)
+            yield AIMessageChunk(content=token)
+
+    decisoes = DecisoesStreaming("proximo_agente")
+    resposta = ('```json\n{"proximo_agente": "programador", "raciocinio": "A tarefa pede uma função Python '
+                'que calcula fibonacci; o programador escreve e testa o código antes do escritor documentar."}\n```')
+
+    inicio = time.perf_counter()
+    completa = "".join(p.content for p in stream_simulado(resposta))
+    ms_completa = (time.perf_counter() - inicio) * 1000
+    print(f"Esperando a resposta inteira:  {ms_completa:.0f} ms")
+
+    inicio = time.perf_counter()
+    decisao = decisoes.ler(stream_simulado(resposta))
+    print(f"Streaming até proximo_agente:  {(time.perf_counter() - inicio) * 1000:.0f} ms -> {decisao.content}")
+
+    print("\nReparo local de saídas malformadas:")
+    for malformado in [
+        '{"proximo_agente": "escritor", "raciocinio": "O texto precisa',   # cortado no meio
+        "{'proximo_agente': 'pesquisador',}",                               # aspas simples e vírgula
+        "Decisão: {proximo_agente: FINISH, raciocinio: pronto}",            # sem aspas
+        "Acho que o escritor deveria continuar",                            # nem JSON
+    ]:
+        print(f"   {malformado!r:70} -> {reparar_json(malformado)}")
+
+    decisoes.ler(stream_simulado('{"raciocinio": "sem o campo", "proximo_agente": '))
+    _DRENAGEM.shutdown(wait=True)  # espera a drenagem do 1º stream (o raciocínio que ninguém esperou)
+    print(decisoes.metricas())
@@ -0,0 +1,314 @@
+"""
+Limitador de chamadas ao modelo: token buckets + concorrência adaptativa + fila justa.
+
+Cada agente chamava o provedor por conta própria. Numa rajada de
+usuários, todos disparam ao mesmo tempo, o provedor responde 429, o
+cliente tenta de novo... e as novas tentativas pioram a rajada.
+
+O LimitadorModelo é compartilhado por todas as chamadas a um modelo:
+- BaldeTokens de requisições/min (rpm) e de tokens/min (tpm): uma
+  chamada só sai quando os dois baldes têm saldo para ela
+- ConcorrenciaAIMD: limite de chamadas em voo que sobe devagar (+1 por
+  janela de sucessos) e cai pela metade num 429 ou quando a latência
+  passa do alvo (Additive Increase / Multiplicative Decrease)
+- Fila justa: quem espera é organizado por chave (thread_id da
+  conversa) e as chaves são atendidas em rodízio; uma conversa que
+  dispara 50 chamadas não passa na frente das outras
+- Métricas de espera na fila (p50/p95/máx), em voo, limite atual, 429s
+
+Uso:
+    limitador = LimitadorModelo(rpm=500, tpm=200_000)
+    with limitador.reservar(chave=thread_id, tokens=1200) as permissao:
+        resposta = llm.invoke(mensagens)
+        permissao.tokens_reais = resposta.usage_metadata["total_tokens"]
+    limitador.metricas()
+
+O desempenho.modelos.criar_modelo() já faz isso em cada invoke.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+
+class BaldeTokens:
+    """
+    Token bucket: enche a `por_minuto`/60 por segundo até `capacidade`.
+
+    Consumos maiores que o saldo deixam o balde negativo (dívida), para
+    que uma chamada maior que a capacidade ainda possa sair sozinha.
+    Não é thread-safe: o LimitadorModelo o usa sob o próprio lock.
+    """
+
+    def __init__(self, por_minuto: float, capacidade: Optional[float] = None):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = capacidade if capacidade is not None else por_minuto
+        self.nivel = self.capacidade
+        self._ultimo = time.monotonic()
+
+    def _repor(self, agora: float) -> None:
+        self.nivel = min(self.capacidade, self.nivel + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def espera(self, quantidade: float, agora: float) -> float:
+        """Segundos até haver saldo para `quantidade` (0 = pode consumir já)"""
+        self._repor(agora)
+        necessario = min(quantidade, self.capacidade)
+        if self.nivel >= necessario:
+            return 0.0
+        return (necessario - self.nivel) / self.taxa
+
+    def consumir(self, quantidade: float) -> None:
+        self.nivel -= quantidade
+
+    def ajustar(self, diferenca: float) -> None:
+        """Corrige uma reserva: positivo consome mais, negativo devolve"""
+        self.nivel = min(self.capacidade, self.nivel - diferenca)
+
+
+class ConcorrenciaAIMD:
+    """
+    Limite de chamadas simultâneas com Additive Increase / Multiplicative Decrease.
+
+    Args:
+        inicial: Limite inicial
+        minimo / maximo: Faixa do limite
+        latencia_alvo_ms: Acima disso a chamada conta como sinal de
+            sobrecarga (None = só 429 reduz)
+        fator_reducao: Multiplicador aplicado num sinal de sobrecarga
+        intervalo_reducao_s: Reduz no máximo uma vez por intervalo (uma
+            rajada de 429 das chamadas que já estavam em voo não zera o limite)
+    """
+
+    def __init__(
+        self,
+        inicial: int = 4,
+        minimo: int = 1,
+        maximo: int = 32,
+        latencia_alvo_ms: Optional[float] = None,
+        fator_reducao: float = 0.5,
+        intervalo_reducao_s: float = 1.0,
+    ):
+        self.limite = float(inicial)
+        self.minimo = minimo
+        self.maximo = maximo
+        self.latencia_alvo_ms = latencia_alvo_ms
+        self.fator_reducao = fator_reducao
+        self.intervalo_reducao_s = intervalo_reducao_s
+        self._ultima_reducao = -math.inf
+
+    @property
+    def vagas(self) -> int:
+        return max(self.minimo, int(self.limite))
+
+    def sucesso(self, latencia_ms: float) -> None:
+        if self.latencia_alvo_ms is not None and latencia_ms > self.latencia_alvo_ms:
+            self.sobrecarga()
+        else:
+            # +1 a cada `limite` sucessos: cresce ~1 por janela cheia
+            self.limite = min(self.maximo, self.limite + 1.0 / self.limite)
+
+    def sobrecarga(self) -> None:
+        agora = time.monotonic()
+        if agora - self._ultima_reducao < self.intervalo_reducao_s:
+            return
+        self._ultima_reducao = agora
+        self.limite = max(self.minimo, self.limite * self.fator_reducao)
+
+
+@dataclass
+class Permissao:
+    """Uma chamada autorizada; devolvida ao limitador em liberar()"""
+    chave: str
+    tokens: int
+    espera_ms: float
+    inicio: float = 0.0
+    tokens_reais: Optional[int] = None
+    limitada: bool = False  # o provedor respondeu 429
+    enfileirada: bool = False  # esperou na fila (vez de outra chave, vaga ou saldo)
+
+
+def _percentil(ordenadas: list[float], fracao: float) -> float:
+    return ordenadas[int(fracao * (len(ordenadas) - 1))] if ordenadas else 0.0
+
+
+class LimitadorModelo:
+    """
+    Porta de entrada compartilhada para as chamadas a um modelo.
+
+    Args:
+        rpm: Requisições por minuto (None = sem limite)
+        tpm: Tokens (entrada + saída) por minuto (None = sem limite)
+        concorrencia: Controle AIMD de chamadas simultâneas (None = padrão)
+        amostras: Quantas esperas guardar para os percentis
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        concorrencia: Optional[ConcorrenciaAIMD] = None,
+        amostras: int = 1000,
+    ):
+        self.requisicoes = BaldeTokens(rpm) if rpm else None
+        self.tokens = BaldeTokens(tpm) if tpm else None
+        self.concorrencia = concorrencia or ConcorrenciaAIMD()
+        self._cond = threading.Condition()
+        # chave -> fila de tickets; _vez = rodízio das chaves com gente esperando
+        self._filas: dict[str, deque] = {}
+        self._vez: deque = deque()
+        self._em_voo = 0
+        self._esperas: deque = deque(maxlen=amostras)
+        self._totais = {"chamadas": 0, "limitadas_429": 0, "tokens_reservados": 0, "tokens_reais": 0}
+
+    def _espera_recursos(self, tokens: int) -> float:
+        """0 = pode sair; inf = sem vaga de concorrência; t = esperar t s pelos baldes"""
+        if self._em_voo >= self.concorrencia.vagas:
+            return math.inf
+        agora = time.monotonic()
+        espera = 0.0
+        if self.requisicoes is not None:
+            espera = max(espera, self.requisicoes.espera(1, agora))
+        if self.tokens is not None:
+            espera = max(espera, self.tokens.espera(tokens, agora))
+        return espera
+
+    def _sair_da_fila(self, chave: str, ticket: object) -> None:
+        fila = self._filas[chave]
+        fila.remove(ticket)
+        if self._vez and self._vez[0] == chave:
+            self._vez.popleft()
+            if fila:
+                self._vez.append(chave)  # fim do rodízio
+        if not fila:
+            del self._filas[chave]
+            if chave in self._vez:
+                self._vez.remove(chave)
+
+    def adquirir(self, chave: str = "padrao", tokens: int = 0) -> Permissao:
+        """Bloqueia até a vez da chave chegar e haver vaga e saldo nos baldes"""
+        inicio = time.perf_counter()
+        ticket = object()
+        enfileirada = False
+        with self._cond:
+            fila = self._filas.get(chave)
+            if fila is None:
+                fila = self._filas[chave] = deque()
+                self._vez.append(chave)
+            fila.append(ticket)
+            try:
+                while True:
+                    if self._vez[0] == chave and fila[0] is ticket:
+                        espera = self._espera_recursos(tokens)
+                        if espera == 0.0:
+                            break
+                        self._cond.wait(None if espera == math.inf else espera)
+                    else:
+                        self._cond.wait()
+                    enfileirada = True
+            except BaseException:
+                self._sair_da_fila(chave, ticket)
+                self._cond.notify_all()
+                raise
+
+            self._sair_da_fila(chave, ticket)
+            if self.requisicoes is not None:
+                self.requisicoes.consumir(1)
+            if self.tokens is not None:
+                self.tokens.consumir(tokens)
+            self._em_voo += 1
+            espera_ms = (time.perf_counter() - inicio) * 1000
+            self._esperas.append(espera_ms)
+            self._totais["chamadas"] += 1
+            self._totais["tokens_reservados"] += tokens
+            self._cond.notify_all()
+        return Permissao(chave, tokens, espera_ms, inicio=time.perf_counter(), enfileirada=enfileirada)
+
+    def livre(self, tokens: int = 0) -> bool:
+        """Uma chamada com `tokens` sairia agora? (ninguém na fila, vaga e saldo)"""
+        with self._cond:
+            return not self._filas and self._espera_recursos(tokens) == 0.0
+
+    def liberar(self, permissao: Permissao) -> None:
+        """Devolve a vaga, corrige o balde de tokens e alimenta o AIMD"""
+        latencia_ms = (time.perf_counter() - permissao.inicio) * 1000
+        with self._cond:
+            self._em_voo -= 1
+            if permissao.limitada:
+                self._totais["limitadas_429"] += 1
+                self.concorrencia.sobrecarga()
+            else:
+                self.concorrencia.sucesso(latencia_ms)
+            if permissao.tokens_reais is not None:
+                self._totais["tokens_reais"] += permissao.tokens_reais
+                if self.tokens is not None:
+                    self.tokens.ajustar(permissao.tokens_reais - permissao.tokens)
+            self._cond.notify_all()
+
+    @contextmanager
+    def reservar(self, chave: str = "padrao", tokens: int = 0) -> Iterator[Permissao]:
+        permissao = self.adquirir(chave, tokens)
+        try:
+            yield permissao
+        finally:
+            self.liberar(permissao)
+
+    def metricas(self) -> dict:
+        with self._cond:
+            esperas = sorted(self._esperas)
+            return {
+                **self._totais,
+                "em_voo": self._em_voo,
+                "na_fila": sum(len(fila) for fila in self._filas.values()),
+                "limite_concorrencia": round(self.concorrencia.limite, 2),
+                "espera_fila_ms": {
+                    "p50": round(_percentil(esperas, 0.5), 2),
+                    "p95": round(_percentil(esperas, 0.95), 2),
+                    "max": round(esperas[-1], 2) if esperas else 0.0,
+                },
+            }
+
+
+if __name__ == "__main__":
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Provedor simulado: 200-400 ms por chamada; acima de 6 simultâneas responde 429
+    em_voo = 0
+    trava = threading.Lock()
+
+    def provedor() -> bool:
+        global em_voo
+        with trava:
+            em_voo += 1
+            sobrecarregado = em_voo > 6
+        time.sleep(random.uniform(0.2, 0.4))
+        with trava:
+            em_voo -= 1
+        return not sobrecarregado
+
+    limitador = LimitadorModelo(rpm=600, tpm=200_000, concorrencia=ConcorrenciaAIMD(inicial=4, maximo=32))
+
+    def chamada(chave: str, atraso: float) -> float:
+        time.sleep(atraso)
+        with limitador.reservar(chave, tokens=800) as permissao:
+            permissao.limitada = not provedor()
+            permissao.tokens_reais = 750
+        return permissao.espera_ms
+
+    # Uma conversa dispara 30 chamadas de uma vez; 100 ms depois, outras 10 fazem 3 cada
+    pedidos = [("conversa-pesada", 0.0)] * 30 + [(f"conversa-{i}", 0.1) for i in range(10) for _ in range(3)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(pedidos)) as executor:
+        esperas = list(executor.map(lambda pedido: chamada(*pedido), pedidos))
+    print(f"{len(pedidos)} chamadas em {time.perf_counter() - inicio:.1f}s")
+
+    pesada = sorted(e for (chave, _), e in zip(pedidos, esperas) if chave == "conversa-pesada")
+    leves = sorted(e for (chave, _), e in zip(pedidos, esperas) if chave != "conversa-pesada")
+    print(f"   espera p50 conversa pesada: {pesada[len(pesada) // 2]:.0f} ms | "
+          f"demais conversas (chegaram depois): {leves[len(leves) // 2]:.0f} ms (rodízio justo)")
+    print(f"   {limitador.metricas()}")
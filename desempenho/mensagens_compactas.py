@@ -0,0 +1,190 @@
+"""
+Representação compacta (em colunas) de mensagens guardadas no histórico.
+
+Cada BaseMessage é um objeto pydantic com vários dicts (additional_kwargs,
+response_metadata, usage_metadata...) e strings soltas: uma mensagem curta
+ocupa ~1 KB de RAM. Com milhões de turnos em checkpoints, isso domina
+a memória do processo.
+
+O BlocoCompacto guarda um bloco de mensagens em poucas colunas:
+- papeis: 1 byte por mensagem (human, ai, system, tool)
+- textos: conteúdo, id e tool_call_id de todas as mensagens, em UTF-8,
+  concatenados num único bytes
+- fins: offsets de fim de cada texto (array de uint32)
+- extras: só para as mensagens que precisam (tool_calls, name, conteúdo
+  multimodal, tipos desconhecidos), como pares (índice, campos em JSON)
+
+As mensagens só voltam a ser BaseMessage (reidratadas) quando alguém
+as lê, tipicamente para enviar ao modelo.
+
+response_metadata e usage_metadata NÃO são guardados (CAMPOS_DESCARTADOS):
+servem para observar a chamada que os gerou, não para o modelo.
+
+Uso:
+    bloco = BlocoCompacto.de(mensagens)
+    bloco[0]          # HumanMessage reidratada
+    list(bloco)       # todas reidratadas
+    len(bloco)
+"""
+
+import json
+from array import array
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Union
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+
+# Campos que não vão para o histórico compacto
+CAMPOS_DESCARTADOS = frozenset({"response_metadata", "usage_metadata"})
+
+# Campos guardados nas colunas de texto (o resto vai para extras, se diferente do padrão)
+_CAMPOS_COLUNA = frozenset({"type", "content", "id", "tool_call_id"})
+
+# Papel -> classe; OUTRO = mensagem inteira guardada em extras
+_CLASSES = (HumanMessage, AIMessage, SystemMessage, ToolMessage)
+_PAPEIS = {classe: papel for papel, classe in enumerate(_CLASSES)}
+_OUTRO = 255
+
+# Textos por mensagem nas colunas: conteúdo, id, tool_call_id
+_TEXTOS_POR_MENSAGEM = 3
+
+_PADROES: dict = {}
+
+
+def _padroes(classe: type) -> dict:
+    """Valores padrão dos campos opcionais de uma classe de mensagem"""
+    padroes = _PADROES.get(classe)
+    if padroes is None:
+        padroes = {}
+        for nome, campo in classe.model_fields.items():
+            if nome in _CAMPOS_COLUNA or nome in CAMPOS_DESCARTADOS:
+                continue
+            padroes[nome] = campo.default_factory() if campo.default_factory else campo.default
+        _PADROES[classe] = padroes
+    return padroes
+
+
+def _extras(mensagem: BaseMessage) -> Union[bytes, dict, None]:
+    """
+    Campos que fogem do padrão (ex: tool_calls, name) e o conteúdo não
+    textual, em JSON compacto (ou o dict, se não for serializável em JSON)
+    """
+    extras = {
+        nome: valor
+        for nome, padrao in _padroes(type(mensagem)).items()
+        if (valor := getattr(mensagem, nome)) != padrao
+    }
+    if not isinstance(mensagem.content, str):
+        extras["content"] = mensagem.content
+    if not extras:
+        return None
+    try:
+        return json.dumps(extras, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    except TypeError:
+        return extras
+
+
+@dataclass(frozen=True, eq=False)
+class BlocoCompacto:
+    """Bloco imutável de mensagens em colunas"""
+    papeis: bytes = b""
+    textos: bytes = b""
+    fins: bytes = b""
+    extras: tuple = ()  # ((índice, JSON dos campos), ...)
+
+    def __post_init__(self):
+        if not isinstance(self.extras, tuple):
+            object.__setattr__(self, "extras", tuple(tuple(par) for par in self.extras))
+        fins = array("I")
+        fins.frombytes(self.fins)
+        object.__setattr__(self, "_fins", fins)
+        object.__setattr__(self, "_extras", dict(self.extras))
+        # Chave deste bloco em cada armazém de conteúdo: id(armazem) -> hash.
+        # Não é campo do dataclass, então não vai para a serialização.
+        object.__setattr__(self, "chaves", {})
+
+    @classmethod
+    def de(cls, mensagens: Iterable[BaseMessage]) -> "BlocoCompacto":
+        papeis = bytearray()
+        textos = bytearray()
+        fins = array("I")
+        extras = []
+        for indice, mensagem in enumerate(mensagens):
+            papel = _PAPEIS.get(type(mensagem), _OUTRO)
+            papeis.append(papel)
+            if papel == _OUTRO:
+                campos = {"mensagem": mensagem}
+                valores = ("", "", "")
+            else:
+                campos = _extras(mensagem)
+                conteudo = mensagem.content if isinstance(mensagem.content, str) else ""
+                valores = (conteudo, mensagem.id or "", getattr(mensagem, "tool_call_id", ""))
+            for valor in valores:
+                textos += valor.encode("utf-8")
+                fins.append(len(textos))
+            if campos is not None:
+                extras.append((indice, campos))
+        return cls(bytes(papeis), bytes(textos), fins.tobytes(), tuple(extras))
+
+    def _texto(self, posicao: int) -> str:
+        inicio = self._fins[posicao - 1] if posicao else 0
+        return self.textos[inicio:self._fins[posicao]].decode("utf-8")
+
+    def reidratar(self, indice: int) -> BaseMessage:
+        """Reconstrói a BaseMessage na posição indice"""
+        papel = self.papeis[indice]
+        campos = self._extras.get(indice, {})
+        if papel == _OUTRO:
+            return campos["mensagem"]
+        if isinstance(campos, bytes):
+            campos = json.loads(campos)
+
+        base = indice * _TEXTOS_POR_MENSAGEM
+        argumentos = {"content": self._texto(base), **campos}
+        identificador = self._texto(base + 1)
+        if identificador:
+            argumentos["id"] = identificador
+        classe = _CLASSES[papel]
+        if classe is ToolMessage:
+            argumentos["tool_call_id"] = self._texto(base + 2)
+        return classe(**argumentos)
+
+    def __len__(self) -> int:
+        return len(self.papeis)
+
+    def __getitem__(self, indice: Union[int, slice]):
+        if isinstance(indice, slice):
+            return [self.reidratar(i) for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError("índice fora do bloco")
+        return self.reidratar(indice)
+
+    def __iter__(self) -> Iterator[BaseMessage]:
+        return (self.reidratar(i) for i in range(len(self)))
+
+    def __reversed__(self) -> Iterator[BaseMessage]:
+        return (self.reidratar(i) for i in reversed(range(len(self))))
+
+    def __repr__(self) -> str:
+        return f"BlocoCompacto({len(self)} mensagens, {len(self.textos)} bytes de texto)"
+
+
+if __name__ == "__main__":
+    chamada = {"id": "call_1", "name": "buscar_documentos", "args": {"query": "reembolso"}}
+    mensagens = [
+        HumanMessage(content="Como funciona o reembolso?", id="h-1"),
+        AIMessage(content="", tool_calls=[chamada], id="run-1",
+                  response_metadata={"model_name": "gpt-4o-mini", "finish_reason": "tool_calls"}),
+        ToolMessage(content="Reembolso proporcional até 7 dias.", tool_call_id="call_1", name="buscar_documentos"),
+        AIMessage(content="Você tem reembolso proporcional em até 7 dias.", id="run-2"),
+    ]
+
+    bloco = BlocoCompacto.de(mensagens)
+    print(bloco)
+    print(f"   papeis={bloco.papeis!r}  fins={len(bloco.fins)} bytes  extras={len(bloco.extras)}")
+    for mensagem in bloco:
+        print(f"   {mensagem!r}")
+    print("Para medir bytes por mensagem: python -m benchmarks.bench_mensagens_compactas")
@@ -0,0 +1,367 @@
+"""
+Criação dos modelos de chat com o limitador global de chamadas.
+
+Cada script criava o próprio ChatOpenAI e chamava o provedor sem
+coordenação: com vários usuários (ou vários agentes em paralelo), as
+chamadas saem todas juntas, batem no limite de rpm/tpm da conta e
+voltam 429. criar_modelo() devolve o mesmo ChatOpenAI envolvido num
+ModeloLimitado, e todas as instâncias do MESMO modelo dividem um único
+LimitadorModelo (desempenho.limitador) no processo:
+- reserva 1 requisição + tokens estimados (entrada + reserva de saída)
+  antes de chamar, e corrige com o usage_metadata da resposta
+- a chave da fila justa é o thread_id da conversa (lido do config do
+  LangGraph dentro do nó), então conversas diferentes se alternam
+- 429 reduz a concorrência; latência acima do alvo também, se configurado
+- chamadas idênticas em voo (mesmo modelo, parâmetros e mensagens) viram
+  uma só requisição (desempenho.coalescencia), ANTES do limitador: quem
+  pega carona não ocupa vaga nem tokens
+- opcional: hedge (desempenho.hedging) para chamadas com temperatura 0,
+  DEPOIS do limitador: mede e duplica só a chamada ao provedor (espera
+  na fila não é latência do provedor); a cópia ocupa a sua própria vaga
+  e só sai se a chamada não esperou na fila e há vaga livre na hora
+
+Limites por variáveis de ambiente (lidas ao criar o limitador):
+    LLM_RPM, LLM_TPM               requisições e tokens por minuto (vazio = sem limite)
+    LLM_CONCORRENCIA               chamadas simultâneas iniciais (padrão 4)
+    LLM_CONCORRENCIA_MAX           teto do AIMD (padrão 32)
+    LLM_LATENCIA_ALVO_MS           acima disso a concorrência cai (vazio = só 429)
+    LLM_MODELO_FORTE               modelo das escaladas de cascata (padrão gpt-4o)
+    LLM_HEDGE                      1 = hedge_do_ambiente() cria políticas de hedge
+    LLM_HEDGE_PERCENTIL            percentil que dispara o hedge (padrão 0.95)
+    LLM_HEDGE_TAXA_MAXIMA          fração máxima de chamadas com hedge (padrão 0.05)
+
+Uso:
+    from desempenho.modelos import criar_modelo, metricas_modelos
+
+    llm = criar_modelo("gpt-4o-mini", temperature=0)
+    llm.bind_tools(ferramentas).invoke(mensagens)   # passa pelo limitador
+    metricas_modelos()   # espera na fila (p50/p95), em voo, limite, 429s e coalescência por modelo
+"""
+
+import asyncio
+import copy
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import ensure_config
+from langchain_openai import ChatOpenAI
+
+from desempenho.coalescencia import VooUnico, chave_requisicao, identidade_modelo
+from desempenho.hedging import PoliticaHedge
+from desempenho.limitador import ConcorrenciaAIMD, LimitadorModelo, Permissao
+from desempenho.tokens import contar_tokens, contar_tokens_mensagens
+
+# Tokens de saída reservados quando o modelo não define max_tokens
+RESERVA_SAIDA = 256
+
+# Modelo para onde as cascatas (desempenho.cascata) escalam
+MODELO_FORTE = os.getenv("LLM_MODELO_FORTE", "gpt-4o")
+
+_LIMITADORES: dict[str, LimitadorModelo] = {}
+_VOOS: dict[str, VooUnico] = {}
+_lock = threading.Lock()
+
+
+def _numero(variavel: str) -> Optional[float]:
+    valor = os.getenv(variavel)
+    return float(valor) if valor else None
+
+
+def limitador_do_modelo(modelo: str) -> LimitadorModelo:
+    """O limitador compartilhado de um modelo (criado na 1ª vez, com os limites do ambiente)"""
+    with _lock:
+        limitador = _LIMITADORES.get(modelo)
+        if limitador is None:
+            latencia_alvo = _numero("LLM_LATENCIA_ALVO_MS")
+            concorrencia = ConcorrenciaAIMD(
+                inicial=int(_numero("LLM_CONCORRENCIA") or 4),
+                maximo=int(_numero("LLM_CONCORRENCIA_MAX") or 32),
+                latencia_alvo_ms=latencia_alvo,
+            )
+            limitador = LimitadorModelo(rpm=_numero("LLM_RPM"), tpm=_numero("LLM_TPM"), concorrencia=concorrencia)
+            _LIMITADORES[modelo] = limitador
+        return limitador
+
+
+def _copiar_resposta(resposta: Any) -> Any:
+    """Cópia rasa para quem pegou carona (o reducer pode atribuir id à mensagem)"""
+    copiar = getattr(resposta, "model_copy", None)
+    return copiar() if copiar is not None else copy.copy(resposta)
+
+
+def voos_do_modelo(modelo: str) -> VooUnico:
+    """O mapa de chamadas em voo de um modelo (coalescência)"""
+    with _lock:
+        voos = _VOOS.get(modelo)
+        if voos is None:
+            voos = _VOOS[modelo] = VooUnico(copiar=_copiar_resposta)
+        return voos
+
+
+def metricas_modelos() -> dict:
+    """Métricas do limitador (e da coalescência) de cada modelo usado no processo"""
+    with _lock:
+        limitadores, voos = dict(_LIMITADORES), dict(_VOOS)
+    metricas = {modelo: limitador.metricas() for modelo, limitador in limitadores.items()}
+    for modelo, voo in voos.items():
+        metricas.setdefault(modelo, {})["coalescencia"] = voo.metricas()
+    return metricas
+
+
+def hedge_do_ambiente() -> Optional[PoliticaHedge]:
+    """Uma PoliticaHedge nova se LLM_HEDGE=1 (hedge é opt-in), senão None"""
+    if os.getenv("LLM_HEDGE", "0") != "1":
+        return None
+    return PoliticaHedge(
+        percentil=_numero("LLM_HEDGE_PERCENTIL") or 0.95,
+        taxa_maxima=_numero("LLM_HEDGE_TAXA_MAXIMA") or 0.05,
+    )
+
+
+def _tokens_entrada(entrada: Any) -> int:
+    if isinstance(entrada, str):
+        return contar_tokens(entrada)
+    if hasattr(entrada, "to_messages"):  # PromptValue
+        entrada = entrada.to_messages()
+    return contar_tokens_mensagens(m for m in entrada if isinstance(m, BaseMessage))
+
+
+def _limitada(erro: BaseException) -> bool:
+    """O provedor recusou por limite de taxa? (openai.RateLimitError ou HTTP 429)"""
+    return type(erro).__name__ == "RateLimitError" or getattr(erro, "status_code", None) == 429
+
+
+def _tokens_reais(resposta: Any) -> Optional[int]:
+    uso = getattr(resposta, "usage_metadata", None)
+    return uso.get("total_tokens") if uso else None
+
+
+class ModeloLimitado:
+    """
+    Modelo de chat cujas chamadas passam por um LimitadorModelo.
+
+    Args:
+        modelo: ChatOpenAI (ou o resultado de bind_tools/with_structured_output)
+        limitador: Limitador compartilhado do modelo
+        reserva_saida: Tokens de saída somados à estimativa de entrada
+        voos: Coalescência de chamadas idênticas em voo (None = desligada)
+        hedge: Política de hedge (None = desligado); só para chamadas idempotentes
+    """
+
+    def __init__(
+        self,
+        modelo,
+        limitador: LimitadorModelo,
+        reserva_saida: int = RESERVA_SAIDA,
+        voos: Optional[VooUnico] = None,
+        hedge: Optional[PoliticaHedge] = None,
+    ):
+        self.modelo = modelo
+        self.limitador = limitador
+        self.reserva_saida = reserva_saida
+        self.voos = voos
+        self.hedge = hedge
+        self._identidade = identidade_modelo(modelo) if voos is not None else ""
+
+    def _derivado(self, modelo) -> "ModeloLimitado":
+        return ModeloLimitado(modelo, self.limitador, self.reserva_saida, self.voos, self.hedge)
+
+    def _pedido(self, entrada: Any, config: Optional[dict]) -> tuple[str, int]:
+        """Chave da fila justa (thread_id da conversa) e tokens a reservar"""
+        chave = ensure_config(config).get("configurable", {}).get("thread_id", "padrao")
+        return str(chave), _tokens_entrada(entrada) + self.reserva_saida
+
+    def _concluir(self, permissao: Permissao, resposta: Any = None, erro: Optional[BaseException] = None) -> None:
+        permissao.limitada = erro is not None and _limitada(erro)
+        permissao.tokens_reais = _tokens_reais(resposta)
+        self.limitador.liberar(permissao)
+
+    def _pode_duplicar(self, permissao: Permissao) -> bool:
+        """Hedge só sem fila: nem a chamada esperou, nem a cópia esperaria"""
+        return not permissao.enfileirada and self.limitador.livre(permissao.tokens)
+
+    def invoke(self, entrada: Any, config: Optional[dict] = None, **kwargs):
+        def chamada():
+            if self.hedge is None:
+                return self._invocar(entrada, config, **kwargs)
+            permissao = self.limitador.adquirir(*self._pedido(entrada, config))
+            return self.hedge.executar(
+                lambda: self._chamar(permissao, entrada, config, **kwargs),
+                copia=lambda: self._invocar(entrada, config, **kwargs),
+                pode_duplicar=lambda: self._pode_duplicar(permissao),
+            )
+
+        if self.voos is None:
+            return chamada()
+        return self.voos.chamar(chave_requisicao(self._identidade, entrada, kwargs), chamada)
+
+    def _invocar(self, entrada: Any, config: Optional[dict] = None, **kwargs):
+        permissao = self.limitador.adquirir(*self._pedido(entrada, config))
+        return self._chamar(permissao, entrada, config, **kwargs)
+
+    def _chamar(self, permissao: Permissao, entrada: Any, config: Optional[dict] = None, **kwargs):
+        """A chamada ao provedor com a vaga já reservada (devolvida no fim)"""
+        try:
+            resposta = self.modelo.invoke(entrada, config, **kwargs)
+        except BaseException as erro:
+            self._concluir(permissao, erro=erro)
+            raise
+        self._concluir(permissao, resposta)
+        return resposta
+
+    async def _adquirir_async(self, entrada: Any, config: Optional[dict]) -> Permissao:
+        """adquirir() numa thread, sem bloquear o event loop"""
+        tarefa = asyncio.ensure_future(asyncio.to_thread(self.limitador.adquirir, *self._pedido(entrada, config)))
+        try:
+            return await asyncio.shield(tarefa)
+        except asyncio.CancelledError:
+            # A thread ainda pode conseguir a vaga depois do cancelamento: devolve assim que sair
+            tarefa.add_done_callback(
+                lambda t: t.cancelled() or t.exception() is not None or self.limitador.liberar(t.result())
+            )
+            raise
+
+    async def ainvoke(self, entrada: Any, config: Optional[dict] = None, **kwargs):
+        async def chamada():
+            if self.hedge is None:
+                return await self._ainvocar(entrada, config, **kwargs)
+            permissao = await self._adquirir_async(entrada, config)
+            return await self.hedge.aexecutar(
+                lambda: self._achamar(permissao, entrada, config, **kwargs),
+                copia=lambda: self._ainvocar(entrada, config, **kwargs),
+                pode_duplicar=lambda: self._pode_duplicar(permissao),
+            )
+
+        if self.voos is None:
+            return await chamada()
+        return await self.voos.achamar(chave_requisicao(self._identidade, entrada, kwargs), chamada)
+
+    async def _ainvocar(self, entrada: Any, config: Optional[dict] = None, **kwargs):
+        permissao = await self._adquirir_async(entrada, config)
+        return await self._achamar(permissao, entrada, config, **kwargs)
+
+    async def _achamar(self, permissao: Permissao, entrada: Any, config: Optional[dict] = None, **kwargs):
+        try:
+            resposta = await self.modelo.ainvoke(entrada, config, **kwargs)
+        except BaseException as erro:
+            self._concluir(permissao, erro=erro)
+            raise
+        self._concluir(permissao, resposta)
+        return resposta
+
+    def stream(self, entrada: Any, config: Optional[dict] = None, **kwargs) -> Iterator:
+        """A vaga fica ocupada até o último pedaço (ou até o consumidor abandonar o stream)"""
+        permissao = self.limitador.adquirir(*self._pedido(entrada, config))
+        acumulado = erro = None
+        pedacos = None
+        try:
+            pedacos = self.modelo.stream(entrada, config, **kwargs)
+            for pedaco in pedacos:
+                acumulado = pedaco if acumulado is None else acumulado + pedaco
+                yield pedaco
+        except BaseException as e:
+            erro = e
+            raise
+        finally:
+            if hasattr(pedacos, "close"):
+                pedacos.close()  # abandonado: fecha a conexão já, não no GC
+            self._concluir(permissao, acumulado, erro if isinstance(erro, Exception) else None)
+
+    async def astream(self, entrada: Any, config: Optional[dict] = None, **kwargs) -> AsyncIterator:
+        permissao = await self._adquirir_async(entrada, config)
+        acumulado = erro = None
+        pedacos = None
+        try:
+            pedacos = self.modelo.astream(entrada, config, **kwargs)
+            async for pedaco in pedacos:
+                acumulado = pedaco if acumulado is None else acumulado + pedaco
+                yield pedaco
+        except BaseException as e:
+            erro = e
+            raise
+        finally:
+            if hasattr(pedacos, "aclose"):
+                await pedacos.aclose()
+            self._concluir(permissao, acumulado, erro if isinstance(erro, Exception) else None)
+
+    def bind_tools(self, ferramentas, **kwargs) -> "ModeloLimitado":
+        """Mesmo limitador (e coalescência) para o modelo com ferramentas"""
+        return self._derivado(self.modelo.bind_tools(ferramentas, **kwargs))
+
+    def with_structured_output(self, schema, **kwargs) -> "ModeloLimitado":
+        return self._derivado(self.modelo.with_structured_output(schema, **kwargs))
+
+    def __getattr__(self, nome: str):
+        if nome == "modelo":  # ainda não inicializado (cópia, pickle)
+            raise AttributeError(nome)
+        return getattr(self.modelo, nome)
+
+    def __repr__(self) -> str:
+        return f"ModeloLimitado({self.modelo!r})"
+
+
+def criar_modelo(
+    model: str = "gpt-4o-mini",
+    temperature: float = 0,
+    coalescer: bool = True,
+    hedge: Optional[PoliticaHedge] = None,
+    **kwargs,
+) -> ModeloLimitado:
+    """
+    ChatOpenAI com o limitador compartilhado do modelo, coalescência (se
+    coalescer) e hedge (se receber uma política; exige temperature=0)
+    """
+    if hedge is not None and temperature != 0:
+        raise ValueError("hedge só para chamadas idempotentes (temperature=0)")
+    llm = ChatOpenAI(model=model, temperature=temperature, **kwargs)
+    reserva = kwargs.get("max_tokens") or RESERVA_SAIDA
+    voos = voos_do_modelo(model) if coalescer else None
+    return ModeloLimitado(llm, limitador_do_modelo(model), reserva_saida=reserva, voos=voos, hedge=hedge)
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    class ChatFake:
+        """Simula o provedor: 100 ms por chamada"""
+        def invoke(self, entrada, config=None, **kwargs):
+            time.sleep(0.1)
+            return AIMessage(content="ok", usage_metadata={"input_tokens": 40, "output_tokens": 10, "total_tokens": 50})
+
+    limitador = LimitadorModelo(rpm=300, concorrencia=ConcorrenciaAIMD(inicial=4))
+    llm = ModeloLimitado(ChatFake(), limitador)
+
+    def conversa(i: int) -> None:
+        config = {"configurable": {"thread_id": f"usuario-{i % 5}"}}
+        llm.invoke([HumanMessage(content=f"pergunta {i}")], config)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        list(executor.map(conversa, range(40)))
+    print(f"40 chamadas de 5 conversas em {time.perf_counter() - inicio:.2f}s (AIMD: começa com 4 em voo e sobe sem 429)")
+    print(limitador.metricas())
+
+    # Mesma pergunta de 20 usuários ao mesmo tempo: uma requisição, 20 respostas
+    llm_coalescido = ModeloLimitado(ChatFake(), LimitadorModelo(), voos=VooUnico(copiar=_copiar_resposta))
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        list(executor.map(lambda _: llm_coalescido.invoke([HumanMessage(content="Quero um reembolso")]), range(20)))
+    print("Coalescência:", llm_coalescido.voos.metricas(), "| chamadas no limitador:",
+          llm_coalescido.limitador.metricas()["chamadas"])
+
+    # Hedge atrás de um limitador saturado: a espera na fila não entra no p95
+    # do hedge e, com fila, nenhuma cópia sai (só aumentaria a fila)
+    politica = PoliticaHedge(minimo_amostras=5, atraso_minimo_ms=1, taxa_maxima=0.5)
+    saturado = LimitadorModelo(concorrencia=ConcorrenciaAIMD(inicial=2, maximo=2))
+    llm_hedge = ModeloLimitado(ChatFake(), saturado, hedge=politica)
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(lambda i: llm_hedge.invoke([HumanMessage(content=f"triagem {i}")]), range(30)))
+    metricas = politica.metricas()
+    print(f"Hedge com fila: espera p50 {saturado.metricas()['espera_fila_ms']['p50']:.0f} ms | "
+          f"requisição p50 {metricas['latencia_requisicao_ms']['p50']:.0f} ms | "
+          f"{metricas['hedges']} hedges, {metricas['hedges_sem_vaga']} vetados pela fila")
+    assert metricas["latencia_requisicao_ms"]["p95"] < 150 and metricas["hedges"] == 0
@@ -0,0 +1,297 @@
+"""
+Montagem das mensagens enviadas ao modelo sem varrer nem copiar o histórico.
+
+O padrão dos agentes era, a cada turno:
+
+    if not any(isinstance(m, SystemMessage) for m in mensagens):   # O(n)
+        mensagens = [system_message] + mensagens                    # cópia O(n)
+
+e criar um SystemMessage novo a cada chamada. Com conversas longas,
+esse trabalho cresce junto com o histórico em TODOS os turnos.
+
+O MontadorPrompt:
+- cria o SystemMessage UMA vez (prefixo constante, o mesmo objeto sempre)
+- verifica em O(1) se o histórico já começa com um SystemMessage (m[0])
+- devolve uma VisaoPrompt: sequência somente-leitura que encadeia
+  prefixo + mensagens de contexto + histórico, sem copiar o histórico
+
+A única passagem pelo histórico é a do próprio cliente do modelo, ao
+converter as mensagens para a requisição.
+
+Prefixo estável para o cache de prompt do provedor
+--------------------------------------------------
+O cache de prompt (OpenAI, Anthropic...) só reaproveita os tokens
+iniciais se eles forem IDÊNTICOS byte a byte entre chamadas. Por isso:
+- o texto do system é canonicalizado (dedent, sem espaços nas pontas
+  das linhas, sem linhas em branco no início/fim)
+- as ferramentas são vinculadas sempre na mesma ordem (por nome)
+- o que muda a cada turno (ex: documentos recuperados) vai como
+  `sufixo`, DEPOIS do histórico; `contexto` (logo após o system) é
+  para o que muda raramente (ex: resumo da conversa)
+
+invocar() registra os tokens lidos do cache (usage_metadata ->
+input_token_details.cache_read) e a latência, em MedidorCache;
+transmitir() faz o mesmo em modo stream, quando o stream acaba ou é
+abandonado por quem consome.
+
+Uso:
+    MONTADOR = MontadorPrompt("Você é um assistente...", ferramentas=[buscar])
+
+    def agente(estado):
+        llm_com_tools = MONTADOR.vincular(ChatOpenAI(model="gpt-4o-mini"))
+        resposta = MONTADOR.invocar(llm_com_tools, estado["mensagens"])
+
+    MONTADOR.cache.metricas()   # taxa_cache, latência com/sem cache...
+"""
+
+import textwrap
+import threading
+import time
+from collections.abc import Sequence
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator, Optional, Union
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+
+def canonicalizar(texto: str) -> str:
+    """Forma canônica de um prompt: mesma semântica, bytes estáveis"""
+    texto = textwrap.dedent(texto.replace("\r\n", "\n"))
+    return "\n".join(linha.rstrip() for linha in texto.strip().split("\n"))
+
+
+def _nome_ferramenta(ferramenta: Any) -> str:
+    if isinstance(ferramenta, dict):
+        return ferramenta.get("function", ferramenta).get("name", "")
+    return getattr(ferramenta, "name", None) or getattr(ferramenta, "__name__", "")
+
+
+def ordenar_ferramentas(ferramentas: Iterable[Any]) -> list:
+    """Ferramentas em ordem estável (por nome) para os schemas enviados ao modelo"""
+    return sorted(ferramentas, key=_nome_ferramenta)
+
+
+class MedidorCache:
+    """Tokens de entrada lidos do cache do provedor e latência das chamadas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totais = {
+            "chamadas": 0, "chamadas_com_cache": 0, "tokens_entrada": 0, "tokens_cache": 0,
+            "ms_com_cache": 0.0, "ms_sem_cache": 0.0,
+        }
+        self.ultima_medicao: dict = {}
+
+    def registrar(self, resposta: Any, latencia_ms: float) -> None:
+        uso = getattr(resposta, "usage_metadata", None) or {}
+        entrada = uso.get("input_tokens", 0)
+        lidos = (uso.get("input_token_details") or {}).get("cache_read", 0) or 0
+        with self._lock:
+            self.ultima_medicao = {"tokens_entrada": entrada, "tokens_cache": lidos, "latencia_ms": latencia_ms}
+            self._totais["chamadas"] += 1
+            self._totais["tokens_entrada"] += entrada
+            self._totais["tokens_cache"] += lidos
+            if lidos:
+                self._totais["chamadas_com_cache"] += 1
+                self._totais["ms_com_cache"] += latencia_ms
+            else:
+                self._totais["ms_sem_cache"] += latencia_ms
+
+    def metricas(self) -> dict:
+        with self._lock:
+            t = dict(self._totais)
+        sem_cache = t["chamadas"] - t["chamadas_com_cache"]
+        return {
+            "chamadas": t["chamadas"],
+            "chamadas_com_cache": t["chamadas_com_cache"],
+            "tokens_entrada": t["tokens_entrada"],
+            "tokens_cache": t["tokens_cache"],
+            "taxa_cache": round(t["tokens_cache"] / t["tokens_entrada"], 3) if t["tokens_entrada"] else 0.0,
+            "latencia_media_ms_com_cache": round(t["ms_com_cache"] / t["chamadas_com_cache"], 1) if t["chamadas_com_cache"] else None,
+            "latencia_media_ms_sem_cache": round(t["ms_sem_cache"] / sem_cache, 1) if sem_cache else None,
+        }
+
+
+class VisaoPrompt(Sequence):
+    """
+    prefixo + historico[inicio:] + sufixo como uma sequência, sem copiar o histórico.
+
+    Args:
+        prefixo: Mensagens que vêm antes do histórico (system, contexto)
+        historico: Histórico do estado (lista ou SequenciaMensagens)
+        inicio: Quantas mensagens do início do histórico pular
+        sufixo: Mensagens que vêm depois do histórico
+    """
+
+    __slots__ = ("prefixo", "historico", "inicio", "sufixo")
+
+    def __init__(self, prefixo: tuple, historico: Sequence, inicio: int = 0, sufixo: tuple = ()):
+        self.prefixo = prefixo
+        self.historico = historico
+        self.inicio = inicio
+        self.sufixo = sufixo
+
+    def __len__(self) -> int:
+        return len(self.prefixo) + len(self.historico) - self.inicio + len(self.sufixo)
+
+    def __getitem__(self, indice: Union[int, slice]):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError("índice fora do prompt")
+        if indice < len(self.prefixo):
+            return self.prefixo[indice]
+        indice -= len(self.prefixo)
+        no_historico = len(self.historico) - self.inicio
+        if indice < no_historico:
+            return self.historico[indice + self.inicio]
+        return self.sufixo[indice - no_historico]
+
+    def __iter__(self) -> Iterator[BaseMessage]:
+        historico = self.historico if not self.inicio else islice(self.historico, self.inicio, None)
+        return chain(self.prefixo, historico, self.sufixo)
+
+    def __repr__(self) -> str:
+        return (f"VisaoPrompt({len(self.prefixo)} no prefixo + {len(self.historico) - self.inicio} do histórico"
+                f" + {len(self.sufixo)} no sufixo)")
+
+
+class MontadorPrompt:
+    """
+    Monta [system, *contexto, *historico, *sufixo] com o SystemMessage constante.
+
+    Args:
+        sistema: Texto (ou SystemMessage) do prompt de sistema; é canonicalizado
+        ferramentas: Ferramentas do agente, vinculadas em ordem estável
+    """
+
+    def __init__(self, sistema: Union[str, SystemMessage], ferramentas: Optional[Iterable[Any]] = None):
+        texto = sistema.content if isinstance(sistema, SystemMessage) else sistema
+        self.sistema = SystemMessage(content=canonicalizar(texto))
+        self.ferramentas = ordenar_ferramentas(ferramentas or [])
+        self.cache = MedidorCache()
+
+    @staticmethod
+    def tem_sistema(historico: Sequence[BaseMessage]) -> bool:
+        """O histórico já começa com um SystemMessage? (O(1): só olha m[0])"""
+        return len(historico) > 0 and isinstance(historico[0], SystemMessage)
+
+    def montar(
+        self,
+        historico: Sequence[BaseMessage],
+        contexto: Iterable[BaseMessage] = (),
+        sufixo: Iterable[BaseMessage] = (),
+    ) -> VisaoPrompt:
+        """
+        Mensagens para o modelo. `contexto` entra logo depois do system
+        (use para o que muda raramente, ex: resumo); `sufixo` entra depois
+        do histórico (o que muda a cada turno, ex: documentos recuperados),
+        para não quebrar o prefixo em cache.
+
+        Se o histórico já trouxer o próprio SystemMessage (threads antigas),
+        ele é usado no lugar do prefixo constante.
+        """
+        contexto, sufixo = tuple(contexto), tuple(sufixo)
+        if self.tem_sistema(historico):
+            return VisaoPrompt((historico[0],) + contexto, historico, inicio=1, sufixo=sufixo)
+        return VisaoPrompt((self.sistema,) + contexto, historico, sufixo=sufixo)
+
+    def vincular(self, modelo):
+        """modelo.bind_tools com as ferramentas em ordem estável"""
+        return modelo.bind_tools(self.ferramentas) if self.ferramentas else modelo
+
+    def invocar(
+        self,
+        modelo,
+        historico: Sequence[BaseMessage],
+        contexto: Iterable[BaseMessage] = (),
+        sufixo: Iterable[BaseMessage] = (),
+    ):
+        """montar() + enviar()"""
+        return self.enviar(modelo, self.montar(historico, contexto, sufixo))
+
+    def enviar(self, modelo, mensagens: Sequence[BaseMessage]):
+        """modelo.invoke() registrando tokens em cache e latência (para mensagens já montadas)"""
+        inicio = time.perf_counter()
+        resposta = modelo.invoke(mensagens)
+        self.cache.registrar(resposta, (time.perf_counter() - inicio) * 1000)
+        return resposta
+
+    def transmitir(
+        self,
+        modelo,
+        historico: Sequence[BaseMessage],
+        contexto: Iterable[BaseMessage] = (),
+        sufixo: Iterable[BaseMessage] = (),
+    ) -> Iterator:
+        """montar() + modelo.stream(); registra a chamada quando o stream acaba ou é abandonado"""
+        inicio = time.perf_counter()
+        acumulado = None
+        pedacos = modelo.stream(self.montar(historico, contexto, sufixo))
+        try:
+            for pedaco in pedacos:
+                acumulado = pedaco if acumulado is None else acumulado + pedaco
+                yield pedaco
+        finally:
+            # Fecha o stream do modelo já (e não quando o GC passar): libera
+            # a vaga do limitador e a conexão
+            fechar = getattr(pedacos, "close", None)
+            if fechar is not None:
+                fechar()
+            self.cache.registrar(acumulado, (time.perf_counter() - inicio) * 1000)
+
+
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    montador = MontadorPrompt("Você é um assistente pessoal.")
+
+    def montagem_antiga(historico):
+        mensagens = historico
+        if not any(isinstance(m, SystemMessage) for m in mensagens):
+            mensagens = [SystemMessage(content="Você é um assistente pessoal.")] + mensagens
+        return mensagens
+
+    print(f"{'histórico':>10} | {'antiga':>10} | {'MontadorPrompt':>15}")
+    for n in (100, 1_000, 10_000, 100_000):
+        historico = [HumanMessage(content=f"pergunta {i}") if i % 2 == 0 else AIMessage(content=f"resposta {i}")
+                     for i in range(n)]
+        tempos = []
+        for montar in (montagem_antiga, montador.montar):
+            inicio = time.perf_counter()
+            for _ in range(100):
+                mensagens = montar(historico)
+            tempos.append((time.perf_counter() - inicio) / 100 * 1e6)
+        print(f"{n:>10,} | {tempos[0]:8.1f}µs | {tempos[1]:13.1f}µs")
+
+    visao = montador.montar(historico[:3], contexto=[SystemMessage(content="Resumo: ...")],
+                            sufixo=[SystemMessage(content="Documentos: ...")])
+    print(visao, [type(m).__name__ for m in visao])
+
+    # Prefixo estável: indentação/espaços acidentais não mudam os bytes do system
+    a = MontadorPrompt("""
+        Você é um SUPERVISOR.   
+        Responda em JSON.
+    """)
+    b = MontadorPrompt("Você é um SUPERVISOR.\nResponda em JSON.\n")
+    print("system idêntico:", a.sistema.content == b.sistema.content, repr(a.sistema.content))
+
+    class ModeloFake:
+        """Simula o provedor: a partir da 2ª chamada, 1024 tokens do prefixo vêm do cache"""
+        def __init__(self):
+            self.chamadas = 0
+
+        def invoke(self, mensagens):
+            self.chamadas += 1
+            cache = 1024 if self.chamadas > 1 else 0
+            return AIMessage(content="ok", usage_metadata={
+                "input_tokens": 1500, "output_tokens": 5, "total_tokens": 1505,
+                "input_token_details": {"cache_read": cache},
+            })
+
+    modelo = ModeloFake()
+    for i in range(5):
+        a.invocar(modelo, [HumanMessage(content=f"tarefa {i}")])
+    print(a.cache.metricas())
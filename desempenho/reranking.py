@@ -0,0 +1,188 @@
+"""
+Reranking em lote dos documentos recuperados.
+
+A busca (BM25/vetorial/híbrida) é rápida porque pontua consulta e
+documento SEPARADAMENTE. Um reranker olha o PAR (consulta, documento)
+e ordena melhor, mas custa mais, então roda só sobre os candidatos.
+
+Reranqueador:
+1. Pontua TODOS os candidatos numa única chamada ao pontuador (lote)
+2. Mantém os k melhores que cabem no orçamento de tokens
+3. Registra a latência do reranking à parte da busca
+
+Pontuadores (qualquer callable (consulta, textos) -> scores):
+- PontuadorLocal: estilo cross-encoder sem modelo (termos em comum
+  ponderados pela raridade no lote + termos vizinhos na mesma ordem)
+- pontuador_llm(modelo): um único prompt com todos os candidatos;
+  funciona com o ChatOpenAI ou com um modelo fake em testes
+
+Uso:
+    reranqueador = Reranqueador(k=5, orcamento_tokens=600)
+    selecionados = reranqueador.reranquear("como cancelo?", candidatos)
+    reranqueador.ultima_medicao   # latencia_ms, tokens_antes, tokens_depois
+"""
+
+import json
+import math
+import re
+import threading
+import time
+from typing import Callable, Optional, Sequence
+
+from desempenho.busca_lexica import tokenizar
+from desempenho.tokens import contar_tokens
+
+
+Pontuador = Callable[[str, Sequence[str]], Sequence[float]]
+
+
+class PontuadorLocal:
+    """
+    Pontuação conjunta do par (consulta, documento), sem modelo.
+
+    - Cobertura: termos da consulta presentes no documento, cada um
+      pesado pelo IDF dentro do lote (termo que aparece em todos os
+      candidatos não diferencia nenhum)
+    - Proximidade: pares de termos consecutivos da consulta que também
+      aparecem consecutivos no documento
+    - Leve penalidade por tamanho (documentos longos cobrem tudo)
+    """
+
+    def __init__(self, peso_proximidade: float = 0.5, penalidade_tamanho: float = 0.05):
+        self.peso_proximidade = peso_proximidade
+        self.penalidade_tamanho = penalidade_tamanho
+
+    def __call__(self, consulta: str, textos: Sequence[str]) -> list[float]:
+        termos = list(dict.fromkeys(tokenizar(consulta)))
+        if not termos or not textos:
+            return [0.0] * len(textos)
+
+        documentos = [tokenizar(texto) for texto in textos]
+        conjuntos = [set(tokens) for tokens in documentos]
+        n = len(textos)
+        idf = {t: math.log(1 + (n + 1) / (1 + sum(t in c for c in conjuntos))) for t in termos}
+        peso_total = sum(idf.values())
+        pares_consulta = set(zip(termos, termos[1:]))
+
+        scores = []
+        for tokens, conjunto in zip(documentos, conjuntos):
+            cobertura = sum(idf[t] for t in termos if t in conjunto) / peso_total
+            proximidade = 0.0
+            if pares_consulta:
+                proximidade = len(pares_consulta & set(zip(tokens, tokens[1:]))) / len(pares_consulta)
+            tamanho = 1 + self.penalidade_tamanho * math.log1p(len(tokens))
+            scores.append((cobertura + self.peso_proximidade * proximidade) / tamanho)
+        return scores
+
+
+_NUMEROS = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def pontuador_llm(modelo, reserva: Optional[Pontuador] = None) -> Pontuador:
+    """
+    Pontuador que faz UMA chamada ao modelo para todos os candidatos.
+
+    O modelo responde uma lista JSON de notas 0-10; se a resposta não
+    tiver uma nota por candidato, usa o pontuador de reserva.
+    """
+    reserva = reserva or PontuadorLocal()
+
+    def pontuar(consulta: str, textos: Sequence[str]) -> list[float]:
+        lista = "\n".join(f"[{i}] {texto}" for i, texto in enumerate(textos))
+        prompt = (
+            f"Pergunta: {consulta}\n\nDocumentos:\n{lista}\n\n"
+            f"Dê uma nota de 0 a 10 para a relevância de cada documento para a pergunta. "
+            f"Responda APENAS com uma lista JSON de {len(textos)} números, na ordem."
+        )
+        conteudo = modelo.invoke(prompt).content
+        try:
+            notas = [float(x) for x in json.loads(conteudo)]
+        except (ValueError, TypeError):
+            notas = [float(x) for x in _NUMEROS.findall(str(conteudo))]
+        if len(notas) != len(textos):
+            return list(reserva(consulta, textos))
+        return notas
+
+    return pontuar
+
+
+class Reranqueador:
+    """
+    Reordena candidatos e corta pelo orçamento de tokens.
+
+    Args:
+        pontuador: Callable (consulta, textos) -> scores (padrão: PontuadorLocal)
+        k: Máximo de documentos mantidos
+        orcamento_tokens: Máximo de tokens somados dos documentos mantidos
+            (None = sem limite). Um documento que não cabe é pulado e o
+            próximo, menor, ainda pode entrar.
+    """
+
+    def __init__(self, pontuador: Optional[Pontuador] = None, k: int = 5, orcamento_tokens: Optional[int] = None):
+        self.pontuador = pontuador or PontuadorLocal()
+        self.k = k
+        self.orcamento_tokens = orcamento_tokens
+        self.ultima_medicao: dict = {}
+        self._totais = {"chamadas": 0, "latencia_ms": 0.0, "tokens_antes": 0, "tokens_depois": 0}
+        self._lock = threading.Lock()
+
+    def reranquear(self, consulta: str, documentos: Sequence[str]) -> list[str]:
+        inicio = time.perf_counter()
+        documentos = list(dict.fromkeys(documentos))
+        scores = self.pontuador(consulta, documentos) if documentos else []
+        ordem = sorted(range(len(documentos)), key=lambda i: scores[i], reverse=True)
+
+        selecionados, usados = [], 0
+        for i in ordem:
+            if len(selecionados) >= self.k:
+                break
+            custo = contar_tokens(documentos[i])
+            if self.orcamento_tokens is not None and usados + custo > self.orcamento_tokens:
+                continue
+            selecionados.append(documentos[i])
+            usados += custo
+
+        medicao = {
+            "latencia_ms": (time.perf_counter() - inicio) * 1000,
+            "candidatos": len(documentos),
+            "selecionados": len(selecionados),
+            "tokens_antes": sum(contar_tokens(d) for d in documentos),
+            "tokens_depois": usados,
+        }
+        with self._lock:
+            self.ultima_medicao = medicao
+            self._totais["chamadas"] += 1
+            for chave in ("latencia_ms", "tokens_antes", "tokens_depois"):
+                self._totais[chave] += medicao[chave]
+        return selecionados
+
+    def metricas(self) -> dict:
+        with self._lock:
+            chamadas = self._totais["chamadas"]
+            return {
+                "chamadas": chamadas,
+                "latencia_media_ms": round(self._totais["latencia_ms"] / chamadas, 3) if chamadas else 0.0,
+                "tokens_economizados": self._totais["tokens_antes"] - self._totais["tokens_depois"],
+            }
+
+
+if __name__ == "__main__":
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    candidatos = [
+        "Produto: Plano Basic - R$29.9 - 5GB storage, suporte email",
+        "Produto: Plano Pro - R$79.9 - 50GB storage, suporte 24/7, API access",
+        "Política de cancelamento: Pode cancelar a qualquer momento. Reembolso proporcional até 7 dias.",
+        "Política de upgrade: Upgrade imediato com cobrança proporcional.",
+        "Política de suporte: Basic: email. Pro: email + chat. Enterprise: telefone dedicado.",
+        "Doc api: Nossa API REST usa OAuth2. Endpoint base: api.empresa.com/v1",
+    ]
+
+    local = Reranqueador(k=3, orcamento_tokens=60)
+    print("Local:", local.reranquear("qual plano tem suporte por telefone?", candidatos))
+    print("  ", local.ultima_medicao)
+
+    fake = FakeListChatModel(responses=["[1, 2, 0, 0, 9, 3]"])
+    llm = Reranqueador(pontuador_llm(fake), k=2)
+    print("LLM (fake):", llm.reranquear("qual plano tem suporte por telefone?", candidatos))
+    print("  ", llm.ultima_medicao)
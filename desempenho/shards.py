@@ -0,0 +1,236 @@
+"""
+Índice particionado por categoria (shards).
+
+Com um índice único, buscar em "politicas" ainda percorre postings e
+vetores de produtos e documentação só para descartá-los no filtro, e
+"all" é uma única busca sequencial.
+
+IndiceParticionado mantém um índice independente por categoria:
+- categoria específica: consulta SÓ o shard dela
+- todas: consulta os shards em paralelo (thread pool) e junta os
+  resultados com heapq; os scores precisam ser comparáveis entre shards:
+  - cosseno (IndiceVetorial): já é, junta direto
+  - BM25: o IDF de cada shard é local (um termo raro num shard pesaria
+    mais lá), então as estatísticas do corpus inteiro são somadas antes
+    e cada shard pontua com elas (o mesmo score de um índice único)
+  - BuscaHibrida: o score RRF de um shard só depende da posição NELE
+    (o 1º de cada shard empata em 2/61, relevante ou não); por isso cada
+    shard devolve as listas lexical e densa, que são juntadas por score
+    e fundidas num RRF global
+
+Paralelismo real depende do índice: o produto matriz-vetor do NumPy
+(IndiceVetorial) libera o GIL; o BM25 em Python puro não, então o ganho
+nele vem de cada shard ser menor, não de usar mais núcleos.
+
+Uso:
+    indice = IndiceParticionado(IndiceBM25, particao_de=lambda doc_id: doc_id.split(":")[0])
+    indice.adicionar("politicas:cancelamento", "Pode cancelar a qualquer momento")
+    indice.buscar("cancelar", k=3)                          # todos os shards
+    indice.buscar("cancelar", k=3, particao="politicas")    # um shard
+"""
+
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Iterable, Optional
+
+from desempenho.busca_hibrida import fundir_rrf
+
+
+class IndiceParticionado:
+    """
+    Um índice por partição, com a mesma interface dos índices internos.
+
+    Args:
+        fabrica: Cria um índice vazio (adicionar_lote/remover/buscar)
+        particao_de: doc_id -> nome da partição
+        max_workers: Threads para buscas em todas as partições
+    """
+
+    def __init__(
+        self,
+        fabrica: Callable[[], object],
+        particao_de: Callable[[Hashable], str],
+        max_workers: Optional[int] = None,
+    ):
+        self.fabrica = fabrica
+        self.particao_de = particao_de
+        self.shards: dict[str, object] = {}
+        self.ultimos_tempos: dict[str, float] = {}
+        self._particao: dict[Hashable, str] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard")
+
+    def __len__(self) -> int:
+        return len(self._particao)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._particao
+
+    def _shard(self, nome: str):
+        shard = self.shards.get(nome)
+        if shard is None:
+            shard = self.shards[nome] = self.fabrica()
+        return shard
+
+    # ---------------------------------------------------------------
+    # Escrita
+    # ---------------------------------------------------------------
+
+    def adicionar(self, doc_id: Hashable, texto: str) -> None:
+        self.adicionar_lote([(doc_id, texto)])
+
+    def adicionar_lote(self, documentos: Iterable[tuple[Hashable, str]]) -> None:
+        """Agrupa o lote por partição e faz um adicionar_lote por shard"""
+        por_particao: dict[str, list] = {}
+        for doc_id, texto in documentos:
+            nome = self.particao_de(doc_id)
+            anterior = self._particao.get(doc_id)
+            if anterior is not None and anterior != nome:
+                # Documento mudou de categoria: sai do shard antigo
+                self.shards[anterior].remover(doc_id)
+            self._particao[doc_id] = nome
+            por_particao.setdefault(nome, []).append((doc_id, texto))
+
+        for nome, lote in por_particao.items():
+            self._shard(nome).adicionar_lote(lote)
+
+    def remover(self, doc_id: Hashable) -> bool:
+        nome = self._particao.pop(doc_id, None)
+        if nome is None:
+            return False
+        return self.shards[nome].remover(doc_id)
+
+    # ---------------------------------------------------------------
+    # Busca
+    # ---------------------------------------------------------------
+
+    def _buscar_shard(self, nome: str, buscar: Callable[[object], list]) -> tuple[str, list, float]:
+        inicio = time.perf_counter()
+        resultados = buscar(self.shards[nome])
+        return nome, resultados, (time.perf_counter() - inicio) * 1000
+
+    @staticmethod
+    def _estatisticas(indices: list, consulta: str) -> Optional[tuple[int, int, dict[str, int]]]:
+        """Estatísticas BM25 do corpus inteiro (soma das de cada shard), ou None se não for BM25"""
+        if not indices or not all(hasattr(indice, "estatisticas") for indice in indices):
+            return None
+        documentos, tamanho, dfs = 0, 0, {}
+        for indice in indices:
+            n, total, parciais = indice.estatisticas(consulta)
+            documentos += n
+            tamanho += total
+            for termo, df in parciais.items():
+                dfs[termo] = dfs.get(termo, 0) + df
+        return (documentos, tamanho, dfs) if documentos else None
+
+    def _buscar_lexico(self, indice, consulta: str, k: int, filtro, estatisticas) -> list:
+        if estatisticas is None:
+            return indice.buscar(consulta, k, filtro)
+        return indice.buscar(consulta, k, filtro, estatisticas=estatisticas)
+
+    def buscar(
+        self,
+        consulta: str,
+        k: int = 5,
+        filtro: Optional[Callable[[Hashable], bool]] = None,
+        particao: Optional[str] = None,
+    ) -> list[tuple[Hashable, float]]:
+        """
+        Os k melhores documentos de uma partição ou de todas.
+
+        Registra em ultimos_tempos o tempo (ms) de cada shard, da junção
+        e o total.
+        """
+        inicio = time.perf_counter()
+
+        if particao is not None:
+            if particao not in self.shards:
+                self.ultimos_tempos = {"total": 0.0}
+                return []
+            nomes = [particao]
+        else:
+            nomes = list(self.shards)
+        shards = [self.shards[nome] for nome in nomes]
+
+        hibrida = all(hasattr(shard, "lexico") and hasattr(shard, "denso") for shard in shards)
+        if hibrida and len(shards) > 1:
+            # Listas lexical e densa de cada shard; a fusão RRF é global
+            n = max(k, shards[0].candidatos)
+            estatisticas = self._estatisticas([shard.lexico for shard in shards], consulta)
+
+            def buscar(shard):
+                return (self._buscar_lexico(shard.lexico, consulta, n, filtro, estatisticas),
+                        shard.denso.buscar(consulta, n, filtro))
+        else:
+            n = k
+            estatisticas = self._estatisticas(shards, consulta) if len(shards) > 1 else None
+
+            def buscar(shard):
+                return self._buscar_lexico(shard, consulta, k, filtro, estatisticas)
+
+        if len(nomes) == 1:
+            respostas = [self._buscar_shard(nomes[0], buscar)]
+        else:
+            futuros = [self._executor.submit(self._buscar_shard, nome, buscar) for nome in nomes]
+            respostas = [futuro.result() for futuro in futuros]
+
+        inicio_juncao = time.perf_counter()
+        if hibrida and len(shards) > 1:
+            lexicos = heapq.nlargest(n, (item for _, (lex, _), _ in respostas for item in lex), key=lambda i: i[1])
+            densos = heapq.nlargest(n, (item for _, (_, den), _ in respostas for item in den), key=lambda i: i[1])
+            melhores = fundir_rrf([lexicos, densos], shards[0].k_rrf, shards[0].pesos)[:k]
+        else:
+            candidatos = (item for _, resultados, _ in respostas for item in resultados)
+            melhores = heapq.nlargest(k, candidatos, key=lambda item: item[1])
+        fim = time.perf_counter()
+
+        tempos = {nome: ms for nome, _, ms in respostas}
+        tempos["juncao"] = (fim - inicio_juncao) * 1000
+        tempos["total"] = (fim - inicio) * 1000
+        with self._lock:
+            self.ultimos_tempos = tempos
+        return melhores
+
+    def fechar(self) -> None:
+        self._executor.shutdown(wait=False)
+        for shard in self.shards.values():
+            if hasattr(shard, "fechar"):
+                shard.fechar()
+
+
+if __name__ == "__main__":
+    import random
+
+    from desempenho.busca_vetorial import EmbeddingHash, IndiceVetorial
+
+    categorias = ["produtos", "politicas", "documentacao", "faq"]
+    palavras = "plano suporte api reembolso cancelar upgrade lgpd webhook oauth preço storage chat".split()
+    rng = random.Random(42)
+    embedding = EmbeddingHash(128)
+
+    particionado = IndiceParticionado(lambda: IndiceVetorial(embedding), particao_de=lambda d: d.split(":")[0])
+    unico = IndiceVetorial(embedding)
+
+    documentos = [
+        (f"{categorias[i % 4]}:{i}", " ".join(rng.choices(palavras, k=12)))
+        for i in range(40_000)
+    ]
+    particionado.adicionar_lote(documentos)
+    unico.adicionar_lote(documentos)
+
+    consulta = "como cancelar e pedir reembolso"
+    for rotulo, buscar in [
+        ("índice único + filtro", lambda: unico.buscar(consulta, 5, filtro=lambda d: d.startswith("politicas:"))),
+        ("shard 'politicas'", lambda: particionado.buscar(consulta, 5, particao="politicas")),
+        ("índice único (all)", lambda: unico.buscar(consulta, 5)),
+        ("4 shards em paralelo", lambda: particionado.buscar(consulta, 5)),
+    ]:
+        inicio = time.perf_counter()
+        for _ in range(20):
+            buscar()
+        print(f"{rotulo:24} {(time.perf_counter() - inicio) / 20 * 1000:7.2f} ms/busca")
+
+    print("tempos por shard:", {nome: round(ms, 2) for nome, ms in particionado.ultimos_tempos.items()})
+    particionado.fechar()
@@ -0,0 +1,126 @@
+"""
+Armazém de tarefas indexado para o EstadoTarefas.
+
+A versão original do 05_persistencia_memoria.py tinha três problemas
+quando o usuário acumula dezenas de milhares de tarefas:
+- concluir_tarefa percorria a lista inteira e fazia tarefas.pop(i): O(n)
+- IDs eram len(tarefas) + 1, que REPETE depois de uma conclusão
+- listar_tarefas imprimia tudo de uma vez
+
+IndiceTarefas mantém:
+- dict id -> tarefa: busca e conclusão em O(1)
+- lista ordenada de ids (geral e por status): uma página é uma fatia,
+  O(tamanho) e não O(deslocamento)
+- linha do tempo (criada_em, id) ordenada: busca por período em O(log n)
+- proximo_id: contador que nunca reaproveita IDs
+
+É um dataclass, então o serializador do LangGraph consegue salvá-lo em
+checkpoints. Ao carregá-lo de um checkpoint, registre o tipo em
+allowed_msgpack_modules: [("desempenho.tarefas", "IndiceTarefas")].
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Optional
+
+
+PENDENTE = "pendente"
+CONCLUIDA = "concluida"
+
+
+@dataclass
+class IndiceTarefas:
+    """
+    Tarefas indexadas por id, status e data de criação.
+
+    Só tarefas e proximo_id são persistidos; os índices são
+    reconstruídos em __post_init__.
+    """
+    tarefas: dict = field(default_factory=dict)
+    proximo_id: int = 1
+
+    def __post_init__(self):
+        # ids em ordem crescente (= ordem de criação)
+        self._ids: list[int] = []
+        self._por_status: dict[str, list[int]] = {}
+        self._linha_do_tempo: list[tuple[str, int]] = []
+        for tarefa in sorted(self.tarefas.values(), key=lambda t: t["id"]):
+            self._indexar(tarefa)
+        self._linha_do_tempo.sort()
+
+    def _indexar(self, tarefa: dict) -> None:
+        self._ids.append(tarefa["id"])
+        self._por_status.setdefault(tarefa["status"], []).append(tarefa["id"])
+        self._linha_do_tempo.append((tarefa["criada_em"], tarefa["id"]))
+
+    def __len__(self) -> int:
+        return len(self.tarefas)
+
+    def __contains__(self, tarefa_id: int) -> bool:
+        return tarefa_id in self.tarefas
+
+    # ---------------------------------------------------------------
+    # Escrita
+    # ---------------------------------------------------------------
+
+    def adicionar(self, titulo: str) -> dict:
+        """Cria uma tarefa pendente com um ID novo"""
+        tarefa = {
+            "id": self.proximo_id,
+            "titulo": titulo,
+            "criada_em": datetime.now().isoformat(),
+            "status": PENDENTE
+        }
+        self.proximo_id += 1
+        self.tarefas[tarefa["id"]] = tarefa
+        self._indexar(tarefa)
+        return tarefa
+
+    def adicionar_lote(self, titulos: Iterable[str]) -> list[dict]:
+        return [self.adicionar(titulo) for titulo in titulos]
+
+    def concluir(self, tarefa_id: int) -> Optional[dict]:
+        """
+        Marca como concluída (busca O(1), troca de lista O(log n) + memmove).
+        Retorna None se não existir ou já estiver concluída.
+        """
+        tarefa = self.tarefas.get(tarefa_id)
+        if tarefa is None or tarefa["status"] == CONCLUIDA:
+            return None
+
+        ids = self._por_status[tarefa["status"]]
+        del ids[bisect_left(ids, tarefa_id)]
+        tarefa["status"] = CONCLUIDA
+        tarefa["concluida_em"] = datetime.now().isoformat()
+        insort(self._por_status.setdefault(CONCLUIDA, []), tarefa_id)
+        return tarefa
+
+    def concluir_lote(self, tarefa_ids: Iterable[int]) -> list[dict]:
+        """Conclui várias tarefas; IDs inexistentes são ignorados"""
+        concluidas = (self.concluir(tarefa_id) for tarefa_id in tarefa_ids)
+        return [tarefa for tarefa in concluidas if tarefa is not None]
+
+    # ---------------------------------------------------------------
+    # Leitura
+    # ---------------------------------------------------------------
+
+    def obter(self, tarefa_id: int) -> Optional[dict]:
+        return self.tarefas.get(tarefa_id)
+
+    def contar(self, status: Optional[str] = None) -> int:
+        if status is None:
+            return len(self.tarefas)
+        return len(self._por_status.get(status, ()))
+
+    def listar(self, status: Optional[str] = None, pagina: int = 1, tamanho: int = 20) -> list[dict]:
+        """Uma página de tarefas (por status, em ordem de criação) em O(tamanho)"""
+        ids = self._ids if status is None else self._por_status.get(status, [])
+        inicio = (pagina - 1) * tamanho
+        return [self.tarefas[tarefa_id] for tarefa_id in ids[inicio:inicio + tamanho]]
+
+    def criadas_entre(self, inicio: str, fim: str) -> list[dict]:
+        """Tarefas criadas no intervalo [inicio, fim] (timestamps ISO)"""
+        a = bisect_left(self._linha_do_tempo, (inicio, 0))
+        b = bisect_right(self._linha_do_tempo, (fim, float("inf")))
+        return [self.tarefas[tarefa_id] for _, tarefa_id in self._linha_do_tempo[a:b]]
@@ -0,0 +1,49 @@
+"""
+Contagem de tokens para orçamentos de contexto.
+
+O padrão é uma estimativa local (~4 caracteres por token, a regra
+prática dos tokenizadores BPE da OpenAI para texto latino), sem
+dependências e sem download. Para contagem exata, registre o
+tokenizador do modelo:
+
+    import tiktoken
+    from desempenho import tokens
+
+    codificador = tiktoken.encoding_for_model("gpt-4o-mini")
+    tokens.definir_contador(lambda texto: len(codificador.encode(texto)))
+"""
+
+from typing import Callable, Iterable
+
+# Custo fixo por mensagem no formato de chat (papel, separadores)
+TOKENS_POR_MENSAGEM = 4
+
+_contador: Callable[[str], int] = lambda texto: (len(texto) + 3) // 4
+
+
+def definir_contador(contador: Callable[[str], int]) -> None:
+    """Troca a estimativa pelo tokenizador do modelo"""
+    global _contador
+    _contador = contador
+
+
+def contar_tokens(texto: str) -> int:
+    return _contador(texto) if texto else 0
+
+
+def contar_tokens_mensagem(mensagem) -> int:
+    """Tokens de uma BaseMessage: conteúdo + tool calls + custo fixo"""
+    conteudo = mensagem.content
+    if not isinstance(conteudo, str):
+        conteudo = " ".join(
+            parte.get("text", "") if isinstance(parte, dict) else str(parte)
+            for parte in conteudo
+        )
+    total = TOKENS_POR_MENSAGEM + contar_tokens(conteudo)
+    for chamada in getattr(mensagem, "tool_calls", None) or []:
+        total += contar_tokens(chamada["name"]) + contar_tokens(str(chamada["args"]))
+    return total
+
+
+def contar_tokens_mensagens(mensagens: Iterable) -> int:
+    return sum(contar_tokens_mensagem(m) for m in mensagens)
@@ -0,0 +1,159 @@
+"""
+Histórico de versões indexado e "viagem no tempo".
+
+O rollback do 05_persistencia_memoria.py percorria a lista
+historico_versoes inteira para achar uma versão, e não havia como
+pedir "o estado como estava no instante T".
+
+HistoricoVersoes resolve isso com dois índices:
+- dict versão -> checkpoint: busca por versão em O(1)
+- lista ordenada de timestamps: busca por instante em O(log n) (bisect)
+
+E políticas de retenção:
+- manter_ultimas: as N versões mais recentes ficam intactas
+- intervalo_antigas: das mais antigas, só sobra 1 a cada K versões
+
+Para checkpoints de GRAFO, estado_em() faz a mesma busca por instante
+sobre o histórico de um app compilado (estilo get_state_history).
+"""
+
+from bisect import bisect_right, insort
+from datetime import datetime
+from typing import Iterator, Optional, Union
+
+
+Instante = Union[str, datetime]
+
+
+def _normalizar_instante(instante: Instante) -> str:
+    """Timestamps ISO são comparáveis como string quando têm o mesmo formato"""
+    if isinstance(instante, datetime):
+        return instante.isoformat()
+    return instante
+
+
+class HistoricoVersoes:
+    """
+    Histórico de versões com busca por versão e por instante.
+
+    Cada entrada é um dict no formato usado em criar_checkpoint():
+        {"versao": int, "timestamp": str ISO, "dados": dict}
+
+    Args:
+        manter_ultimas: Quantas versões recentes nunca são desbastadas, >= 1
+            (None = todas); a mais recente sempre fica
+        intervalo_antigas: Das versões mais antigas, mantém as múltiplas deste
+            intervalo (None = descarta todas as antigas)
+    """
+
+    def __init__(self, manter_ultimas: Optional[int] = None, intervalo_antigas: Optional[int] = None):
+        if manter_ultimas is not None and manter_ultimas < 1:
+            raise ValueError(f"manter_ultimas deve ser >= 1 (a versão atual nunca é descartada), recebido {manter_ultimas}")
+        self.manter_ultimas = manter_ultimas
+        self.intervalo_antigas = intervalo_antigas
+
+        self._por_versao: dict[int, dict] = {}
+        # (timestamp, versao) ordenado por timestamp
+        self._linha_do_tempo: list[tuple[str, int]] = []
+        self._ultima_versao = 0
+        self._proxima_retencao = manter_ultimas
+
+    def __len__(self) -> int:
+        return len(self._por_versao)
+
+    def __iter__(self) -> Iterator[dict]:
+        """Itera em ordem de versão"""
+        for versao in sorted(self._por_versao):
+            yield self._por_versao[versao]
+
+    def __contains__(self, versao: int) -> bool:
+        return versao in self._por_versao
+
+    @property
+    def ultima_versao(self) -> int:
+        return self._ultima_versao
+
+    def append(self, checkpoint: dict) -> None:
+        """Adiciona (ou substitui) uma versão"""
+        versao = checkpoint["versao"]
+        timestamp = _normalizar_instante(checkpoint["timestamp"])
+
+        if versao in self._por_versao:
+            self._remover_da_linha_do_tempo(versao)
+
+        self._por_versao[versao] = checkpoint
+        entrada = (timestamp, versao)
+        if not self._linha_do_tempo or self._linha_do_tempo[-1] <= entrada:
+            self._linha_do_tempo.append(entrada)  # caso comum: O(1)
+        else:
+            insort(self._linha_do_tempo, entrada)
+        self._ultima_versao = max(self._ultima_versao, versao)
+
+        # Retenção amortizada: só desbasta quando o histórico dobra
+        if self._proxima_retencao is not None and len(self) > 2 * self._proxima_retencao:
+            self.aplicar_retencao()
+
+    def obter(self, versao: int) -> Optional[dict]:
+        """Busca por versão em O(1)"""
+        return self._por_versao.get(versao)
+
+    def em(self, instante: Instante) -> Optional[dict]:
+        """Retorna a versão vigente no instante (a última criada até ele) em O(log n)"""
+        chave = (_normalizar_instante(instante), float("inf"))
+        posicao = bisect_right(self._linha_do_tempo, chave)
+        if posicao == 0:
+            return None
+        _, versao = self._linha_do_tempo[posicao - 1]
+        return self._por_versao[versao]
+
+    def aplicar_retencao(self) -> int:
+        """Desbasta versões antigas segundo a política. Retorna quantas removeu."""
+        if self.manter_ultimas is None:
+            return 0
+
+        versoes = sorted(self._por_versao)
+        antigas = versoes[:-self.manter_ultimas]
+        remover = {
+            v for v in antigas
+            if not self.intervalo_antigas or v % self.intervalo_antigas != 0
+        }
+
+        for versao in remover:
+            del self._por_versao[versao]
+        if remover:
+            self._linha_do_tempo = [e for e in self._linha_do_tempo if e[1] not in remover]
+
+        self._proxima_retencao = max(self.manter_ultimas, len(self))
+        return len(remover)
+
+    def _remover_da_linha_do_tempo(self, versao: int) -> None:
+        timestamp = _normalizar_instante(self._por_versao[versao]["timestamp"])
+        self._linha_do_tempo.remove((timestamp, versao))
+
+
+# ===================================================================
+# VIAGEM NO TEMPO EM CHECKPOINTS DE GRAFO
+# ===================================================================
+
+def estado_em(app, config: dict, instante: Instante):
+    """
+    Retorna o StateSnapshot do grafo como estava no instante informado.
+
+    Com o MemorySaverLimitado a busca usa o índice temporal do
+    checkpointer (O(log n)); com outros checkpointers percorre
+    get_state_history() (O(n)).
+    """
+    instante = _normalizar_instante(instante)
+    checkpointer = app.checkpointer
+
+    if hasattr(checkpointer, "checkpoint_em"):
+        tupla = checkpointer.checkpoint_em(config, instante)
+        if tupla is None:
+            return None
+        return app.get_state(tupla.config)
+
+    # get_state_history vem do mais recente para o mais antigo
+    for snapshot in app.get_state_history(config):
+        if snapshot.created_at and snapshot.created_at <= instante:
+            return snapshot
+    return None
@@ -0,0 +1,639 @@
+"""
+Persistência de checkpoints "write-behind" (fora do caminho crítico).
+
+Com um checkpointer durável (SQLite, Postgres...), cada superstep do
+grafo espera a escrita do checkpoint terminar antes de continuar.
+O CheckpointerWriteBehind devolve o controle na hora:
+
+    nó → put() ──► espelho em memória (leituras continuam consistentes)
+                └► fila limitada ──► thread escritora ──► destino durável
+
+DURABILIDADE:
+- "passo": todo checkpoint entra na fila e é gravado em ordem.
+- "fim":   só o último checkpoint de cada thread é gravado, quando a
+           chamada do grafo volta (envolver(app)), em sincronizar()/
+           execucao(), ou quando um interrupt()/erro aparece nos writes
+           pendentes. Paradas estáticas (interrupt_before/interrupt_after)
+           não deixam rastro no checkpoint: só envolver(app) ou
+           sincronizar() as gravam.
+
+INSTANTÂNEO:
+put()/put_writes() copiam o que vai para o destino ANTES de devolver o
+controle (copy_checkpoint + cópia profunda só dos canais alterados; os
+blocos selados de SequenciaMensagens são compartilhados). Um nó que
+altera o estado no lugar não muda um checkpoint que já estava na fila.
+
+BACKPRESSURE:
+Se a fila encher, put() espera por espaço (a thread do grafo fica mais
+lenta, mas nunca escreve no destino por conta própria: só a thread
+escritora fala com o destino, e sempre na ordem da fila).
+
+SEMÂNTICA EM CASO DE QUEDA DO PROCESSO:
+- Uma única thread escritora aplica as operações na ordem em que
+  chegaram, então o destino sempre contém um PREFIXO da sequência de
+  checkpoints de cada thread: nunca um checkpoint sem os anteriores.
+- Se uma escrita no destino falhar, a escritora para de aplicar as
+  seguintes (o destino fica no último prefixo válido) e todo
+  sincronizar() relança o erro.
+- "passo": perdem-se no máximo os checkpoints que ainda estavam na
+  fila (até tamanho_fila). Ao reiniciar, a thread continua do último
+  checkpoint durável e os passos perdidos são executados de novo
+  (os nós devem tolerar execução "pelo menos uma vez").
+- "fim": passos intermediários nunca são gravados. Uma queda no meio
+  da execução volta ao estado final da execução anterior e a execução
+  inteira é refeita. Com envolver(app), interrupções (human-in-the-loop,
+  inclusive interrupt_before/after) são gravadas antes de devolver o
+  controle, então retomar após um interrupt é seguro.
+
+Uso:
+    destino = SqliteSaver(conexao)
+    memory = CheckpointerWriteBehind(destino, durabilidade="fim")
+    app = memory.envolver(workflow.compile(checkpointer=memory, interrupt_before=["revisar"]))
+    app.invoke(entrada, config)      # volta com o estado já no destino
+
+    grafo = workflow.compile(checkpointer=memory)
+    with memory.execucao():          # alternativa: grava ao sair do bloco
+        grafo.invoke(entrada, config)
+"""
+
+import asyncio
+import queue
+import threading
+from contextlib import contextmanager
+from copy import deepcopy
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Iterable, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+)
+
+from desempenho.checkpoint_lru import MemorySaverLimitado
+
+
+DURABILIDADES = ("passo", "fim")
+
+# Canais de write que indicam que a execução parou e precisa ser retomável
+_CANAIS_DE_PARADA = ("__interrupt__", "__error__")
+
+
+def _instantaneo(checkpoint: Checkpoint, canais: Iterable[str]) -> Checkpoint:
+    """Cópia do checkpoint em que os canais que serão gravados não mudam mais"""
+    copia = copy_checkpoint(checkpoint)
+    valores = copia["channel_values"]
+    for canal in canais:
+        if canal in valores:
+            valores[canal] = deepcopy(valores[canal])
+    return copia
+
+
+@dataclass
+class MetricasWriteBehind:
+    """Métricas da fila de escrita"""
+    enfileirados: int = 0
+    gravados: int = 0
+    esperas_backpressure: int = 0
+    descartados_apos_erro: int = 0
+    descartados_por_compactacao: int = 0
+    tamanho_fila: int = 0
+    maior_fila: int = 0
+
+
+class _PendentesThread:
+    """Operações de uma thread ainda não enviadas ao destino (modo "fim")"""
+
+    __slots__ = ("put", "versoes", "writes")
+
+    def __init__(self):
+        self.put: Optional[tuple] = None  # (config, checkpoint, metadata)
+        self.versoes: dict = {}  # canais alterados desde a última gravação
+        self.writes: list = []  # put_writes do checkpoint mais recente
+
+
+class CheckpointerWriteBehind(BaseCheckpointSaver):
+    """
+    Checkpointer que grava em um destino durável em segundo plano.
+
+    Args:
+        destino: Checkpointer durável que recebe as escritas
+        durabilidade: "passo" (todo checkpoint) ou "fim" (só o final/interrupções)
+        tamanho_fila: Capacidade da fila de escrita (fila cheia = put() espera)
+        espelho: Checkpointer em memória que atende as leituras
+            (padrão: MemorySaverLimitado com até 10.000 threads)
+    """
+
+    def __init__(
+        self,
+        destino: BaseCheckpointSaver,
+        *,
+        durabilidade: str = "passo",
+        tamanho_fila: int = 1000,
+        espelho: Optional[BaseCheckpointSaver] = None,
+    ) -> None:
+        if durabilidade not in DURABILIDADES:
+            raise ValueError(f"Durabilidade inválida: {durabilidade}. Use um de {DURABILIDADES}")
+
+        super().__init__(serde=destino.serde)
+        self.destino = destino
+        self.durabilidade = durabilidade
+        self.espelho = espelho or MemorySaverLimitado(max_threads=10_000, serde=destino.serde)
+
+        self._fila: queue.Queue = queue.Queue(maxsize=tamanho_fila)
+        self._pendentes: dict[str, _PendentesThread] = {}
+        self._lock = threading.Lock()
+        self._metricas = MetricasWriteBehind()
+        self._erro: Optional[BaseException] = None
+
+        self._escritora = threading.Thread(target=self._escrever, name="checkpoint-writer", daemon=True)
+        self._escritora.start()
+
+    # ---------------------------------------------------------------
+    # Fila e thread escritora
+    # ---------------------------------------------------------------
+
+    def _aplicar(self, operacao: tuple) -> None:
+        tipo, args = operacao
+        if tipo == "put":
+            self.destino.put(*args)
+        else:
+            self.destino.put_writes(*args)
+
+    def _escrever(self) -> None:
+        while True:
+            operacao = self._fila.get()
+            try:
+                if operacao is None:
+                    return
+                if self._erro is not None:
+                    # Aplicar depois de uma falha quebraria o prefixo no destino
+                    with self._lock:
+                        self._metricas.descartados_apos_erro += 1
+                    continue
+                self._aplicar(operacao)
+                with self._lock:
+                    self._metricas.gravados += 1
+            except BaseException as e:  # guardado e relançado em sincronizar()
+                self._erro = e
+            finally:
+                self._fila.task_done()
+
+    def _enfileirar(self, operacao: tuple) -> None:
+        with self._lock:
+            self._metricas.enfileirados += 1
+        try:
+            self._fila.put_nowait(operacao)
+        except queue.Full:
+            with self._lock:
+                self._metricas.esperas_backpressure += 1
+            # Backpressure de verdade: espera a escritora abrir espaço
+            self._fila.put(operacao)
+
+        with self._lock:
+            self._metricas.maior_fila = max(self._metricas.maior_fila, self._fila.qsize())
+
+    def _liberar_pendentes(self, thread_id: Optional[str] = None) -> None:
+        """Envia para a fila o que o modo "fim" estava segurando"""
+        with self._lock:
+            if thread_id is None:
+                threads = list(self._pendentes)
+            else:
+                threads = [thread_id] if thread_id in self._pendentes else []
+            lotes = [self._pendentes.pop(t) for t in threads]
+
+        for pendentes in lotes:
+            if pendentes.put is not None:
+                config, checkpoint, metadata = pendentes.put
+                novas_versoes = {
+                    canal: checkpoint["channel_versions"][canal]
+                    for canal in pendentes.versoes
+                    if canal in checkpoint["channel_versions"]
+                }
+                self._enfileirar(("put", (config, checkpoint, metadata, novas_versoes)))
+            for args in pendentes.writes:
+                self._enfileirar(("put_writes", args))
+
+    def sincronizar(self, thread_id: Optional[str] = None) -> None:
+        """
+        Bloqueia até tudo (ou tudo de uma thread) estar no destino.
+
+        Relança o erro da thread escritora, se houver (o erro fica: depois
+        de uma falha o destino não recebe mais nada).
+        """
+        self._liberar_pendentes(thread_id)
+        self._fila.join()
+        if self._erro is not None:
+            raise self._erro
+
+    @contextmanager
+    def execucao(self, thread_id: Optional[str] = None):
+        """Garante que o estado final da execução seja gravado ao sair do bloco"""
+        try:
+            yield self
+        finally:
+            self.sincronizar(thread_id)
+
+    def envolver(self, grafo) -> "GrafoWriteBehind":
+        """Grafo compilado cujas chamadas só voltam com o estado da thread no destino"""
+        return GrafoWriteBehind(grafo, self)
+
+    def fechar(self) -> None:
+        """Grava tudo e encerra a thread escritora"""
+        try:
+            self.sincronizar()
+        finally:
+            self._fila.put(None)
+            self._escritora.join()
+
+    def metricas(self) -> dict:
+        with self._lock:
+            self._metricas.tamanho_fila = self._fila.qsize()
+            return asdict(self._metricas)
+
+    # ---------------------------------------------------------------
+    # Escrita
+    # ---------------------------------------------------------------
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Grava no espelho e agenda a gravação durável"""
+        novo_config = self.espelho.put(config, checkpoint, metadata, new_versions)
+
+        copia = _instantaneo(checkpoint, new_versions)
+        metadata = deepcopy(metadata)
+        if self.durabilidade == "passo":
+            self._enfileirar(("put", (config, copia, metadata, new_versions)))
+            return novo_config
+
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            pendentes = self._pendentes.setdefault(thread_id, _PendentesThread())
+            if pendentes.put is None:
+                parent_config = config
+            else:
+                self._metricas.descartados_por_compactacao += 1
+                parent_config = pendentes.put[0]
+                # Canais alterados antes e não agora: vale a cópia já feita
+                anteriores = pendentes.put[1]["channel_values"]
+                for canal in pendentes.versoes:
+                    if canal not in new_versions and canal in anteriores:
+                        copia["channel_values"][canal] = anteriores[canal]
+            # O destino recebe só este checkpoint, mas com todos os canais
+            # alterados desde a última gravação
+            pendentes.put = (parent_config, copia, metadata)
+            pendentes.versoes.update(new_versions)
+            pendentes.writes = []
+        return novo_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Grava writes pendentes; em modo "fim", interrupções forçam a gravação"""
+        self.espelho.put_writes(config, writes, task_id, task_path)
+        args = (config, [(canal, deepcopy(valor)) for canal, valor in writes], task_id, task_path)
+
+        if self.durabilidade == "passo":
+            self._enfileirar(("put_writes", args))
+            return
+
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            pendentes = self._pendentes.setdefault(thread_id, _PendentesThread())
+            pendentes.writes.append(args)
+
+        if any(canal in _CANAIS_DE_PARADA for canal, _ in writes):
+            self.sincronizar(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.sincronizar(thread_id)
+        self.espelho.delete_thread(thread_id)
+        self.destino.delete_thread(thread_id)
+
+    # ---------------------------------------------------------------
+    # Leitura: espelho primeiro, destino se a thread saiu do espelho
+    # ---------------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        tupla = self.espelho.get_tuple(config)
+        if tupla is not None:
+            return tupla
+        # A thread pode ter sido despejada do espelho com escritas ainda na fila
+        self.sincronizar(config["configurable"]["thread_id"])
+        return self.destino.get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        # O histórico completo só existe no destino
+        self.sincronizar(config["configurable"]["thread_id"] if config else None)
+        yield from self.destino.list(config, filter=filter, before=before, limit=limit)
+
+    # ---------------------------------------------------------------
+    # Versões assíncronas: put() já não bloqueia, então reaproveitam as síncronas
+    # ---------------------------------------------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+    def get_next_version(self, current: Optional[Any], channel: Any) -> Any:
+        return self.destino.get_next_version(current, channel)
+
+
+def _thread_id(config: Optional[RunnableConfig]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+class GrafoWriteBehind:
+    """
+    Grafo compilado + sincronizar() da thread ao fim de cada chamada.
+
+    No modo "fim", é o que garante que paradas em interrupt_before/
+    interrupt_after (que não geram writes de interrupção) estejam no
+    destino quando invoke()/stream() devolvem o controle. O resto dos
+    atributos vem do grafo (get_state, update_state...).
+    """
+
+    def __init__(self, grafo, memory: CheckpointerWriteBehind):
+        self.grafo = grafo
+        self.memory = memory
+
+    def invoke(self, entrada: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        try:
+            return self.grafo.invoke(entrada, config, **kwargs)
+        finally:
+            self.memory.sincronizar(_thread_id(config))
+
+    def stream(self, entrada: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Iterator:
+        try:
+            yield from self.grafo.stream(entrada, config, **kwargs)
+        finally:
+            self.memory.sincronizar(_thread_id(config))
+
+    async def ainvoke(self, entrada: Any, config: Optional[RunnableConfig] = None, **kwargs) -> Any:
+        try:
+            return await self.grafo.ainvoke(entrada, config, **kwargs)
+        finally:
+            await asyncio.to_thread(self.memory.sincronizar, _thread_id(config))
+
+    async def astream(self, entrada: Any, config: Optional[RunnableConfig] = None, **kwargs) -> AsyncIterator:
+        try:
+            async for evento in self.grafo.astream(entrada, config, **kwargs):
+                yield evento
+        finally:
+            await asyncio.to_thread(self.memory.sincronizar, _thread_id(config))
+
+    def __getattr__(self, nome: str) -> Any:
+        return getattr(self.grafo, nome)
+
+
+# ===================================================================
+# DEMONSTRAÇÃO: latência, durabilidade e recuperação após queda
+# ===================================================================
+if __name__ == "__main__":
+    import os
+    import pickle
+    import signal
+    import subprocess
+    import sys
+    import tempfile
+    import time
+    import operator
+    from typing import TypedDict, Annotated
+    from langgraph.checkpoint.memory import MemorySaver
+    from langgraph.graph import StateGraph, END
+
+    class DestinoLento(MemorySaver):
+        """Simula um banco de dados: 5ms por escrita"""
+
+        def put(self, *args, **kwargs):
+            time.sleep(0.005)
+            return super().put(*args, **kwargs)
+
+        def put_writes(self, *args, **kwargs):
+            time.sleep(0.005)
+            return super().put_writes(*args, **kwargs)
+
+    class DestinoArquivo(MemorySaver):
+        """Simula um banco em disco: cada escrita regrava um arquivo (20ms)"""
+
+        def __init__(self, arquivo):
+            super().__init__()
+            self.arquivo = arquivo
+            if os.path.exists(arquivo):
+                with open(arquivo, "rb") as f:
+                    storage, writes, blobs = pickle.load(f)
+                for thread_id, namespaces in storage.items():
+                    for ns, checkpoints in namespaces.items():
+                        self.storage[thread_id][ns].update(checkpoints)
+                self.writes.update(writes)
+                self.blobs.update(blobs)
+
+        def _salvar(self):
+            time.sleep(0.02)
+            estado = (
+                {t: {ns: dict(cps) for ns, cps in nss.items()} for t, nss in self.storage.items()},
+                dict(self.writes),
+                dict(self.blobs),
+            )
+            with open(self.arquivo + ".tmp", "wb") as f:
+                pickle.dump(estado, f)
+            os.replace(self.arquivo + ".tmp", self.arquivo)  # escrita atômica
+
+        def put(self, *args, **kwargs):
+            resultado = super().put(*args, **kwargs)
+            self._salvar()
+            return resultado
+
+        def put_writes(self, *args, **kwargs):
+            super().put_writes(*args, **kwargs)
+            self._salvar()
+
+    class EstadoPassos(TypedDict):
+        passos: Annotated[list, operator.add]
+
+    workflow = StateGraph(EstadoPassos)
+    nomes = [f"no_{i}" for i in range(5)]
+    for nome in nomes:
+        workflow.add_node(nome, lambda estado, nome=nome: {"passos": [nome]})
+    workflow.set_entry_point(nomes[0])
+    for a, b in zip(nomes, nomes[1:]):
+        workflow.add_edge(a, b)
+    workflow.add_edge(nomes[-1], END)
+
+    if sys.argv[1:2] == ["--queda"]:
+        # Processo filho: roda o grafo e morre sem esvaziar a fila
+        memory = CheckpointerWriteBehind(DestinoArquivo(sys.argv[2]), durabilidade="passo")
+        config = {"configurable": {"thread_id": "queda"}}
+        workflow.compile(checkpointer=memory).invoke({"passos": []}, config)
+        while memory.metricas()["gravados"] < 5:  # deixa parte da fila chegar ao disco
+            time.sleep(0.001)
+        assert memory.metricas()["tamanho_fila"] > 0
+        print(len(list(memory.espelho.list(config))), flush=True)
+        os.kill(os.getpid(), signal.SIGKILL)
+
+    def medir(checkpointer, rotulo):
+        app = workflow.compile(checkpointer=checkpointer)
+        config = {"configurable": {"thread_id": rotulo}}
+        inicio = time.perf_counter()
+        resultado = app.invoke({"passos": []}, config)
+        duracao = (time.perf_counter() - inicio) * 1000
+        print(f"[{rotulo:<18}] {duracao:6.1f} ms no caminho crítico")
+        return resultado, config
+
+    print("=" * 60)
+    print("Latência do invoke com destino de 5ms por escrita")
+    print("=" * 60)
+    medir(DestinoLento(), "síncrono")
+
+    for durabilidade in DURABILIDADES:
+        destino = DestinoLento()
+        memory = CheckpointerWriteBehind(destino, durabilidade=durabilidade)
+        with memory.execucao():
+            resultado, config = medir(memory, f"write-behind {durabilidade}")
+        gravado = destino.get_tuple(config).checkpoint["channel_values"]["passos"]
+        assert gravado == resultado["passos"], "estado final deve estar no destino"
+        print(f"   gravado no destino: {gravado}")
+        print(f"   métricas: {memory.metricas()}")
+        memory.fechar()
+
+    print("\n" + "=" * 60)
+    print("Queda de verdade: processo morto (SIGKILL) com a fila cheia")
+    print("=" * 60)
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "destino.pkl")
+        filho = subprocess.run(
+            [sys.executable, "-m", "desempenho.write_behind", "--queda", arquivo],
+            capture_output=True, text=True,
+        )
+        assert filho.returncode == -signal.SIGKILL, filho.stderr
+        produzidos = int(filho.stdout)
+
+        destino = DestinoArquivo(arquivo)
+        config = {"configurable": {"thread_id": "queda"}}
+        duraveis = list(reversed(list(destino.list(config))))
+        passos = [t.metadata["step"] for t in duraveis]
+        assert 0 < len(duraveis) < produzidos, "a queda deve perder só o fim da fila"
+        assert passos == list(range(-1, len(passos) - 1)), f"não é um prefixo: {passos}"
+        for t in duraveis:
+            gravado = t.checkpoint["channel_values"].get("passos", [])
+            assert gravado == nomes[:max(t.metadata["step"], 0)], gravado
+        print(f"[DESTINO] {len(duraveis)} de {produzidos} checkpoints duráveis: passos {passos}")
+
+        # Processo novo: continua do último checkpoint durável, refaz o resto
+        memory = CheckpointerWriteBehind(destino, durabilidade="passo")
+        app = memory.envolver(workflow.compile(checkpointer=memory))
+        retomado = app.invoke(None if duraveis else {"passos": []}, config)
+        assert retomado["passos"] == nomes, retomado["passos"]
+        print(f"[RECUPERAÇÃO] retomado: {retomado['passos']}")
+        memory.fechar()
+
+    print("\n" + "=" * 60)
+    print("Nó que altera o estado no lugar: checkpoint na fila não muda")
+    print("=" * 60)
+
+    class EstadoDict(TypedDict):
+        dados: dict
+
+    def marcar(rotulo):
+        def no(estado):
+            estado["dados"]["ultimo"] = rotulo  # mutação no lugar
+            return {"dados": estado["dados"]}
+        return no
+
+    mutante = StateGraph(EstadoDict)
+    mutante.add_node("a", marcar("a"))
+    mutante.add_node("b", marcar("b"))
+    mutante.set_entry_point("a")
+    mutante.add_edge("a", "b")
+    mutante.add_edge("b", END)
+    destino = DestinoLento()
+    memory = CheckpointerWriteBehind(destino, durabilidade="passo")
+    config = {"configurable": {"thread_id": "mutante"}}
+    # durability="sync": o put de cada passo acontece antes do próximo nó
+    memory.envolver(mutante.compile(checkpointer=memory)).invoke(
+        {"dados": {"ultimo": "inicio"}}, config, durability="sync"
+    )
+    gravados = {t.metadata["step"]: t.checkpoint["channel_values"]["dados"]["ultimo"] for t in destino.list(config) if t.metadata["step"] >= 0}
+    assert gravados == {0: "inicio", 1: "a", 2: "b"}, gravados
+    print(f"   gravados no destino: {gravados}")
+    memory.fechar()
+
+    print("\n" + "=" * 60)
+    print("Fila pequena (backpressure): destino continua em ordem")
+    print("=" * 60)
+    destino = DestinoLento()
+    memory = CheckpointerWriteBehind(destino, durabilidade="passo", tamanho_fila=2)
+    resultado, config = medir(memory, "fila de 2")
+    memory.sincronizar()
+    passos = [t.metadata["step"] for t in destino.list(config)]
+    assert passos == sorted(passos, reverse=True), f"fora de ordem: {passos}"
+    print(f"   passos no destino: {list(reversed(passos))} | {memory.metricas()}")
+    memory.fechar()
+
+    print("\n" + "=" * 60)
+    print("interrupt_before no modo fim: retomar em um processo novo")
+    print("=" * 60)
+    destino = DestinoLento()
+    memory = CheckpointerWriteBehind(destino, durabilidade="fim")
+    app = memory.envolver(workflow.compile(checkpointer=memory, interrupt_before=["no_2"]))
+    config = {"configurable": {"thread_id": "revisao"}}
+    print(f"   parou em: {app.invoke({'passos': []}, config)['passos']}")
+    assert destino.get_tuple(config) is not None, "a parada deve estar no destino"
+    # "Processo novo": outro write-behind sobre o mesmo destino, espelho vazio
+    novo = CheckpointerWriteBehind(destino, durabilidade="fim")
+    retomado = novo.envolver(workflow.compile(checkpointer=novo, interrupt_before=["no_2"])).invoke(None, config)
+    assert retomado["passos"] == nomes, retomado["passos"]
+    print(f"   retomado: {retomado['passos']}")
+    memory.fechar()
+    novo.fechar()